@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+import app.state
+
+# how long a turned-away client's place in line is remembered for.
+FIRST_ATTEMPT_TTL = 60.0
+
+
+class AdmissionController:
+    """\
+    Bounds the number of concurrent requests of some kind (e.g. logins),
+    queueing the rest in arrival order and turning them away once the
+    queue is full, or they've waited too long.
+
+    Clients which are turned away keep their place in line; when they
+    retry, they're queued by the time of their first attempt.
+
+    Possibly confusing attributes
+    -----------
+    _waiters: list[tuple[`float`, `int`, `asyncio.Future[None]`]]
+        A heap of queued requests, by (first attempt time, arrival order).
+        XXX: requests which time out are left in the heap, and skipped
+             when they reach the front.
+
+    _first_attempts: dict[`str`, `float`]
+        The time of each turned-away client's first attempt, by key.
+
+    Intended Usage:
+    >>> async with app.state.sessions.login_admission(str(ip)) as admitted:
+    ...     if not admitted:
+    ...         return busy_response
+    """
+
+    def __init__(
+        self,
+        name: str,
+        concurrency: int,
+        max_queued: int,
+        max_wait: float,
+    ) -> None:
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queued = max_queued
+        self.max_wait = max_wait
+
+        self._waiters: list[tuple[float, int, asyncio.Future[None]]] = []
+        self._arrivals = itertools.count()
+        self._first_attempts: dict[str, float] = {}
+
+        self.active = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"<{self.name}: {self.active}/{self.concurrency} active, "
+            f"{self.queued} queued, {self.admitted} admitted, {self.rejected} rejected>"
+        )
+
+    @asynccontextmanager
+    async def __call__(self, key: str) -> AsyncIterator[bool]:
+        """Wait for a slot; yields whether the request was admitted."""
+        arrival_time = time.monotonic()
+
+        if not await self._acquire(key, arrival_time):
+            self.rejected += 1
+            self._remember_first_attempt(key, arrival_time)
+            self._report("rejected", time.monotonic() - arrival_time)
+            yield False
+            return
+
+        self.admitted += 1
+        self._first_attempts.pop(key, None)
+        self._report("admitted", time.monotonic() - arrival_time)
+
+        try:
+            yield True
+        finally:
+            self._release()
+
+    async def _acquire(self, key: str, arrival_time: float) -> bool:
+        if self.active < self.concurrency and not self.queued:
+            self.active += 1
+            return True
+
+        if self.queued >= self.max_queued:
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        priority = self._first_attempts.get(key, arrival_time)
+        heapq.heappush(self._waiters, (priority, next(self._arrivals), waiter))
+
+        self.queued += 1
+        try:
+            async with asyncio.timeout(self.max_wait):
+                await waiter
+        except TimeoutError:
+            # we may have been handed a slot as we timed out.
+            return waiter.done() and not waiter.cancelled()
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            raise
+        finally:
+            self.queued -= 1
+
+        return True
+
+    def _release(self) -> None:
+        # hand our slot directly to the next live waiter.
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+        self.active -= 1
+
+    def _remember_first_attempt(self, key: str, arrival_time: float) -> None:
+        if len(self._first_attempts) >= self.max_queued:
+            # forget clients which have likely given up.
+            self._first_attempts = {
+                k: t
+                for k, t in self._first_attempts.items()
+                if arrival_time - t < FIRST_ATTEMPT_TTL
+            }
+
+        self._first_attempts.setdefault(key, arrival_time)
+
+    def _report(self, outcome: str, wait_time: float) -> None:
+        if app.state.services.datadog:
+            app.state.services.datadog.histogram(  # type: ignore[no-untyped-call]
+                f"bancho.{self.name}.wait_time",
+                wait_time,
+                tags=[f"outcome:{outcome}"],
+            )
+            app.state.services.datadog.gauge(  # type: ignore[no-untyped-call]
+                f"bancho.{self.name}.queued",
+                self.queued,
+            )
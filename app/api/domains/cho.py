@@ -4,11 +4,13 @@ from __future__ import annotations
 
 import asyncio
 import hashlib
+import random
 import re
 import struct
 import time
 from collections.abc import Callable
 from collections.abc import Mapping
+from concurrent.futures.process import BrokenProcessPool
 from datetime import date
 from datetime import datetime
 from pathlib import Path
@@ -62,11 +64,12 @@ from app.packets import BanchoPacketReader
 from app.packets import BasePacket
 from app.packets import ClientPackets
 from app.packets import LoginFailureReason
+from app.packets import make_packet_table
 from app.repositories import client_hashes as client_hashes_repo
-from app.repositories import ingame_logins as logins_repo
 from app.repositories import mail as mail_repo
 from app.repositories import users as users_repo
 from app.state import services
+from app.timer import PhaseTimer
 from app.usecases.performance import ScoreParams
 
 OSU_API_V2_CHANGELOG_URL = "https://osu.ppy.sh/api/v2/changelog"
@@ -86,6 +89,10 @@ NOW_PLAYING_RGX = re.compile(
 
 FIRST_USER_ID = 3
 
+# the range (in ms) of delays after which clients turned
+# away by the login admission controller will retry.
+LOGIN_RETRY_DELAY = (2_000, 8_000)
+
 router = APIRouter(tags=["Bancho API"])
 
 
@@ -200,11 +207,20 @@ async def bancho_handler(
 
     if osu_token is None:
         # the client is performing a login
-        login_data = await handle_osu_login_request(
-            request.headers,
-            await request.body(),
-            ip,
-        )
+        body = await request.body()
+
+        async with app.state.sessions.login_admission(str(ip)) as admitted:
+            if not admitted:
+                # too many logins at once; ask the client to retry
+                # shortly, at a jittered time to spread them out.
+                return Response(
+                    content=app.packets.restart_server(
+                        random.randint(*LOGIN_RETRY_DELAY),
+                    ),
+                    headers={"cho-token": "server-busy"},
+                )
+
+            login_data = await handle_osu_login_request(request.headers, body, ip)
 
         return Response(
             content=login_data["response_body"],
@@ -227,9 +243,9 @@ async def bancho_handler(
 
     if player.restricted:
         # restricted users may only use certain packet handlers.
-        packet_map = app.state.packets["restricted"]
+        packet_table = app.state.packet_tables["restricted"]
     else:
-        packet_map = app.state.packets["all"]
+        packet_table = app.state.packet_tables["all"]
 
     # bancho connections can be comprised of multiple packets;
     # our reader is designed to iterate through them individually,
@@ -237,7 +253,7 @@ async def bancho_handler(
     # NOTE: any unhandled packets will be ignored internally.
 
     with memoryview(await request.body()) as body_view:
-        for packet in BanchoPacketReader(body_view, packet_map):
+        for packet in BanchoPacketReader(body_view, packet_table):
             await packet.handle(player)
 
     player.last_recv_time = time.time()
@@ -257,9 +273,13 @@ def register(
 
     def wrapper(cls: type[BasePacket]) -> type[BasePacket]:
         app.state.packets["all"][packet] = cls
+        app.state.packet_tables["all"] = make_packet_table(app.state.packets["all"])
 
         if restricted:
             app.state.packets["restricted"][packet] = cls
+            app.state.packet_tables["restricted"] = make_packet_table(
+                app.state.packets["restricted"],
+            )
 
         return cls
 
@@ -302,6 +322,7 @@ class ChangeAction(BasePacket):
         player.status.mods = Mods(self.mods)
         player.status.mode = GameMode(self.mode)
         player.status.map_id = self.map_id
+        player.invalidate_packets()
 
         # broadcast it to all online players.
         if not player.restricted:
@@ -623,8 +644,12 @@ async def authenticate(
     if trusted_hashword in app.state.cache.bcrypt:  # ~0.01 ms
         if untrusted_password != app.state.cache.bcrypt[trusted_hashword]:
             return None
-    else:  # ~200ms
-        if not bcrypt.checkpw(untrusted_password, trusted_hashword):
+    else:  # ~200ms, off of the event loop
+        if not await asyncio.to_thread(
+            bcrypt.checkpw,
+            untrusted_password,
+            trusted_hashword,
+        ):
             return None
 
         app.state.cache.bcrypt[trusted_hashword] = untrusted_password
@@ -702,6 +727,7 @@ async def handle_osu_login_request(
     ## parsing successful
 
     login_time = time.time()
+    login_timer = PhaseTimer()
 
     # disallow multiple sessions from a single user
     # with the exception of tourney spectator clients
@@ -746,19 +772,28 @@ async def handle_osu_login_request(
 
     """ login credentials verified """
 
-    await logins_repo.create(
-        user_id=user_info["id"],
-        ip=str(ip),
-        osu_ver=osu_version.date,
-        osu_stream=osu_version.stream,
+    login_timer.lap("authenticate")
+
+    # audit rows are written in batches, in the background.
+    app.state.sessions.ingame_logins_writer.add(
+        {
+            "userid": user_info["id"],
+            "ip": str(ip),
+            "osu_ver": osu_version.date,
+            "osu_stream": osu_version.stream,
+            "datetime": datetime.fromtimestamp(login_time),
+        },
     )
 
-    await client_hashes_repo.create(
-        userid=user_info["id"],
-        osupath=login_data["osu_path_md5"],
-        adapters=login_data["adapters_md5"],
-        uninstall_id=login_data["uninstall_md5"],
-        disk_serial=login_data["disk_signature_md5"],
+    app.state.sessions.client_hashes_writer.add(
+        {
+            "userid": user_info["id"],
+            "osupath": login_data["osu_path_md5"],
+            "adapters": login_data["adapters_md5"],
+            "uninstall_id": login_data["uninstall_md5"],
+            "disk_serial": login_data["disk_signature_md5"],
+            "latest_time": datetime.fromtimestamp(login_time),
+        },
     )
 
     # TODO: store adapters individually
@@ -774,12 +809,17 @@ async def handle_osu_login_request(
     else:
         disk_signature_md5 = None
 
-    hw_matches = await client_hashes_repo.fetch_any_hardware_matches_for_user(
-        userid=user_info["id"],
-        running_under_wine=running_under_wine,
-        adapters=login_data["adapters_md5"],
-        uninstall_id=login_data["uninstall_md5"],
-        disk_serial=disk_signature_md5,
+    # the player's location is independent of the checks below;
+    # look it up concurrently, it's rarely wasted.
+    hw_matches, geoloc = await asyncio.gather(
+        client_hashes_repo.fetch_any_hardware_matches_for_user(
+            userid=user_info["id"],
+            running_under_wine=running_under_wine,
+            adapters=login_data["adapters_md5"],
+            uninstall_id=login_data["uninstall_md5"],
+            disk_serial=disk_signature_md5,
+        ),
+        app.state.services.fetch_geoloc(ip, headers),
     )
 
     if hw_matches:
@@ -812,6 +852,8 @@ async def handle_osu_login_request(
 
     """ All checks passed, player is safe to login """
 
+    login_timer.lap("client_checks")  # & geolocation
+
     # get clan & clan priv if we're in a clan
     clan_id: int | None = None
     clan_priv: ClanPrivileges | None = None
@@ -821,8 +863,6 @@ async def handle_osu_login_request(
 
     db_country = user_info["country"]
 
-    geoloc = await app.state.services.fetch_geoloc(ip, headers)
-
     if geoloc is None:
         return {
             "osu_token": "login-failed",
@@ -917,10 +957,17 @@ async def handle_osu_login_request(
     # tells osu! to reorder channels based on config.
     data += app.packets.channel_info_end()
 
-    # fetch some of the player's
-    # information from sql to be cached.
-    await player.stats_from_sql_full()
-    await player.relationships_from_sql()
+    login_timer.lap("channels")
+
+    # fetch some of the player's information from sql to be cached,
+    # along with any mail they were sent while offline, concurrently.
+    _, _, mail_rows = await asyncio.gather(
+        player.stats_from_sql_full(),
+        player.relationships_from_sql(),
+        mail_repo.fetch_all_mail_to_user(user_id=player.id, read=False),
+    )
+
+    login_timer.lap("player_data")
 
     # TODO: fetch player.recent_scores from sql
 
@@ -942,24 +989,14 @@ async def handle_osu_login_request(
             # enqueue us to them
             o.enqueue(user_data)
 
-            # enqueue them to us.
-            if not o.restricted:
-                if o is app.state.sessions.bot:
-                    # optimization for bot since it's
-                    # the most frequently requested user
-                    data += app.packets.bot_presence(o)
-                    data += app.packets.bot_stats(o)
-                else:
-                    data += app.packets.user_presence(o)
-                    data += app.packets.user_stats(o)
+        # enqueue them to us; the client requests
+        # their presences & stats as it needs them.
+        data += app.packets.user_presence_bundle(
+            app.state.sessions.players.unrestricted_ids,
+        )
 
         # the player may have been sent mail while offline,
         # enqueue any messages from their respective authors.
-        mail_rows = await mail_repo.fetch_all_mail_to_user(
-            user_id=player.id,
-            read=False,
-        )
-
         sent_to: set[int] = set()
 
         for msg in mail_rows:
@@ -1009,16 +1046,11 @@ async def handle_osu_login_request(
 
     else:
         # player is restricted, one way data
-        for o in app.state.sessions.players.unrestricted:
-            # enqueue them to us.
-            if o is app.state.sessions.bot:
-                # optimization for bot since it's
-                # the most frequently requested user
-                data += app.packets.bot_presence(o)
-                data += app.packets.bot_stats(o)
-            else:
-                data += app.packets.user_presence(o)
-                data += app.packets.user_stats(o)
+        # enqueue them to us; the client requests
+        # their presences & stats as it needs them.
+        data += app.packets.user_presence_bundle(
+            app.state.sessions.players.unrestricted_ids,
+        )
 
         data += app.packets.account_restricted()
         data += app.packets.send_message(
@@ -1028,6 +1060,8 @@ async def handle_osu_login_request(
             sender_id=app.state.sessions.bot.id,
         )
 
+    login_timer.lap("presence")
+
     # add `p` to the global player list,
     # making them officially logged in.
     app.state.sessions.players.append(player)
@@ -1048,6 +1082,13 @@ async def handle_osu_login_request(
         time_taken = time.time() - login_time
         app.state.services.datadog.histogram("bancho.login_time", time_taken)  # type: ignore[no-untyped-call]
 
+        for phase, phase_time in login_timer.phases.items():
+            app.state.services.datadog.histogram(  # type: ignore[no-untyped-call]
+                "bancho.login_phase_time",
+                phase_time,
+                tags=[f"phase:{phase}"],
+            )
+
     user_os = "unix (wine)" if running_under_wine else "win32"
     country_code = player.geoloc["country"]["acronym"].upper()
 
@@ -1128,10 +1169,9 @@ class SpectateFrames(BasePacket):
             + self.frame_bundle.raw_data
         )
 
-        # enqueue the data
-        # to all spectators.
-        for spectator in player.spectators:
-            spectator.enqueue(data)
+        # buffer the data once for all spectators;
+        # they'll collect it on their next poll.
+        player.spectator_relay.push(data)
 
 
 @register(ClientPackets.CANT_SPECTATE)
@@ -1308,18 +1348,22 @@ class SendPrivateMessage(BasePacket):
                                 for acc in app.settings.PP_CACHED_ACCURACIES
                             ]
 
-                            results = app.usecases.performance.calculate_performances(
-                                osu_file_path=str(BEATMAPS_PATH / f"{bmap.id}.osu"),
-                                scores=scores,
-                            )
-
-                            resp_msg = " | ".join(
-                                f"{acc}%: {result['performance']['pp']:,.2f}pp"
-                                for acc, result in zip(
-                                    app.settings.PP_CACHED_ACCURACIES,
-                                    results,
+                            try:
+                                results = await app.usecases.performance.calculate_performances_in_executor(
+                                    osu_file_path=str(BEATMAPS_PATH / f"{bmap.id}.osu"),
+                                    scores=scores,
+                                    osu_file_md5=bmap.md5,
+                                )
+                            except (TimeoutError, BrokenProcessPool):
+                                resp_msg = "Failed to calculate pp for this map."
+                            else:
+                                resp_msg = " | ".join(
+                                    f"{acc}%: {result['performance']['pp']:,.2f}pp"
+                                    for acc, result in zip(
+                                        app.settings.PP_CACHED_ACCURACIES,
+                                        results,
+                                    )
                                 )
-                            )
 
                     if resp_msg is not None:
                         player.send(resp_msg, sender=target)
@@ -2120,22 +2164,18 @@ class StatsRequest(BasePacket):
         self.user_ids = reader.read_i32_list_i16l()
 
     async def handle(self, player: Player) -> None:
-        unrestrcted_ids = [p.id for p in app.state.sessions.players.unrestricted]
+        packets = []
 
-        def is_online(o: int) -> bool:
-            return o in unrestrcted_ids and o != player.id
+        for online in self.user_ids:
+            if online == player.id:
+                continue
 
-        for online in filter(is_online, self.user_ids):
             target = app.state.sessions.players.get(id=online)
-            if target:
-                if target is app.state.sessions.bot:
-                    # optimization for bot since it's
-                    # the most frequently requested user
-                    packet = app.packets.bot_stats(target)
-                else:
-                    packet = app.packets.user_stats(target)
+            if target and not target.restricted:
+                packets.append(app.packets.user_stats(target))
 
-                player.enqueue(packet)
+        if packets:
+            player.enqueue(b"".join(packets))
 
 
 @register(ClientPackets.MATCH_INVITE)
@@ -2192,17 +2232,17 @@ class UserPresenceRequest(BasePacket):
         self.user_ids = reader.read_i32_list_i16l()
 
     async def handle(self, player: Player) -> None:
+        # presences are cached per-player, so this is just
+        # a concatenation of (usually) prebuilt packets.
+        packets = []
+
         for pid in self.user_ids:
             target = app.state.sessions.players.get(id=pid)
             if target:
-                if target is app.state.sessions.bot:
-                    # optimization for bot since it's
-                    # the most frequently requested user
-                    packet = app.packets.bot_presence(target)
-                else:
-                    packet = app.packets.user_presence(target)
+                packets.append(app.packets.user_presence(target))
 
-                player.enqueue(packet)
+        if packets:
+            player.enqueue(b"".join(packets))
 
 
 @register(ClientPackets.USER_PRESENCE_REQUEST_ALL)
@@ -2213,13 +2253,11 @@ class UserPresenceRequestAll(BasePacket):
     async def handle(self, player: Player) -> None:
         # NOTE: this packet is only used when there
         # are >256 players visible to the client.
-
-        buffer = bytearray()
-
-        for player in app.state.sessions.players.unrestricted:
-            buffer += app.packets.user_presence(player)
-
-        player.enqueue(bytes(buffer))
+        player.enqueue(
+            app.packets.user_presence_bundle(
+                app.state.sessions.players.unrestricted_ids,
+            ),
+        )
 
 
 @register(ClientPackets.TOGGLE_BLOCK_NON_FRIEND_DMS)
@@ -6,10 +6,12 @@ import copy
 import hashlib
 import random
 import secrets
+from bisect import insort
 from collections import defaultdict
 from collections.abc import Awaitable
 from collections.abc import Callable
 from collections.abc import Mapping
+from concurrent.futures.process import BrokenProcessPool
 from enum import IntEnum
 from enum import unique
 from functools import cache
@@ -59,7 +61,6 @@ from app.objects.player import Player
 from app.objects.score import Grade
 from app.objects.score import Score
 from app.objects.score import SubmissionStatus
-from app.repositories import clans as clans_repo
 from app.repositories import comments as comments_repo
 from app.repositories import favourites as favourites_repo
 from app.repositories import mail as mail_repo
@@ -70,6 +71,9 @@ from app.repositories import stats as stats_repo
 from app.repositories import users as users_repo
 from app.repositories.achievements import Achievement
 from app.usecases import achievements as achievements_usecases
+from app.usecases import leaderboards as leaderboards_usecases
+from app.usecases import score_checksums as score_checksums_usecases
+from app.usecases import top_scores as top_scores_usecases
 from app.usecases import user_achievements as user_achievements_usecases
 from app.utils import escape_enum
 from app.utils import pymysql_encode
@@ -560,6 +564,21 @@ def format_achievement_string(file: str, name: str, description: str) -> str:
     return f"{file}+{name}+{description}"
 
 
+async def broadcast_stats(player: Player) -> None:
+    """Send a player's current stats to all online players."""
+    app.state.sessions.players.enqueue(app.packets.user_stats(player))
+
+
+async def increment_map_plays(map_md5: str, passed: bool) -> None:
+    """Increment a beatmap's play & pass counts in sql."""
+    # relative updates, so concurrent submissions may be applied in any order.
+    await app.state.services.database.execute(
+        "UPDATE maps SET plays = plays + 1, passes = passes + :passed "
+        "WHERE md5 = :map_md5",
+        {"passed": int(passed), "map_md5": map_md5},
+    )
+
+
 def parse_form_data_score_params(
     score_data: FormData,
 ) -> tuple[bytes, StarletteUploadFile] | None:
@@ -723,18 +742,16 @@ async def osuSubmitModularSelector(
     if score.mode != score.player.status.mode:
         score.player.status.mods = score.mods
         score.player.status.mode = score.mode
+        score.player.invalidate_packets()
 
         if not score.player.restricted:
             app.state.sessions.players.enqueue(app.packets.user_stats(score.player))
 
     # hold a lock around (check if submitted, submission) to ensure no duplicates
     # are submitted to the database, and potentially award duplicate score/pp/etc.
-    async with app.state.score_submission_locks[score.client_checksum]:
+    async with app.state.score_submission_locks(score.client_checksum):
         # stop here if this is a duplicate score
-        if await app.state.services.database.fetch_one(
-            "SELECT 1 FROM scores WHERE online_checksum = :checksum",
-            {"checksum": score.client_checksum},
-        ):
+        if await score_checksums_usecases.is_duplicate(score.client_checksum):
             log(f"{score.player} submitted a duplicate score.", Ansi.LYELLOW)
             return Response(b"error: no")
 
@@ -747,7 +764,12 @@ async def osuSubmitModularSelector(
             expected_md5=bmap.md5,
         )
         if osu_file_available:
-            score.pp, score.sr = score.calculate_performance(bmap.id)
+            try:
+                score.pp, score.sr = await score.calculate_performance(bmap.id)
+            except (TimeoutError, BrokenProcessPool):
+                # don't store the score without its pp; the client will retry.
+                log(f"Failed to calculate pp for {score.player}'s score.", Ansi.LRED)
+                return Response(b"error: no")
 
             if score.passed:
                 await score.calculate_status()
@@ -874,6 +896,12 @@ async def osuSubmitModularSelector(
             },
         )
 
+        score_checksums_usecases.add(score.client_checksum)
+
+        if score.status == SubmissionStatus.BEST:
+            # keep the map's cached leaderboard up to date.
+            await leaderboards_usecases.add_score(score)
+
     if score.passed:
         replay_data = await replay_file.read()
 
@@ -956,32 +984,25 @@ async def osuSubmitModularSelector(
             stats.rscore += additional_rscore
             stats_updates["rscore"] = stats.rscore
 
-            # fetch scores sorted by pp for total acc/pp calc
-            # NOTE: we select all plays (and not just top100)
-            # because bonus pp counts the total amount of ranked
-            # scores. I'm aware this scales horribly, and it'll
-            # likely be split into two queries in the future.
-            best_scores = await app.state.services.database.fetch_all(
-                "SELECT s.pp, s.acc FROM scores s "
-                "INNER JOIN maps m ON s.map_md5 = m.md5 "
-                "WHERE s.userid = :user_id AND s.mode = :mode "
-                "AND s.status = 2 AND m.status IN (2, 3) "  # ranked, approved
-                "ORDER BY s.pp DESC",
-                {"user_id": score.player.id, "mode": score.mode},
-            )
+            # update our weighted pp & acc totals from our best scores,
+            # which are loaded from sql and then kept in sync until they
+            # expire, or are dropped by changes to others' scores or maps.
+            if stats.top_scores is None or stats.top_scores.expired():
+                top_scores = await top_scores_usecases.fetch(
+                    score.player.id,
+                    score.mode,
+                )
+                # may have loaded concurrently
+                if stats.top_scores is None or stats.top_scores.expired():
+                    stats.top_scores = top_scores
 
-            # calculate new total weighted accuracy
-            weighted_acc = sum(
-                row["acc"] * 0.95**i for i, row in enumerate(best_scores)
-            )
-            bonus_acc = 100.0 / (20 * (1 - 0.95 ** len(best_scores)))
-            stats.acc = (weighted_acc * bonus_acc) / 100
+            stats.top_scores.add(score.bmap.md5, score.pp, score.acc)
+            totals = stats.top_scores.totals()
+
+            stats.acc = totals["acc"]
             stats_updates["acc"] = stats.acc
 
-            # calculate new total weighted pp
-            weighted_pp = sum(row["pp"] * 0.95**i for i, row in enumerate(best_scores))
-            bonus_pp = 416.6667 * (1 - 0.9994 ** len(best_scores))
-            stats.pp = round(weighted_pp + bonus_pp)
+            stats.pp = totals["pp"]
             stats_updates["pp"] = stats.pp
 
             # update global & country ranking
@@ -1005,22 +1026,29 @@ async def osuSubmitModularSelector(
         pp=stats_updates.get("pp", UNSET),
     )
 
+    # the player's stats have changed; rebuild their packets.
+    score.player.invalidate_packets()
+
     if not score.player.restricted:
         # enqueue new stats info to all other users
-        app.state.sessions.players.enqueue(app.packets.user_stats(score.player))
+        app.state.sessions.background_jobs.submit(
+            f"broadcast {score.player}'s stats",
+            broadcast_stats,
+            score.player,
+        )
 
-        # update beatmap with new stats
+        # update beatmap with new stats; the in-memory counts
+        # are used for the charts, so they're updated right away.
         score.bmap.plays += 1
         if score.passed:
             score.bmap.passes += 1
 
-        await app.state.services.database.execute(
-            "UPDATE maps SET plays = :plays, passes = :passes WHERE md5 = :map_md5",
-            {
-                "plays": score.bmap.plays,
-                "passes": score.bmap.passes,
-                "map_md5": score.bmap.md5,
-            },
+        app.state.sessions.background_jobs.submit(
+            f"update {score.bmap.md5}'s play counts",
+            increment_map_plays,
+            score.bmap.md5,
+            score.passed,
+            retry=False,
         )
 
     # update their recent score
@@ -1151,7 +1179,11 @@ async def getReplay(
 
     # increment replay views for this score
     if score.player is not None and player.id != score.player.id:
-        app.state.loop.create_task(score.increment_replay_views())  # type: ignore[unused-awaitable]
+        app.state.sessions.background_jobs.submit(
+            f"increment score {score.id}'s replay views",
+            score.increment_replay_views,
+            retry=False,
+        )
 
     return FileResponse(file)
 
@@ -1167,11 +1199,10 @@ async def osuRate(
     if rating is None:
         # check if we have the map in our cache;
         # if not, the map probably doesn't exist.
-        if map_md5 not in app.state.cache.beatmap:
+        cached = app.state.cache.beatmaps.get_map(map_md5)
+        if cached is None:
             return Response(b"no exist")
 
-        cached = app.state.cache.beatmap[map_md5]
-
         # only allow rating on maps with a leaderboard.
         if cached.status < RankedStatus.Ranked:
             return Response(b"not ranked")
@@ -1211,80 +1242,78 @@ async def get_leaderboard_scores(
     player: Player,
     scoring_metric: Literal["pp", "score"],
 ) -> tuple[list[dict[str, Any]], dict[str, Any] | None]:
-    query = [
-        f"SELECT s.id, s.{scoring_metric} AS _score, "
-        "s.max_combo, s.n50, s.n100, s.n300, "
-        "s.nmiss, s.nkatu, s.ngeki, s.perfect, s.mods, "
-        "UNIX_TIMESTAMP(s.play_time) time, u.id userid, "
-        "COALESCE(CONCAT('[', c.tag, '] ', u.name), u.name) AS name "
-        "FROM scores s "
-        "INNER JOIN users u ON u.id = s.userid "
-        "LEFT JOIN clans c ON c.id = u.clan_id "
-        "WHERE s.map_md5 = :map_md5 AND s.status = 2 "  # 2: =best score
-        "AND (u.priv & 1 OR u.id = :user_id) AND mode = :mode",
-    ]
-
-    params: dict[str, Any] = {
-        "map_md5": map_md5,
-        "user_id": player.id,
-        "mode": mode,
-    }
+    # views are derived from the map's cached leaderboard where possible.
+    leaderboard = await leaderboards_usecases.fetch(
+        map_md5,
+        mode,
+        scoring_metric,
+    )
 
+    include: Callable[[dict[str, Any]], bool] | None = None
+    filters: dict[str, Any] = {}
     if leaderboard_type == LeaderboardType.Mods:
-        query.append("AND s.mods = :mods")
-        params["mods"] = mods
+        include = lambda row: row["mods"] == mods
+        filters["mods"] = mods
     elif leaderboard_type == LeaderboardType.Friends:
-        query.append("AND s.userid IN :friends")
-        params["friends"] = player.friends | {player.id}
+        friends = player.friends | {player.id}
+        include = lambda row: row["userid"] in friends
+        filters["user_ids"] = friends
     elif leaderboard_type == LeaderboardType.Country:
-        query.append("AND u.country = :country")
-        params["country"] = player.geoloc["country"]["acronym"]
+        country = player.geoloc["country"]["acronym"]
+        include = lambda row: row["country"] == country
+        filters["country"] = country
 
-    # TODO: customizability of the number of scores
-    query.append("ORDER BY _score DESC LIMIT 50")
+    top_score_rows = [
+        row for row in leaderboard.rows if include is None or include(row)
+    ]
 
-    score_rows = await app.state.services.database.fetch_all(
-        " ".join(query),
-        params,
+    # the view may include scores below the cached top scores.
+    fetch_filtered = (
+        include is not None
+        and not leaderboard.complete
+        and len(top_score_rows) < leaderboards_usecases.LEADERBOARD_SIZE
     )
+    if fetch_filtered:
+        top_score_rows = await leaderboards_usecases.fetch_filtered(
+            map_md5,
+            mode,
+            scoring_metric,
+            player.id,
+            **filters,
+        )
 
-    if score_rows:  # None or []
-        # fetch player's personal best score
-        personal_best_score_row = await app.state.services.database.fetch_one(
-            f"SELECT id, {scoring_metric} AS _score, "
-            "max_combo, n50, n100, n300, "
-            "nmiss, nkatu, ngeki, perfect, mods, "
-            "UNIX_TIMESTAMP(play_time) time "
-            "FROM scores "
-            "WHERE map_md5 = :map_md5 AND mode = :mode "
-            "AND userid = :user_id AND status = 2 "
-            "ORDER BY _score DESC LIMIT 1",
-            {"map_md5": map_md5, "mode": mode, "user_id": player.id},
+    # fetch player's personal best score
+    personal_best = None
+    row = leaderboard.by_user.get(player.id)
+    if row is not None:
+        personal_best = (row, leaderboard.rank_of(row))
+    elif top_score_rows or player.restricted:
+        personal_best = await leaderboards_usecases.fetch_personal_best(
+            map_md5,
+            mode,
+            scoring_metric,
+            player.id,
         )
 
-        if personal_best_score_row is not None:
-            # calculate the rank of the score.
-            p_best_rank = 1 + await app.state.services.database.fetch_val(
-                "SELECT COUNT(*) FROM scores s "
-                "INNER JOIN users u ON u.id = s.userid "
-                "WHERE s.map_md5 = :map_md5 AND s.mode = :mode "
-                "AND s.status = 2 AND u.priv & 1 "
-                f"AND s.{scoring_metric} > :score",
-                {
-                    "map_md5": map_md5,
-                    "mode": mode,
-                    "score": personal_best_score_row["_score"],
-                },
-                column=0,  # COUNT(*)
-            )
+    if (
+        not fetch_filtered
+        and personal_best is not None
+        and personal_best[0]["restricted"]
+        and (include is None or include(personal_best[0]))
+    ):
+        # restricted players may still see their own score.
+        insort(top_score_rows, personal_best[0], key=lambda row: -row["_score"])
+        del top_score_rows[leaderboards_usecases.LEADERBOARD_SIZE :]
 
-            # attach rank to personal best row
-            personal_best_score_row["rank"] = p_best_rank
-    else:
-        score_rows = []
+    personal_best_score_row = None
+    if personal_best is not None:
+        # attach rank to (a copy of) personal best row
+        personal_best_score_row = personal_best[0] | {"rank": personal_best[1]}
+
+    if not top_score_rows:
         personal_best_score_row = None
 
-    return score_rows, personal_best_score_row
+    return top_score_rows, personal_best_score_row
 
 
 SCORE_LISTING_FMTSTR = (
@@ -1314,10 +1343,12 @@ async def getScores(
 
     # check if this md5 has already been  cached as
     # unsubmitted/needs update to reduce osu!api spam
-    if map_md5 in app.state.cache.unsubmitted:
-        return Response(b"-1|false")
+    # (outdated maps are also unknown to the osu!api,
+    # so they may be cached as both; an update wins.)
     if map_md5 in app.state.cache.needs_update:
         return Response(b"1|false")
+    if map_md5 in app.state.cache.unsubmitted:
+        return Response(b"-1|false")
 
     if mods_arg & Mods.RELAX:
         if mode_arg == 3:  # rx!mania doesn't exist
@@ -1338,6 +1369,7 @@ async def getScores(
     if mode != player.status.mode:
         player.status.mods = mods
         player.status.mode = mode
+        player.invalidate_packets()
 
         if not player.restricted:
             app.state.sessions.players.enqueue(app.packets.user_stats(player))
@@ -1401,7 +1433,11 @@ async def getScores(
         # map still not found, figure out whether it needs an
         # update or isn't submitted using its filename.
 
-        if has_set_id and map_set_id not in app.state.cache.beatmapset:
+        cached_set = (
+            app.state.cache.beatmaps.get_set(map_set_id) if has_set_id else None
+        )
+
+        if has_set_id and cached_set is None:
             # set not cached, it doesn't exist
             app.state.cache.unsubmitted.add(map_md5)
             return Response(b"-1|false")
@@ -1409,9 +1445,9 @@ async def getScores(
         map_filename = unquote_plus(map_filename)  # TODO: is unquote needed?
 
         map_exists = False
-        if has_set_id:
+        if cached_set is not None:
             # we can look it up in the specific set from cache
-            for bmap in app.state.cache.beatmapset[map_set_id].maps:
+            for bmap in cached_set.maps:
                 if map_filename == bmap.filename:
                     map_exists = True
                     break
@@ -1431,6 +1467,7 @@ async def getScores(
         if map_exists:
             # map can be updated.
             app.state.cache.needs_update.add(map_md5)
+            app.state.cache.unsubmitted.discard(map_md5)
             return Response(b"1|false")
         else:
             # map is unsubmitted.
@@ -1450,7 +1487,6 @@ async def getScores(
         return Response(f"{int(bmap.status)}|false".encode())
 
     # fetch scores & personal best
-    # TODO: create a leaderboard cache
     if not requesting_from_editor_song_select:
         score_rows, personal_best_score_row = await get_leaderboard_scores(
             leaderboard_type,
@@ -1489,21 +1525,9 @@ async def getScores(
         return Response("\n".join(response_lines).encode())
 
     if personal_best_score_row is not None:
-        user_clan = (
-            await clans_repo.fetch_one(id=player.clan_id)
-            if player.clan_id is not None
-            else None
-        )
-        display_name = (
-            f"[{user_clan['tag']}] {player.name}"
-            if user_clan is not None
-            else player.name
-        )
         response_lines.append(
             SCORE_LISTING_FMTSTR.format(
                 **personal_best_score_row,
-                name=display_name,
-                userid=player.id,
                 score=int(round(personal_best_score_row["_score"])),
                 has_replay="1",
             ),
@@ -6,7 +6,10 @@ import io
 import pprint
 import sys
 from collections.abc import AsyncIterator
+from collections.abc import Coroutine
+from collections.abc import Iterator
 from contextlib import asynccontextmanager
+from contextlib import contextmanager
 from typing import Any
 
 import starlette.routing
@@ -24,13 +27,18 @@ from starlette.requests import ClientDisconnect
 import app.bg_loops
 import app.settings
 import app.state
+import app.usecases.performance
 import app.utils
 from app.api import api_router  # type: ignore[attr-defined]
 from app.api import domains
 from app.api import middlewares
 from app.logging import Ansi
 from app.logging import log
+from app.logging import magnitude_fmt_time
 from app.objects import collections
+from app.timer import Timer
+from app.usecases import score_checksums as score_checksums_usecases
+from app.usecases import session_snapshots as session_snapshots_usecases
 
 
 class BanchoAPI(FastAPI):
@@ -67,6 +75,38 @@ class BanchoAPI(FastAPI):
         return self.openapi_schema
 
 
+@contextmanager
+def startup_phase(name: str) -> Iterator[None]:
+    """Time a phase of the startup process."""
+    with Timer() as timer:
+        yield
+
+    app.state.startup_timings[name] = timer.elapsed()
+    log(f"{name} took {magnitude_fmt_time(timer.elapsed() * 1e9)}.", Ansi.LBLUE)
+
+
+def start_warmup(name: str, coro: Coroutine[Any, Any, None]) -> None:
+    """Run a startup phase in the background; the server
+    is reported as ready once all of them have completed,
+    and as degraded if any of them have failed."""
+    app.state.pending_warmups.add(name)
+
+    async def run_warmup() -> None:
+        try:
+            with startup_phase(name):
+                await coro
+        except Exception as exc:
+            app.state.failed_warmups.add(name)
+            log(f"{name} failed: {exc!r}", Ansi.LRED)
+        finally:
+            app.state.pending_warmups.discard(name)
+
+        if not app.state.pending_warmups:
+            log("Server is ready.", Ansi.LGREEN)
+
+    app.state.sessions.housekeeping_tasks.add(asyncio.create_task(run_warmup()))
+
+
 @asynccontextmanager
 async def lifespan(asgi_app: BanchoAPI) -> AsyncIterator[None]:
     import time
@@ -85,8 +125,11 @@ async def lifespan(asgi_app: BanchoAPI) -> AsyncIterator[None]:
             Ansi.LYELLOW,
         )
 
-    await app.state.services.database.connect()
-    await app.state.services.redis.initialize()  # type: ignore[unused-awaitable]
+    with startup_phase("Connecting to services"):
+        await asyncio.gather(
+            app.state.services.database.connect(),
+            app.state.services.redis.initialize(),
+        )
 
     if app.state.services.datadog is not None:
         app.state.services.datadog.start(  # type: ignore[no-untyped-call]
@@ -97,14 +140,50 @@ async def lifespan(asgi_app: BanchoAPI) -> AsyncIterator[None]:
 
     app.state.services.ip_resolver = app.state.services.IPResolver()
 
-    await app.state.services.run_sql_migrations()
+    with startup_phase("Running sql migrations"):
+        await app.state.services.run_sql_migrations()
 
-    await collections.initialize_ram_caches()
-    await collections.initialize_leaderboards()
+    with startup_phase("Initializing ram caches"):
+        await collections.initialize_ram_caches()
+
+    with startup_phase("Loading .osu file index"):
+        await asyncio.to_thread(app.state.cache.osu_files.load)
+
+    if app.settings.RESTORE_SESSIONS:
+        with startup_phase("Restoring sessions"):
+            await session_snapshots_usecases.restore()
+
+    # leaderboards are rebuilt in the background; until they're swapped
+    # in, ranks are served from those left in redis by the last run.
+    start_warmup("Loading leaderboards", collections.initialize_leaderboards())
+    start_warmup(
+        "Populating score checksum filter",
+        score_checksums_usecases.populate(),
+    )
+
+    warmups = {
+        "Downloading missing assets": asyncio.to_thread(
+            app.utils.download_missing_assets,
+        ),
+        "Starting pp calculation workers": app.usecases.performance.start_executor(),
+    }
+
+    if app.settings.FAST_START:
+        for name, coro in warmups.items():
+            start_warmup(name, coro)
+    else:
+        for name, coro in warmups.items():
+            with startup_phase(name):
+                await coro
 
     await app.bg_loops.initialize_housekeeping_tasks()
+    app.state.sessions.background_jobs.start()
+    app.state.sessions.ingame_logins_writer.start()
+    app.state.sessions.client_hashes_writer.start()
+    app.state.sessions.beatmap_refreshes.start()
 
-    log("Startup process complete.", Ansi.LGREEN)
+    startup_time = time.time() - app.state.server_start_time
+    log(f"Startup process complete in {startup_time:.2f}s.", Ansi.LGREEN)
     log(
         f"Listening @ {app.settings.APP_HOST}:{app.settings.APP_PORT}",
         Ansi.LMAGENTA,
@@ -112,10 +191,25 @@ async def lifespan(asgi_app: BanchoAPI) -> AsyncIterator[None]:
 
     yield
 
+    if app.settings.RESTORE_SESSIONS:
+        # save online sessions before anything else is torn down,
+        # so clients can continue using their tokens after a restart.
+        await session_snapshots_usecases.save()
+
     # we want to attempt to gracefully finish any ongoing connections
     # and shut down any of the housekeeping tasks running in the background.
     await app.state.sessions.cancel_housekeeping_tasks()
 
+    # let any queued background jobs finish while our services are still up.
+    await app.state.sessions.background_jobs.stop()
+    await app.state.sessions.beatmap_refreshes.stop()
+    await app.state.sessions.ingame_logins_writer.stop()
+    await app.state.sessions.client_hashes_writer.stop()
+
+    await app.usecases.performance.shutdown_executor()
+
+    app.state.cache.osu_files.save()
+
     # shutdown services
 
     await app.state.services.http_client.aclose()
@@ -4,6 +4,7 @@ from __future__ import annotations
 
 import hashlib
 import struct
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path as SystemPath
 from typing import Literal
 
@@ -45,6 +46,7 @@ http_bearer_scheme = HTTPBearer(auto_error=False)
 #       These APIs may be deprecated in the future.
 
 # Unauthorized (no api key required)
+# GET /health: return whether the server has finished warming up, with startup timings.
 # GET /search_players: returns a list of matching users, based on a passed string, sorted by ascending ID.
 # GET /get_player_count: return total registered & online player counts.
 # GET /get_player_info: return info or stats for a given player.
@@ -124,10 +126,17 @@ async def api_calculate_pp(
             ),
         )
 
-    results = app.usecases.performance.calculate_performances(
-        str(BEATMAPS_PATH / f"{beatmap.id}.osu"),
-        scores,
-    )
+    try:
+        results = await app.usecases.performance.calculate_performances_in_executor(
+            str(BEATMAPS_PATH / f"{beatmap.id}.osu"),
+            scores,
+            beatmap.md5,
+        )
+    except (TimeoutError, BrokenProcessPool):
+        return ORJSONResponse(
+            {"status": "Failed to calculate pp."},
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
 
     # "Inject" the accuracy into the list of results
     final_results = [
@@ -146,6 +155,31 @@ async def api_calculate_pp(
     )
 
 
+@router.get("/health")
+async def api_health() -> Response:
+    """Report whether all of the server's warm-ups have completed."""
+    ready = not app.state.pending_warmups
+
+    if not ready:
+        health_status = "warming up"
+    elif app.state.failed_warmups:
+        health_status = "degraded"
+    else:
+        health_status = "ready"
+
+    return ORJSONResponse(
+        {
+            "status": health_status,
+            "pending": sorted(app.state.pending_warmups),
+            "failed": sorted(app.state.failed_warmups),
+            "startup_timings": app.state.startup_timings,
+        },
+        status_code=(
+            status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE
+        ),
+    )
+
+
 @router.get("/search_players")
 async def api_search_players(
     search: str | None = Query(None, alias="q", min=2, max=32),
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable
+from collections.abc import Callable
+from typing import Generic
+from typing import TypeVar
+
+from app.logging import Ansi
+from app.logging import log
+
+T = TypeVar("T")
+
+
+class BatchWriter(Generic[T]):
+    """\
+    A buffer of rows to be written in the background, in batches.
+
+    Used to take write-only work (e.g. audit logs) off of the request
+    path; many rows can be inserted in a single query.
+
+    Possibly confusing attributes
+    -----------
+    flush_interval: `float`
+        The longest (in seconds) a row is buffered before being written,
+        unless `max_batch_size` rows are buffered first.
+
+    max_buffered: `int`
+        The most rows kept for a retry when a write fails; beyond
+        this, the rows of failed writes are dropped.
+
+    Intended Usage:
+    >>> writer = BatchWriter("client_hashes", client_hashes_repo.create_many)
+    >>> writer.add({"userid": player.id, ...})
+    """
+
+    def __init__(
+        self,
+        name: str,
+        write: Callable[[list[T]], Awaitable[object]],
+        max_batch_size: int = 100,
+        flush_interval: float = 1.0,
+    ) -> None:
+        self.name = name
+        self.write = write
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.max_buffered = max_batch_size * 10
+
+        self._rows: list[T] = []
+        self._batch_ready = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+        self._stopping = False
+
+        self.written = 0
+        self.dropped = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"<{self.name}: {len(self._rows)} buffered, "
+            f"{self.written} written, {self.dropped} dropped>"
+        )
+
+    def add(self, row: T) -> None:
+        """Buffer `row` to be written in the next batch."""
+        self._rows.append(row)
+
+        if len(self._rows) == self.max_batch_size:
+            self._batch_ready.set()
+
+    def start(self) -> None:
+        """Start flushing batches on the running event loop."""
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop flushing batches, writing any rows still buffered."""
+        if self._task is not None:
+            # let any write in progress finish, rather than cancelling it.
+            self._stopping = True
+            self._batch_ready.set()
+            await self._task
+            self._task = None
+
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Write all buffered rows, `max_batch_size` at a time."""
+        while self._rows:
+            rows = self._rows[: self.max_batch_size]
+            del self._rows[: self.max_batch_size]
+
+            try:
+                await self.write(rows)
+            except Exception as exc:
+                log(
+                    f"{self.name}: failed to write {len(rows)} rows: {exc!r}",
+                    Ansi.LRED,
+                )
+
+                # keep the rows for the next flush, unless we're far behind.
+                if len(self._rows) + len(rows) <= self.max_buffered:
+                    self._rows[:0] = rows
+                else:
+                    self.dropped += len(rows)
+                return
+
+            self.written += len(rows)
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), self.flush_interval)
+            except TimeoutError:
+                pass
+
+            self._batch_ready.clear()
+            await self.flush()
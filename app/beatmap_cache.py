@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import sys
+from collections import OrderedDict
+from collections.abc import Container
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from app.objects.beatmap import Beatmap
+    from app.objects.beatmap import BeatmapSet
+
+
+def estimate_size(beatmap_set: BeatmapSet) -> int:
+    """A rough estimate of the memory used by a beatmap set & its maps."""
+    size = sys.getsizeof(beatmap_set) + sys.getsizeof(beatmap_set.__dict__)
+    size += sys.getsizeof(beatmap_set.maps)
+
+    for bmap in beatmap_set.maps:
+        attrs = bmap.__dict__
+        size += sys.getsizeof(bmap) + sys.getsizeof(attrs)
+        size += sum(sys.getsizeof(v) for k, v in attrs.items() if k != "set")
+
+    return size
+
+
+class BeatmapCache:
+    """\
+    An in-memory cache of beatmap sets, and their maps by md5 & id.
+
+    Sets are evicted along with all of their maps, least recently used
+    first, once the cache holds more than `max_sets` sets or `max_bytes`
+    (estimated) bytes; a limit of 0 disables it.
+
+    Possibly confusing attributes
+    -----------
+    _sets: OrderedDict[`int`, `BeatmapSet`]
+        The cached sets by id, from least to most recently used.
+
+    _maps: dict[`str | int`, `Beatmap`]
+        Each cached set's maps, by both md5 and id.
+
+    _keys: dict[`int`, list[`str | int`]]
+        The `_maps` keys of each cached set, as of when it was cached;
+        a set's maps may change (e.g. on update) while it's cached.
+
+    Intended Usage:
+    >>> bmap = app.state.cache.beatmaps.get_map(md5)
+    >>> app.state.cache.beatmaps.add_set(bmap_set)
+    """
+
+    def __init__(self, max_sets: int = 0, max_bytes: int = 0) -> None:
+        self.max_sets = max_sets
+        self.max_bytes = max_bytes
+
+        self._sets: OrderedDict[int, BeatmapSet] = OrderedDict()
+        self._maps: dict[str | int, Beatmap] = {}
+        self._keys: dict[int, list[str | int]] = {}
+        self._sizes: dict[int, int] = {}
+        self.total_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __repr__(self) -> str:
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups else 0.0
+        return (
+            f"<{len(self._sets):,} sets, {len(self._maps) // 2:,} maps, "
+            f"{self.total_bytes / 1024**2:.1f}MB, {hit_rate:.1%} hit rate, "
+            f"{self.evictions} evicted, {self.expirations} expired>"
+        )
+
+    def __len__(self) -> int:
+        return len(self._sets)
+
+    def get_map(self, key: str | int) -> Beatmap | None:
+        """Fetch a cached map by md5 or id."""
+        bmap = self._maps.get(key)
+        if bmap is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        if bmap.set.id in self._sets:
+            self._sets.move_to_end(bmap.set.id)
+        return bmap
+
+    def get_set(self, bsid: int) -> BeatmapSet | None:
+        """Fetch a cached set by id."""
+        beatmap_set = self._sets.get(bsid)
+        if beatmap_set is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._sets.move_to_end(bsid)
+        return beatmap_set
+
+    def add_set(self, beatmap_set: BeatmapSet) -> None:
+        """Cache a set & its maps (again, if its maps have changed)."""
+        self._unindex(beatmap_set.id)
+
+        keys: list[str | int] = []
+        for bmap in beatmap_set.maps:
+            self._maps[bmap.md5] = bmap
+            self._maps[bmap.id] = bmap
+            keys += (bmap.md5, bmap.id)
+
+        size = estimate_size(beatmap_set)
+
+        self._sets[beatmap_set.id] = beatmap_set
+        self._sets.move_to_end(beatmap_set.id)
+        self._keys[beatmap_set.id] = keys
+        self._sizes[beatmap_set.id] = size
+        self.total_bytes += size
+
+        self._evict_to_limits()
+
+    def refresh_set(self, beatmap_set: BeatmapSet) -> None:
+        """Re-index a set's maps after they've changed, if it's cached."""
+        if self._sets.get(beatmap_set.id) is beatmap_set:
+            self.add_set(beatmap_set)
+
+    def remove_set(self, bsid: int) -> None:
+        """Remove a set & its maps from the cache."""
+        self._unindex(bsid)
+        self._sets.pop(bsid, None)
+
+    def evict_expired(self, keep: Container[int] = ()) -> int:
+        """\
+        Remove sets which are due for an update from the osu!api,
+        other than those in `keep` (e.g. those queued for an update).
+
+        Sets in use are queued for an update when they expire (see
+        `Beatmap.from_md5`); others weren't used since, and aren't
+        worth keeping.
+        """
+        expired = [
+            bsid
+            for bsid, s in self._sets.items()
+            if s._cache_expired() and bsid not in keep
+        ]
+        for bsid in expired:
+            self.remove_set(bsid)
+
+        self.expirations += len(expired)
+        return len(expired)
+
+    def _unindex(self, bsid: int) -> None:
+        for key in self._keys.pop(bsid, ()):
+            bmap = self._maps.get(key)
+            # the map may since be cached under another set.
+            if bmap is not None and bmap.set.id == bsid:
+                del self._maps[key]
+
+        self.total_bytes -= self._sizes.pop(bsid, 0)
+
+    def _evict_to_limits(self) -> None:
+        # always keep the most recently cached set.
+        while len(self._sets) > 1 and (
+            (self.max_sets and len(self._sets) > self.max_sets)
+            or (self.max_bytes and self.total_bytes > self.max_bytes)
+        ):
+            bsid = next(iter(self._sets))
+            self.remove_set(bsid)
+            self.evictions += 1
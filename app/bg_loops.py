@@ -6,10 +6,10 @@ import time
 import app.packets
 import app.settings
 import app.state
-from app.constants.gamemodes import GameMode
 from app.constants.privileges import Privileges
 from app.logging import Ansi
 from app.logging import log
+from app.objects import collections
 
 OSU_CLIENT_MIN_PING_INTERVAL = 300000 // 1000  # defined by osu!
 
@@ -27,6 +27,8 @@ async def initialize_housekeeping_tasks() -> None:
                 _remove_expired_donation_privileges(interval=30 * 60),
                 _update_bot_status(interval=5 * 60),
                 _disconnect_ghosts(interval=OSU_CLIENT_MIN_PING_INTERVAL // 3),
+                _evict_expired_beatmaps(interval=10 * 60),
+                _save_osu_file_index(interval=5 * 60),
             )
         },
     )
@@ -87,63 +89,41 @@ async def _update_bot_status(interval: int) -> None:
     """Re roll the bot status, every `interval`."""
     while True:
         await asyncio.sleep(interval)
-        app.packets.bot_stats.cache_clear()
+        app.state.sessions.bot.invalidate_packets()
 
 
-async def rebuild_redis_leaderboards() -> None:
-    """Rebuild Redis leaderboards from database on server startup."""
-    log("Rebuilding Redis leaderboards from database...", Ansi.LCYAN)
-
-    # Get all game modes (0-11: vanilla, relax, autopilot)
-    all_modes = list(range(12))
-
-    for mode_value in all_modes:
-        try:
-            mode = GameMode(mode_value)
-        except ValueError:
-            continue
-
-        # Clear existing leaderboard data for this mode
-        await app.state.services.redis.delete(f"bancho:leaderboard:{mode_value}")
-
-        # Fetch all users with unrestricted privileges and their stats
-        users = await app.state.services.database.fetch_all(
-            "SELECT s.id, s.pp, u.country "
-            "FROM stats s "
-            "INNER JOIN users u ON s.id = u.id "
-            "WHERE s.mode = :mode AND u.priv & :unrestricted AND s.pp > 0",
-            {"mode": mode_value, "unrestricted": Privileges.UNRESTRICTED.value},
-        )
+async def _evict_expired_beatmaps(interval: int) -> None:
+    """Evict unused, expired beatmap sets from the cache, every `interval`."""
+    while True:
+        await asyncio.sleep(interval)
+        beatmaps = app.state.cache.beatmaps
+
+        expired = beatmaps.evict_expired(keep=app.state.sessions.beatmap_refreshes)
+        if app.settings.DEBUG:
+            log(f"Evicted {expired} expired beatmap sets.", Ansi.LMAGENTA)
+
+        if app.state.services.datadog:
+            for name, value in (
+                ("sets", len(beatmaps)),
+                ("bytes", beatmaps.total_bytes),
+                ("hits", beatmaps.hits),
+                ("misses", beatmaps.misses),
+                ("evictions", beatmaps.evictions),
+                ("expirations", beatmaps.expirations),
+            ):
+                app.state.services.datadog.gauge(  # type: ignore[no-untyped-call]
+                    f"bancho.beatmap_cache.{name}",
+                    value,
+                )
 
-        if not users:
-            continue
 
-        # Build global leaderboard
-        global_leaderboard = {str(user["id"]): user["pp"] for user in users}
-        if global_leaderboard:
-            await app.state.services.redis.zadd(
-                f"bancho:leaderboard:{mode_value}",
-                global_leaderboard,
-            )
+async def _save_osu_file_index(interval: int) -> None:
+    """Save the .osu file index to disk (if it's changed), every `interval`."""
+    while True:
+        await asyncio.sleep(interval)
+        await asyncio.to_thread(app.state.cache.osu_files.save)
 
-        # Build country leaderboards
-        country_leaderboards: dict[str, dict[str, float]] = {}
-        for user in users:
-            country = user["country"]
-            if country not in country_leaderboards:
-                country_leaderboards[country] = {}
-            country_leaderboards[country][str(user["id"])] = user["pp"]
-
-        # Clear and populate country leaderboards
-        for country, leaderboard in country_leaderboards.items():
-            leaderboard_key = f"bancho:leaderboard:{mode_value}:{country}"
-            await app.state.services.redis.delete(leaderboard_key)
-            if leaderboard:
-                await app.state.services.redis.zadd(leaderboard_key, leaderboard)
-
-        log(
-            f"Rebuilt mode {mode_value} ({mode!r}) leaderboard with {len(users)} users.",
-            Ansi.LGREEN,
-        )
 
-    log("Redis leaderboard rebuild complete!", Ansi.LGREEN)
+async def rebuild_redis_leaderboards() -> None:
+    """Rebuild Redis leaderboards from database."""
+    await collections.initialize_leaderboards()
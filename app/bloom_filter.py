@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import hashlib
+import math
+
+
+class BloomFilter:
+    """\
+    A probabilistic set of strings, which can't be iterated or removed from.
+
+    Membership checks may return false positives (at roughly
+    `error_rate`, once `capacity` keys have been added), but
+    never false negatives.
+
+    Possibly confusing attributes
+    -----------
+    populated: `bool`
+        Whether all existing keys have been added to the filter; until
+        then, a negative membership check doesn't rule anything out.
+
+    positives & false_positives: `int`
+        The number of membership checks which returned True, and how
+        many of those the caller found to be wrong (reported through
+        `record_false_positive`).
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001) -> None:
+        self.capacity = capacity
+        self.error_rate = error_rate
+
+        # optimal bit & hash counts for the given capacity & error rate.
+        self.num_bits = max(
+            8,
+            math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2),
+        )
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.bits_set = 0
+        self.count = 0
+
+        self.populated = False
+
+        self.lookups = 0
+        self.positives = 0
+        self.false_positives = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"<{self.count:,} keys, {self.memory_usage / 1024**2:.1f}MB, "
+            f"{self.estimated_false_positive_rate:.3%} est. fp rate, "
+            f"{self.false_positives}/{self.lookups} false positives>"
+        )
+
+    def _positions(self, key: str) -> list[int]:
+        # derive each hash from two halves of a single digest.
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key: str) -> None:
+        bits = self.bits
+        for pos in self._positions(key):
+            byte, mask = pos >> 3, 1 << (pos & 7)
+            if not bits[byte] & mask:
+                bits[byte] |= mask
+                self.bits_set += 1
+
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        self.lookups += 1
+
+        bits = self.bits
+        for pos in self._positions(key):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+
+        self.positives += 1
+        return True
+
+    def record_false_positive(self) -> None:
+        self.false_positives += 1
+
+    @property
+    def memory_usage(self) -> int:
+        """The size of the filter's bit array, in bytes."""
+        return len(self.bits)
+
+    @property
+    def estimated_false_positive_rate(self) -> float:
+        """The probability of a false positive, given the bits set so far."""
+        return (self.bits_set / self.num_bits) ** self.num_hashes
@@ -13,6 +13,7 @@ from collections.abc import Awaitable
 from collections.abc import Callable
 from collections.abc import Mapping
 from collections.abc import Sequence
+from concurrent.futures.process import BrokenProcessPool
 from dataclasses import dataclass
 from datetime import datetime
 from datetime import timedelta
@@ -63,6 +64,8 @@ from app.repositories import maps as maps_repo
 from app.repositories import tourney_pool_maps as tourney_pool_maps_repo
 from app.repositories import tourney_pools as tourney_pools_repo
 from app.repositories import users as users_repo
+from app.usecases import leaderboards as leaderboards_usecases
+from app.usecases import top_scores as top_scores_usecases
 from app.usecases.performance import ScoreParams
 
 if TYPE_CHECKING:
@@ -280,6 +283,11 @@ async def changename(ctx: Context) -> str | None:
     # all checks passed, update their name
     await users_repo.partial_update(ctx.player.id, name=name)
 
+    ctx.player.name = name
+    app.state.sessions.players.reindex(ctx.player)
+    ctx.player.invalidate_packets()
+    leaderboards_usecases.invalidate_user(ctx.player.id)
+
     ctx.player.enqueue(
         app.packets.notification(f"Your username has been changed to {name}!"),
     )
@@ -514,10 +522,14 @@ async def _with(ctx: Context) -> str | None:
         score_args.acc = acc
         msg_fields.append(f"{acc:.2f}%")
 
-    result = app.usecases.performance.calculate_performances(
-        osu_file_path=str(BEATMAPS_PATH / f"{bmap.id}.osu"),
-        scores=[score_args],  # calculate one score
-    )
+    try:
+        result = await app.usecases.performance.calculate_performances_in_executor(
+            osu_file_path=str(BEATMAPS_PATH / f"{bmap.id}.osu"),
+            scores=[score_args],  # calculate one score
+            osu_file_md5=bmap.md5,
+        )
+    except (TimeoutError, BrokenProcessPool):
+        return "Failed to calculate pp for this map."
 
     return "{msg}: {pp:.2f}pp ({stars:.2f}*)".format(
         msg=" ".join(msg_fields),
@@ -659,9 +671,11 @@ async def _map(ctx: Context) -> str | None:
                 await maps_repo.partial_update(_bmap.id, status=new_status, frozen=True)
 
             # make sure cache and db are synced about the newest change
-            for _bmap in app.state.cache.beatmapset[bmap.set_id].maps:
-                _bmap.status = new_status
-                _bmap.frozen = True
+            cached_set = app.state.cache.beatmaps.get_set(bmap.set_id)
+            if cached_set is not None:
+                for _bmap in cached_set.maps:
+                    _bmap.status = new_status
+                    _bmap.frozen = True
 
             # select all map ids for clearing map requests.
             modified_beatmap_ids = [
@@ -676,15 +690,19 @@ async def _map(ctx: Context) -> str | None:
             await maps_repo.partial_update(bmap.id, status=new_status, frozen=True)
 
             # make sure cache and db are synced about the newest change
-            if bmap.md5 in app.state.cache.beatmap:
-                app.state.cache.beatmap[bmap.md5].status = new_status
-                app.state.cache.beatmap[bmap.md5].frozen = True
+            cached = app.state.cache.beatmaps.get_map(bmap.md5)
+            if cached is not None:
+                cached.status = new_status
+                cached.frozen = True
 
             modified_beatmap_ids = [bmap.id]
 
         # deactivate rank requests for all ids
         await map_requests_repo.mark_batch_as_inactive(map_ids=modified_beatmap_ids)
 
+    # the maps' scores may now count towards players' totals, or no longer.
+    top_scores_usecases.invalidate_all()
+
     return f"{bmap.embed} updated to {new_status!s}."
 
 
@@ -891,7 +909,7 @@ async def user(ctx: Context) -> str | None:
             f"Last /np: {last_np}",
             f"Recent score: {player.recent_score}",
             f"Match: {player.match}",
-            f"Spectators: {player.spectators}",
+            f"Spectators: {player.spectators} | Relay: {player.spectator_relay}",
         ),
     )
 
@@ -1053,6 +1071,37 @@ async def recalc(ctx: Context) -> str | None:
     )
 
 
+@command(Privileges.DEVELOPER, hidden=True)
+async def checktotals(ctx: Context) -> str | None:
+    """Verify an online player's cached pp & acc totals against sql."""
+    if not ctx.args:
+        player = ctx.player
+    else:
+        maybe_player = app.state.sessions.players.get(name=" ".join(ctx.args))
+        if maybe_player is None:
+            return "Player not found (they must be online)."
+
+        player = maybe_player
+
+    lines = []
+
+    for mode, stats in player.stats.items():
+        if stats.top_scores is None:
+            continue  # not yet loaded
+
+        discrepancies = await top_scores_usecases.check_consistency(
+            player.id,
+            mode,
+            stats.top_scores,
+        )
+        lines.append(f"{mode!r}: {', '.join(discrepancies) or 'consistent'}")
+
+    if not lines:
+        return f"{player} has no cached totals."
+
+    return "\n".join(lines)
+
+
 @command(Privileges.DEVELOPER, hidden=True)
 async def debug(ctx: Context) -> str | None:
     """Toggle the console's debug setting."""
@@ -1178,6 +1227,7 @@ async def wipemap(ctx: Context) -> str | None:
         "DELETE FROM scores WHERE map_md5 = :map_md5",
         {"map_md5": map_md5},
     )
+    leaderboards_usecases.invalidate_maps({map_md5})
 
     return "Scores wiped."
 
@@ -1276,6 +1326,12 @@ async def server(ctx: Context) -> str | None:
             f"search mirror: {mirror_search_url} | download mirror: {mirror_download_url}",
             f"osu!api connection: {using_osuapi}",
             f"advanced mode: {advanced_mode} | auto logging: {auto_logging}",
+            f"score checksum filter: {app.state.cache.score_checksums!r}",
+            f"beatmap cache: {app.state.cache.beatmaps!r}",
+            f"beatmap fetches: {app.state.sessions.beatmap_fetches!r}",
+            f"beatmap refreshes: {app.state.sessions.beatmap_refreshes!r}",
+            f".osu file index: {app.state.cache.osu_files!r}",
+            f"login admission: {app.state.sessions.login_admission!r}",
             "",
             "requirements",
             requirements_info,
@@ -2340,6 +2396,7 @@ async def clan_create(ctx: Context) -> str | None:
         clan_id=new_clan["id"],
         clan_priv=ClanPrivileges.Owner,
     )
+    leaderboards_usecases.invalidate_user(ctx.player.id)
 
     # announce clan creation
     announce_chan = app.state.sessions.channels.get_by_name("#announce")
@@ -2380,6 +2437,7 @@ async def clan_disband(ctx: Context) -> str | None:
     ]
     for member_id in clan_member_ids:
         await users_repo.partial_update(member_id, clan_id=0, clan_priv=0)
+        leaderboards_usecases.invalidate_user(member_id)
 
         member = app.state.sessions.players.get(id=member_id)
         if member:
@@ -2433,6 +2491,7 @@ async def clan_leave(ctx: Context) -> str | None:
     clan_members = await users_repo.fetch_many(clan_id=clan["id"])
 
     await users_repo.partial_update(ctx.player.id, clan_id=0, clan_priv=0)
+    leaderboards_usecases.invalidate_user(ctx.player.id)
     ctx.player.clan_id = None
     ctx.player.clan_priv = None
 
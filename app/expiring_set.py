@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import time
+
+
+class ExpiringSet:
+    """\
+    A set of strings, each of which is removed `ttl` seconds after it
+    was (last) added.
+
+    Possibly confusing attributes
+    -----------
+    _expiries: dict[`str`, `float`]
+        The monotonic time each key expires at; since every key has the
+        same ttl, insertion order is also expiry order.
+
+    max_size: `int`
+        Once reached, the oldest keys are removed before they expire.
+    """
+
+    def __init__(self, ttl: float, max_size: int = 100_000) -> None:
+        self.ttl = ttl
+        self.max_size = max_size
+
+        self._expiries: dict[str, float] = {}
+
+    def __repr__(self) -> str:
+        return f"<{len(self._expiries):,} keys, {self.ttl:g}s ttl>"
+
+    def __len__(self) -> int:
+        return len(self._expiries)
+
+    def __contains__(self, key: str) -> bool:
+        expiry = self._expiries.get(key)
+        if expiry is None:
+            return False
+
+        if expiry <= time.monotonic():
+            del self._expiries[key]
+            return False
+
+        return True
+
+    def add(self, key: str) -> None:
+        now = time.monotonic()
+
+        self._expiries.pop(key, None)
+        self._expiries[key] = now + self.ttl
+
+        # drop expired & excess keys from the front.
+        while len(self._expiries) > 1:
+            oldest = next(iter(self._expiries))
+            if self._expiries[oldest] > now and len(self._expiries) <= self.max_size:
+                break
+            del self._expiries[oldest]
+
+    def discard(self, key: str) -> None:
+        self._expiries.pop(key, None)
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import asyncio
+import secrets
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+import app.state
+
+# compare-and-delete, so we never release a lock which has
+# expired and since been acquired by another process.
+REDIS_RELEASE_SCRIPT = """\
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class _Entry:
+    __slots__ = ("lock", "users")
+
+    def __init__(self) -> None:
+        self.lock = asyncio.Lock()
+        self.users = 0  # the holder & any waiters
+
+
+class KeyedLock:
+    """\
+    A table of locks, keyed by string.
+
+    Each key's lock is created on first use, and removed from the table
+    once it's no longer held or awaited, so the table only ever grows
+    with the number of keys in use at the same time.
+
+    Intended Usage:
+    >>> async with app.state.score_submission_locks(score.client_checksum):
+    ...     ...
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[str, _Entry] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    @asynccontextmanager
+    async def __call__(self, key: str) -> AsyncIterator[None]:
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _Entry()
+
+        entry.users += 1
+        try:
+            async with entry.lock:
+                yield
+        finally:
+            entry.users -= 1
+            if entry.users == 0:
+                del self._entries[key]
+
+
+class RedisKeyedLock(KeyedLock):
+    """\
+    A table of locks, keyed by string, shared between processes via redis.
+
+    Waiters within this process queue on a local lock first, so only
+    one of them at a time polls redis for a given key.
+
+    Possibly confusing attributes
+    -----------
+    expiry: `float`
+        Seconds after which a held lock is released by redis, in
+        case the process holding it dies before releasing it.
+    """
+
+    def __init__(
+        self,
+        prefix: str,
+        expiry: float = 30.0,
+        acquire_timeout: float = 30.0,
+    ) -> None:
+        super().__init__()
+        self.prefix = prefix
+        self.expiry = expiry
+        self.acquire_timeout = acquire_timeout
+
+    @asynccontextmanager
+    async def __call__(self, key: str) -> AsyncIterator[None]:
+        async with super().__call__(key):
+            redis_key = f"{self.prefix}:{key}"
+            token = secrets.token_hex(16)
+
+            deadline = time.monotonic() + self.acquire_timeout
+            delay = 0.005
+
+            while not await app.state.services.redis.set(
+                redis_key,
+                token,
+                nx=True,
+                px=int(self.expiry * 1000),
+            ):
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"Timed out acquiring lock {redis_key!r}")
+
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 0.1)
+
+            try:
+                yield
+            finally:
+                release = app.state.services.redis.register_script(
+                    REDIS_RELEASE_SCRIPT,
+                )
+                await release(keys=[redis_key], args=[token])
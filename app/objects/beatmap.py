@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 import functools
-import hashlib
 from collections import defaultdict
 from collections.abc import Mapping
 from datetime import datetime
@@ -23,6 +22,8 @@ from app.constants.gamemodes import GameMode
 from app.logging import Ansi
 from app.logging import log
 from app.repositories import maps as maps_repo
+from app.usecases import leaderboards as leaderboards_usecases
+from app.usecases import top_scores as top_scores_usecases
 from app.utils import escape_enum
 from app.utils import pymysql_encode
 
@@ -185,17 +186,17 @@ def disk_has_expected_osu_file(
     beatmap_id: int,
     expected_md5: str | None = None,
 ) -> bool:
-    osu_file_path = BEATMAPS_PATH / f"{beatmap_id}.osu"
-    file_exists = osu_file_path.exists()
-    if file_exists and expected_md5 is not None:
-        osu_file_md5 = hashlib.md5(osu_file_path.read_bytes()).hexdigest()
-        return osu_file_md5 == expected_md5
-    return file_exists
+    if expected_md5 is None:
+        return (BEATMAPS_PATH / f"{beatmap_id}.osu").exists()
+
+    # hashed only if the file has changed since it was last checked.
+    return app.state.cache.osu_files.md5(beatmap_id) == expected_md5
 
 
 def write_osu_file_to_disk(beatmap_id: int, data: bytes) -> None:
     osu_file_path = BEATMAPS_PATH / f"{beatmap_id}.osu"
     osu_file_path.write_bytes(data)
+    app.state.cache.osu_files.record(beatmap_id, data)
 
 
 async def ensure_osu_file_is_available(
@@ -368,6 +369,8 @@ class Beatmap:
     Lower level API:
       Beatmap._from_md5_cache(md5: str, check_updates: bool = True) -> Beatmap | None
       Beatmap._from_bid_cache(bid: int, check_updates: bool = True) -> Beatmap | None
+      Beatmap._from_md5_uncached(md5: str, set_id: int = -1) -> Beatmap | None
+      Beatmap._from_bid_uncached(bid: int) -> Beatmap | None
 
       Beatmap._from_md5_sql(md5: str) -> Beatmap | None
       Beatmap._from_bid_sql(bid: int) -> Beatmap | None
@@ -508,41 +511,17 @@ class Beatmap:
 
         if not bmap:
             # map not found in cache
+            if md5 in app.state.cache.unsubmitted:
+                return None
 
-            # to be efficient, we want to cache the whole set
-            # at once rather than caching the individual map
-
-            if set_id <= 0:
-                # set id not provided - fetch it from the map md5
-                rec = await maps_repo.fetch_one(md5=md5)
-
-                if rec is not None:
-                    # set found in db
-                    set_id = rec["set_id"]
-                else:
-                    # set not found in db, try api
-                    api_data = await api_get_beatmaps(h=md5)
-
-                    if api_data["data"] is None:
-                        return None
-
-                    api_response = api_data["data"]
-                    set_id = int(api_response[0]["beatmapset_id"])
-
-            # fetch (and cache) beatmap set
-            beatmap_set = await BeatmapSet.from_bsid(set_id)
-
-            if beatmap_set is not None:
-                # the beatmap set has been cached - fetch beatmap from cache
-                bmap = await cls._from_md5_cache(md5)
-
-                # XXX:HACK in this case, BeatmapSet.from_bsid will have
-                # ensured the map is up to date, so we can just return it
-                return bmap
+            # concurrent misses for the same map share a single fetch.
+            return await app.state.sessions.beatmap_fetches(
+                f"md5:{md5}",
+                lambda: cls._from_md5_uncached(md5, set_id),
+            )
 
-        if bmap is not None:
-            if bmap.set._cache_expired():
-                await bmap.set._update_if_available()
+        # serve the map, updating its set in the background if it's expired.
+        await bmap.set._refresh_if_expired()
 
         return bmap
 
@@ -554,46 +533,101 @@ class Beatmap:
         if not bmap:
             # map not found in cache
 
-            # to be efficient, we want to cache the whole set
-            # at once rather than caching the individual map
+            # concurrent misses for the same map share a single fetch.
+            return await app.state.sessions.beatmap_fetches(
+                f"bid:{bid}",
+                lambda: cls._from_bid_uncached(bid),
+            )
+
+        # serve the map, updating its set in the background if it's expired.
+        await bmap.set._refresh_if_expired()
+
+        return bmap
+
+    """ Lower level API """
+    # These functions are meant for internal use under
+    # all normal circumstances and should only be used
+    # if you're really modifying bancho.py by adding new
+    # features, or perhaps optimizing parts of the code.
+
+    @classmethod
+    async def _from_md5_uncached(cls, md5: str, set_id: int = -1) -> Beatmap | None:
+        """Fetch a map from the database, or osuapi by md5, caching its set."""
+        # to be efficient, we want to cache the whole set
+        # at once rather than caching the individual map
 
-            rec = await maps_repo.fetch_one(id=bid)
+        if set_id <= 0:
+            # set id not provided - fetch it from the map md5
+            rec = await maps_repo.fetch_one(md5=md5)
 
             if rec is not None:
                 # set found in db
                 set_id = rec["set_id"]
             else:
-                # set not found in db, try getting via api
-                api_data = await api_get_beatmaps(b=bid)
+                # set not found in db, try api
+                api_data = await api_get_beatmaps(h=md5)
 
                 if api_data["data"] is None:
+                    if api_data["status_code"] in (404, 200):
+                        # the map isn't submitted; don't ask again for a while.
+                        app.state.cache.unsubmitted.add(md5)
                     return None
 
                 api_response = api_data["data"]
                 set_id = int(api_response[0]["beatmapset_id"])
 
-            # fetch (and cache) beatmap set
-            beatmap_set = await BeatmapSet.from_bsid(set_id)
+        # fetch (and cache) beatmap set
+        beatmap_set = await BeatmapSet.from_bsid(set_id)
 
-            if beatmap_set is not None:
-                # the beatmap set has been cached - fetch beatmap from cache
-                bmap = await cls._from_bid_cache(bid)
+        if beatmap_set is None:
+            return None
 
-                # XXX:HACK in this case, BeatmapSet.from_bsid will have
-                # ensured the map is up to date, so we can just return it
-                return bmap
+        # the beatmap set has been cached - fetch beatmap from cache
+        bmap = await cls._from_md5_cache(md5)
 
-        if bmap is not None:
-            if bmap.set._cache_expired():
-                await bmap.set._update_if_available()
+        if bmap is None and beatmap_set._cache_expired():
+            # the map may be new to the set; we can't serve it stale.
+            await beatmap_set._update_if_expired()
+            bmap = await cls._from_md5_cache(md5)
 
         return bmap
 
-    """ Lower level API """
-    # These functions are meant for internal use under
-    # all normal circumstances and should only be used
-    # if you're really modifying bancho.py by adding new
-    # features, or perhaps optimizing parts of the code.
+    @classmethod
+    async def _from_bid_uncached(cls, bid: int) -> Beatmap | None:
+        """Fetch a map from the database, or osuapi by id, caching its set."""
+        # to be efficient, we want to cache the whole set
+        # at once rather than caching the individual map
+
+        rec = await maps_repo.fetch_one(id=bid)
+
+        if rec is not None:
+            # set found in db
+            set_id = rec["set_id"]
+        else:
+            # set not found in db, try getting via api
+            api_data = await api_get_beatmaps(b=bid)
+
+            if api_data["data"] is None:
+                return None
+
+            api_response = api_data["data"]
+            set_id = int(api_response[0]["beatmapset_id"])
+
+        # fetch (and cache) beatmap set
+        beatmap_set = await BeatmapSet.from_bsid(set_id)
+
+        if beatmap_set is None:
+            return None
+
+        # the beatmap set has been cached - fetch beatmap from cache
+        bmap = await cls._from_bid_cache(bid)
+
+        if bmap is None and beatmap_set._cache_expired():
+            # the map may be new to the set; we can't serve it stale.
+            await beatmap_set._update_if_expired()
+            bmap = await cls._from_bid_cache(bid)
+
+        return bmap
 
     def _parse_from_osuapi_resp(self, osuapi_resp: dict[str, Any]) -> None:
         """Change internal data with the data in osu!api format."""
@@ -657,12 +691,12 @@ class Beatmap:
     @staticmethod
     async def _from_md5_cache(md5: str) -> Beatmap | None:
         """Fetch a map from the cache by md5."""
-        return app.state.cache.beatmap.get(md5, None)
+        return app.state.cache.beatmaps.get_map(md5)
 
     @staticmethod
     async def _from_bid_cache(bid: int) -> Beatmap | None:
         """Fetch a map from the cache by id."""
-        return app.state.cache.beatmap.get(bid, None)
+        return app.state.cache.beatmaps.get_map(bid)
 
 
 class BeatmapSet:
@@ -689,7 +723,11 @@ class BeatmapSet:
       await BeatmapSet._from_bsid_sql(bsid: int) -> BeatmapSet | None
       await BeatmapSet._from_bsid_osuapi(bsid: int) -> BeatmapSet | None
 
+      await BeatmapSet._from_bsid_uncached(bsid: int) -> BeatmapSet | None
+
       BeatmapSet._cache_expired() -> bool
+      await BeatmapSet._refresh_if_expired() -> None
+      await BeatmapSet._update_if_expired() -> None
       await BeatmapSet._update_if_available() -> None
       await BeatmapSet._save_to_sql() -> None
     """
@@ -754,6 +792,32 @@ class BeatmapSet:
 
         return current_datetime > (self.last_osuapi_check + check_delta)
 
+    async def _refresh_if_expired(self) -> None:
+        """Queue an update of the set from the osu!api if its cache
+        has expired; it's served as-is until the update is done.
+
+        Without the server's refresh workers running (e.g. in tools
+        & scripts), the update is done inline instead."""
+        if not self._cache_expired():
+            return
+
+        if app.state.sessions.beatmap_refreshes.running:
+            app.state.sessions.beatmap_refreshes.request(
+                self.id,
+                self._update_if_expired,
+            )
+        else:
+            await self._update_if_expired()
+
+    async def _update_if_expired(self) -> None:
+        """Update the set from the osu!api if its cache has expired,
+        sharing the update with any concurrent callers."""
+        if self._cache_expired():
+            await app.state.sessions.beatmap_fetches(
+                f"update:{self.id}",
+                self._update_if_available,
+            )
+
     async def _update_if_available(self) -> None:
         """Fetch the newest data from the api, check for differences
         and propogate any update into our cache & database."""
@@ -786,6 +850,7 @@ class BeatmapSet:
 
             updated_maps: list[Beatmap] = []
             map_md5s_to_delete: set[str] = set()
+            ranked_status_changed = False
 
             # temp value for building the new beatmap
             bmap: Beatmap
@@ -800,6 +865,9 @@ class BeatmapSet:
                     new_ranked_status = RankedStatus.from_osuapi(
                         int(new_map["approved"]),
                     )
+                    if old_map.status != new_ranked_status:
+                        ranked_status_changed = True
+
                     if (
                         old_map.md5 != new_map["file_md5"]
                         or old_map.status != new_ranked_status
@@ -831,6 +899,7 @@ class BeatmapSet:
 
             # save changes to cache
             self.maps = updated_maps
+            app.state.cache.beatmaps.refresh_set(self)
 
             # save changes to sql
 
@@ -846,6 +915,7 @@ class BeatmapSet:
                     "DELETE FROM scores WHERE map_md5 IN :map_md5s",
                     {"map_md5s": map_md5s_to_delete},
                 )
+                leaderboards_usecases.invalidate_maps(map_md5s_to_delete)
 
             # update last_osuapi_check
             await app.state.services.database.execute(
@@ -861,6 +931,10 @@ class BeatmapSet:
 
             # update maps in sql
             await self._save_to_sql()
+
+            if ranked_status_changed:
+                # the maps' scores may now count towards players' totals, or no longer.
+                top_scores_usecases.invalidate_all()
         elif api_data["status_code"] in (404, 200):
             # NOTE: 200 can return an empty array of beatmaps,
             #       so we still delete in this case if the beatmap data is None
@@ -882,6 +956,7 @@ class BeatmapSet:
                     "DELETE FROM scores WHERE map_md5 IN :map_md5s",
                     {"map_md5s": map_md5s_to_delete},
                 )
+                leaderboards_usecases.invalidate_maps(map_md5s_to_delete)
 
             # delete set
             await app.state.services.database.execute(
@@ -940,7 +1015,7 @@ class BeatmapSet:
     @staticmethod
     async def _from_bsid_cache(bsid: int) -> BeatmapSet | None:
         """Fetch a mapset from the cache by set id."""
-        return app.state.cache.beatmapset.get(bsid, None)
+        return app.state.cache.beatmaps.get_set(bsid)
 
     @classmethod
     async def _from_bsid_sql(cls, bsid: int) -> BeatmapSet | None:
@@ -1063,6 +1138,22 @@ class BeatmapSet:
         """Cache all maps in a set from the osuapi, optionally
         returning beatmaps by their md5 or id."""
         bmap_set = await cls._from_bsid_cache(bsid)
+
+        if bmap_set is not None:
+            # serve the set, updating it in the background if it's expired.
+            await bmap_set._refresh_if_expired()
+            return bmap_set
+
+        # concurrent misses for the same set share a single fetch.
+        return await app.state.sessions.beatmap_fetches(
+            f"bsid:{bsid}",
+            lambda: cls._from_bsid_uncached(bsid),
+        )
+
+    @classmethod
+    async def _from_bsid_uncached(cls, bsid: int) -> BeatmapSet | None:
+        """Fetch (or update) a set from the database, or osuapi, and cache it."""
+        bmap_set = await cls._from_bsid_cache(bsid)
         did_api_request = False
 
         if not bmap_set:
@@ -1079,8 +1170,12 @@ class BeatmapSet:
         # TODO: this can be done less often for certain types of maps,
         # such as ones that're ranked on bancho and won't be updated,
         # and perhaps ones that haven't been updated in a long time.
-        if not did_api_request and bmap_set._cache_expired():
-            await bmap_set._update_if_available()
+        if not did_api_request:
+            if bmap_set.maps:
+                # serve the maps we have, updating them in the background.
+                await bmap_set._refresh_if_expired()
+            else:
+                await bmap_set._update_if_expired()
 
         # cache the beatmap set, and beatmaps
         # to be efficient in future requests
@@ -1089,15 +1184,10 @@ class BeatmapSet:
         return bmap_set
 
 
-def cache_beatmap(beatmap: Beatmap) -> None:
-    """Add the beatmap to the cache."""
-    app.state.cache.beatmap[beatmap.md5] = beatmap
-    app.state.cache.beatmap[beatmap.id] = beatmap
-
-
 def cache_beatmap_set(beatmap_set: BeatmapSet) -> None:
     """Add the beatmap set, and each beatmap to the cache."""
-    app.state.cache.beatmapset[beatmap_set.id] = beatmap_set
+    app.state.cache.beatmaps.add_set(beatmap_set)
 
+    # the maps may have been submitted since we last checked.
     for beatmap in beatmap_set.maps:
-        cache_beatmap(beatmap)
+        app.state.cache.unsubmitted.discard(beatmap.md5)
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from collections.abc import Sequence
+from collections.abc import Collection
 from typing import TYPE_CHECKING
 
 import app.packets
@@ -109,7 +109,7 @@ class Channel:
         self,
         msg: str,
         sender: Player,
-        recipients: set[Player],
+        recipients: Collection[Player],
     ) -> None:
         """Enqueue `sender`'s `msg` to `recipients`."""
         for player in recipients:
@@ -130,8 +130,9 @@ class Channel:
             # the channel from the global list.
             app.state.sessions.channels.remove(self)
 
-    def enqueue(self, data: bytes, immune: Sequence[int] = []) -> None:
+    def enqueue(self, data: bytes, immune: Collection[int] = ()) -> None:
         """Enqueue `data` to all connected clients not in `immune`."""
+        immune_ids = frozenset(immune)
         for player in self.players:
-            if player.id not in immune:
+            if player.id not in immune_ids:
                 player.enqueue(data)
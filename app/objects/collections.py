@@ -1,8 +1,10 @@
 from __future__ import annotations
 
+import asyncio
+import time
+from collections.abc import Collection
 from collections.abc import Iterable
 from collections.abc import Iterator
-from collections.abc import Sequence
 from typing import Any
 
 import databases.core
@@ -10,6 +12,7 @@ import databases.core
 import app.settings
 import app.state
 import app.utils
+from app.constants.gamemodes import GameMode
 from app.constants.privileges import ClanPrivileges
 from app.constants.privileges import Privileges
 from app.logging import Ansi
@@ -120,11 +123,56 @@ class Matches(list[Match | None]):
 
 
 class Players(list[Player]):
-    """The currently active players on the server."""
+    """\
+    The currently active players on the server.
+
+    Possibly confusing attributes
+    -----------
+    _by_token: dict[`str`, `Player`]
+        Online sessions indexed by their osu! token.
+
+    _by_id: dict[`int`, list[`Player`]]
+        Online sessions indexed by user id, in login order.
+        XXX: tourney clients may have multiple sessions per id.
+
+    _by_safe_name: dict[`str`, list[`Player`]]
+        Online sessions indexed by safe name, in login order.
+
+    _index_keys: dict[`Player`, tuple[`str`, `int`, `str`]]
+        The (token, id, safe_name) each player was indexed with;
+        tokens & names can change while a player is in the list.
+
+    _staff, _restricted, _unrestricted: set[`Player`]
+        Privilege-partitioned views of the list; kept up to date
+        by `repartition` whenever an online player's privs change.
+
+    _views: dict[`str`, frozenset[`Player`]]
+        Cached immutable copies of the views above, handed out to
+        callers; rebuilt on first use after the views change.
+
+    _view_ids: dict[`str`, tuple[`int`, ...]]
+        Cached ids for each of the views above, for building
+        packets without iterating over the player objects.
+    """
 
     def __init__(self, *args: Any, **kwargs: Any) -> None:
         super().__init__(*args, **kwargs)
 
+        self._by_token: dict[str, Player] = {}
+        self._by_id: dict[int, list[Player]] = {}
+        self._by_safe_name: dict[str, list[Player]] = {}
+        self._index_keys: dict[Player, tuple[str, int, str]] = {}
+
+        self._staff: set[Player] = set()
+        self._restricted: set[Player] = set()
+        self._unrestricted: set[Player] = set()
+        self._views: dict[str, frozenset[Player]] = {}
+        self._view_ids: dict[str, tuple[int, ...]] = {}
+
+        for player in self:
+            self._index(player)
+            self._partition(player)
+
     def __iter__(self) -> Iterator[Player]:
         return super().__iter__()
 
@@ -132,9 +180,10 @@ class Players(list[Player]):
         # allow us to either pass in the player
         # obj, or the player name as a string.
         if isinstance(player, str):
-            return player in (player.name for player in self)
+            sessions = self._by_safe_name.get(make_safe_name(player), [])
+            return any(p.name == player for p in sessions)
         else:
-            return super().__contains__(player)
+            return player in self._index_keys
 
     def __repr__(self) -> str:
         return f'[{", ".join(map(repr, self))}]'
@@ -142,27 +191,62 @@ class Players(list[Player]):
     @property
     def ids(self) -> set[int]:
         """Return a set of the current ids in the list."""
-        return {p.id for p in self}
+        return set(self._by_id)
 
     @property
-    def staff(self) -> set[Player]:
+    def staff(self) -> frozenset[Player]:
         """Return a set of the current staff online."""
-        return {p for p in self if p.priv & Privileges.STAFF}
+        return self._get_view("staff", self._staff)
 
     @property
-    def restricted(self) -> set[Player]:
+    def restricted(self) -> frozenset[Player]:
         """Return a set of the current restricted players."""
-        return {p for p in self if not p.priv & Privileges.UNRESTRICTED}
+        return self._get_view("restricted", self._restricted)
 
     @property
-    def unrestricted(self) -> set[Player]:
+    def unrestricted(self) -> frozenset[Player]:
         """Return a set of the current unrestricted players."""
-        return {p for p in self if p.priv & Privileges.UNRESTRICTED}
+        return self._get_view("unrestricted", self._unrestricted)
+
+    @property
+    def staff_ids(self) -> tuple[int, ...]:
+        """Return the ids of the current staff online."""
+        return self._get_view_ids("staff", self._staff)
 
-    def enqueue(self, data: bytes, immune: Sequence[Player] = []) -> None:
+    @property
+    def restricted_ids(self) -> tuple[int, ...]:
+        """Return the ids of the current restricted players."""
+        return self._get_view_ids("restricted", self._restricted)
+
+    @property
+    def unrestricted_ids(self) -> tuple[int, ...]:
+        """Return the ids of the current unrestricted players."""
+        return self._get_view_ids("unrestricted", self._unrestricted)
+
+    def _get_view(self, view: str, players: set[Player]) -> frozenset[Player]:
+        frozen = self._views.get(view)
+        if frozen is None:
+            frozen = self._views[view] = frozenset(players)
+        return frozen
+
+    def _get_view_ids(self, view: str, players: set[Player]) -> tuple[int, ...]:
+        ids = self._view_ids.get(view)
+        if ids is None:
+            ids = self._view_ids[view] = tuple({p.id for p in players})
+        return ids
+
+    def enqueue(self, data: bytes, immune: Collection[Player] = ()) -> None:
         """Enqueue `data` to all players, except for those in `immune`."""
+        # NOTE: `data` is shared by reference between all player
+        # queues; a broadcast holds one copy of the packet in memory.
+        if not immune:
+            for player in self:
+                player.enqueue(data)
+            return
+
+        immune_players = frozenset(immune)
         for player in self:
-            if player not in immune:
+            if player not in immune_players:
                 player.enqueue(data)
 
     def get(
@@ -172,18 +256,115 @@ class Players(list[Player]):
         name: str | None = None,
     ) -> Player | None:
         """Get a player by token, id, or name from cache."""
-        for player in self:
-            if token is not None:
-                if player.token == token:
-                    return player
-            elif id is not None:
-                if player.id == id:
-                    return player
-            elif name is not None:
-                if player.safe_name == make_safe_name(name):
-                    return player
+        if token is not None:
+            return self._by_token.get(token)
+        elif id is not None:
+            sessions = self._by_id.get(id)
+        elif name is not None:
+            sessions = self._by_safe_name.get(make_safe_name(name))
+        else:
+            return None
 
-        return None
+        return sessions[0] if sessions else None
+
+    def _index(self, player: Player) -> None:
+        """Add `player` to the lookup indexes."""
+        keys = (player.token, player.id, player.safe_name)
+        self._index_keys[player] = keys
+
+        self._by_token[keys[0]] = player
+        self._by_id.setdefault(keys[1], []).append(player)
+        self._by_safe_name.setdefault(keys[2], []).append(player)
+
+    def _unindex(self, player: Player) -> None:
+        """Remove `player` from the lookup indexes."""
+        token, id, safe_name = self._index_keys.pop(player)
+
+        if self._by_token.get(token) is player:
+            del self._by_token[token]
+
+        id_sessions = self._by_id[id]
+        id_sessions.remove(player)
+        if not id_sessions:
+            del self._by_id[id]
+
+        name_sessions = self._by_safe_name[safe_name]
+        name_sessions.remove(player)
+        if not name_sessions:
+            del self._by_safe_name[safe_name]
+
+    def _partition(self, player: Player) -> None:
+        """Add `player` to the privilege views they belong in."""
+        if player.priv & Privileges.UNRESTRICTED:
+            self._unrestricted.add(player)
+        else:
+            self._restricted.add(player)
+
+        if player.priv & Privileges.STAFF:
+            self._staff.add(player)
+
+        self._views.clear()
+        self._view_ids.clear()
+
+    def _unpartition(self, player: Player) -> None:
+        """Remove `player` from all privilege views."""
+        self._unrestricted.discard(player)
+        self._restricted.discard(player)
+        self._staff.discard(player)
+
+        self._views.clear()
+        self._view_ids.clear()
+
+    def repartition(self, player: Player) -> None:
+        """Refresh `player`'s privilege views after their privs changed."""
+        if player not in self._index_keys:
+            return
+
+        self._unpartition(player)
+        self._partition(player)
+
+    def reindex(self, player: Player) -> None:
+        """Refresh `player`'s index entries after their token or name changed."""
+        if player not in self._index_keys:
+            return
+
+        self._unindex(player)
+        self._index(player)
+
+    def check_invariants(self) -> None:
+        """Ensure the lookup indexes are consistent with the list."""
+        if len(self._index_keys) != len(self) or any(
+            p not in self._index_keys for p in self
+        ):
+            raise RuntimeError("Player list and index keys are out of sync.")
+
+        for player, (token, id, safe_name) in self._index_keys.items():
+            if (token, id, safe_name) != (player.token, player.id, player.safe_name):
+                raise RuntimeError(f"{player} has stale index keys.")
+
+            if (
+                self._by_token.get(token) is not player
+                or player not in self._by_id.get(id, [])
+                or player not in self._by_safe_name.get(safe_name, [])
+            ):
+                raise RuntimeError(f"{player} is missing from an index.")
+
+        if len(self._by_token) != len(self):
+            raise RuntimeError("Token index has duplicate or stale entries.")
+
+        ids_indexed = sum(map(len, self._by_id.values()))
+        names_indexed = sum(map(len, self._by_safe_name.values()))
+        if ids_indexed != len(self) or names_indexed != len(self):
+            raise RuntimeError("Id/name index has duplicate or stale entries.")
+
+        if (
+            self._staff != {p for p in self if p.priv & Privileges.STAFF}
+            or self._restricted
+            != {p for p in self if not p.priv & Privileges.UNRESTRICTED}
+            or self._unrestricted
+            != {p for p in self if p.priv & Privileges.UNRESTRICTED}
+        ):
+            raise RuntimeError("Privilege views are out of sync.")
 
     async def get_sql(
         self,
@@ -273,6 +454,8 @@ class Players(list[Player]):
             return
 
         super().append(player)
+        self._index(player)
+        self._partition(player)
 
     def remove(self, player: Player) -> None:
         """Remove `p` from the list."""
@@ -282,6 +465,8 @@ class Players(list[Player]):
             return
 
         super().remove(player)
+        self._unindex(player)
+        self._unpartition(player)
 
 
 async def initialize_ram_caches() -> None:
@@ -314,70 +499,110 @@ async def initialize_ram_caches() -> None:
     }
 
 
-async def initialize_leaderboards() -> None:
-    """Load leaderboard data from database into Redis cache."""
-    from app.constants.gamemodes import GameMode
+LEADERBOARD_GAME_MODES = (
+    GameMode.VANILLA_OSU,
+    GameMode.VANILLA_TAIKO,
+    GameMode.VANILLA_CATCH,
+    GameMode.VANILLA_MANIA,
+    GameMode.RELAX_OSU,
+    GameMode.RELAX_TAIKO,
+    GameMode.RELAX_CATCH,
+    GameMode.AUTOPILOT_OSU,
+)
 
-    log("Loading leaderboards into Redis cache.", Ansi.LCYAN)
+# the most members added to a sorted set in a single ZADD.
+LEADERBOARD_ZADD_BATCH_SIZE = 10_000
 
-    # Get all game modes
-    game_modes = [
-        GameMode.VANILLA_OSU,
-        GameMode.VANILLA_TAIKO,
-        GameMode.VANILLA_CATCH,
-        GameMode.VANILLA_MANIA,
-        GameMode.RELAX_OSU,
-        GameMode.RELAX_TAIKO,
-        GameMode.RELAX_CATCH,
-        GameMode.AUTOPILOT_OSU,
-    ]
 
-    for mode in game_modes:
-        # Fetch all unrestricted users with their stats for this mode
-        user_stats = await app.state.services.database.fetch_all(
-            "SELECT s.id, s.pp, u.country "
-            "FROM stats s "
-            "INNER JOIN users u ON s.id = u.id "
-            "WHERE s.mode = :mode AND u.priv & :unrestricted AND s.pp > 0",
-            {"mode": mode.value, "unrestricted": Privileges.UNRESTRICTED.value},
-        )
+async def rebuild_leaderboard(mode: GameMode) -> None:
+    """Rebuild a mode's global & country leaderboards in redis from sql.
+
+    The leaderboards are built under temporary keys, and swapped in
+    atomically, so that ranks may be read throughout the rebuild.
+    """
+    start_time = time.perf_counter()
+
+    user_stats = await app.state.services.database.fetch_all(
+        "SELECT s.id, s.pp, u.country "
+        "FROM stats s "
+        "INNER JOIN users u ON s.id = u.id "
+        "WHERE s.mode = :mode AND u.priv & :unrestricted AND s.pp > 0",
+        {"mode": mode.value, "unrestricted": Privileges.UNRESTRICTED.value},
+    )
+
+    # group users by country for country leaderboards
+    leaderboards: dict[str, dict[str, float]] = {f"bancho:leaderboard:{mode.value}": {}}
 
-        if not user_stats:
-            continue
+    for row in user_stats:
+        user_id = str(row["id"])
+        pp = float(row["pp"])
 
-        # Group users by country for country leaderboards
-        global_leaderboard: dict[str, float] = {}
-        country_leaderboards: dict[str, dict[str, float]] = {}
+        leaderboards[f"bancho:leaderboard:{mode.value}"][user_id] = pp
+        leaderboards.setdefault(
+            f"bancho:leaderboard:{mode.value}:{row['country']}",
+            {},
+        )[user_id] = pp
 
-        for row in user_stats:
-            user_id = str(row["id"])
-            pp = float(row["pp"])
-            country = row["country"]
+    tmp_keys = {
+        key: key.replace("bancho:leaderboard:", "bancho:leaderboard_rebuild:", 1)
+        for key in leaderboards
+    }
 
-            # Add to global leaderboard
-            global_leaderboard[user_id] = pp
+    # fill the temporary keys in a single round trip.
+    pipeline = app.state.services.redis.pipeline(transaction=False)
 
-            # Add to country leaderboard
-            if country not in country_leaderboards:
-                country_leaderboards[country] = {}
-            country_leaderboards[country][user_id] = pp
+    for key, leaderboard in leaderboards.items():
+        pipeline.delete(tmp_keys[key])
 
-        # Update Redis with global leaderboard
-        if global_leaderboard:
-            await app.state.services.redis.zadd(
-                f"bancho:leaderboard:{mode.value}",
-                global_leaderboard,
+        members = list(leaderboard.items())
+        for i in range(0, len(members), LEADERBOARD_ZADD_BATCH_SIZE):
+            pipeline.zadd(
+                tmp_keys[key],
+                dict(members[i : i + LEADERBOARD_ZADD_BATCH_SIZE]),
             )
 
-        # Update Redis with country leaderboards
-        for country, country_data in country_leaderboards.items():
-            if country_data:
-                await app.state.services.redis.zadd(
-                    f"bancho:leaderboard:{mode.value}:{country}",
-                    country_data,
-                )
-
-        log(
-            f"Loaded {len(global_leaderboard)} users into {mode.name} leaderboard.",
-            Ansi.LCYAN,
+    await pipeline.execute()
+
+    # leaderboards of countries which no longer have any players.
+    stale_keys = [
+        key.decode()
+        async for key in app.state.services.redis.scan_iter(
+            match=f"bancho:leaderboard:{mode.value}:*",
         )
+        if key.decode() not in leaderboards
+    ]
+
+    # swap the new leaderboards in, all at once.
+    transaction = app.state.services.redis.pipeline(transaction=True)
+
+    for key, leaderboard in leaderboards.items():
+        if leaderboard:
+            transaction.rename(tmp_keys[key], key)
+        else:
+            transaction.delete(key)
+
+    if stale_keys:
+        transaction.delete(*stale_keys)
+
+    await transaction.execute()
+
+    log(
+        f"Loaded {len(user_stats)} users into {mode!r} leaderboards "
+        f"in {time.perf_counter() - start_time:.2f}s.",
+        Ansi.LCYAN,
+    )
+
+
+async def initialize_leaderboards() -> None:
+    """Rebuild all modes' leaderboards in redis from sql, concurrently."""
+    log("Loading leaderboards into Redis cache.", Ansi.LCYAN)
+
+    start_time = time.perf_counter()
+    await asyncio.gather(
+        *[rebuild_leaderboard(mode) for mode in LEADERBOARD_GAME_MODES],
+    )
+
+    log(
+        f"Loaded all leaderboards in {time.perf_counter() - start_time:.2f}s.",
+        Ansi.LCYAN,
+    )
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import asyncio
 from collections import defaultdict
+from collections.abc import Collection
 from collections.abc import Sequence
 from datetime import datetime as datetime
 from datetime import timedelta as timedelta
@@ -285,7 +286,7 @@ class Match:
         self,
         data: bytes,
         lobby: bool = True,
-        immune: Sequence[int] = [],
+        immune: Collection[int] = (),
     ) -> None:
         """Add data to be sent to all clients in the match."""
         self.chat.enqueue(data, immune)
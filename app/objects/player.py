@@ -9,6 +9,7 @@ from enum import IntEnum
 from enum import StrEnum
 from enum import unique
 from functools import cached_property
+from functools import partial
 from typing import TYPE_CHECKING
 from typing import TypedDict
 from typing import cast
@@ -34,11 +35,13 @@ from app.objects.match import Slot
 from app.objects.match import SlotStatus
 from app.objects.score import Grade
 from app.objects.score import Score
+from app.objects.spectator import SpectatorRelay
 from app.repositories import clans as clans_repo
 from app.repositories import logs as logs_repo
 from app.repositories import stats as stats_repo
 from app.repositories import users as users_repo
 from app.state.services import Geolocation
+from app.usecases import leaderboards as leaderboards_usecases
 from app.utils import escape_enum
 from app.utils import make_safe_name
 from app.utils import pymysql_encode
@@ -47,6 +50,8 @@ if TYPE_CHECKING:
     from app.constants.privileges import ClanPrivileges
     from app.objects.beatmap import Beatmap
     from app.objects.score import Score
+    from app.packets import ServerPackets
+    from app.usecases.top_scores import TopScores
 
 
 @unique
@@ -96,6 +101,9 @@ class ModeData:
 
     grades: dict[Grade, int]  # XH, X, SH, S, A
 
+    # best scores for pp & acc totals, loaded on first submission.
+    top_scores: TopScores | None = None
+
 
 @dataclass
 class Status:
@@ -200,11 +208,27 @@ class Player:
     is_tourney_client: `bool`
         Whether this is a management/spectator tourney client.
 
-    _packet_queue: `bytearray`
-        Bytes enqueued to the player which will be transmitted
+    spectator_relay: `SpectatorRelay`
+        The player's replay frames, buffered for their spectators.
+        NOTE: frames are collected by cls.dequeue(), not enqueued.
+
+    _packet_queue: list[`bytes`]
+        Packets enqueued to the player which will be transmitted
         at the tail end of their next connection to the server.
         XXX: cls.enqueue() will add data to this queue, and
              cls.dequeue() will return the data, and remove it.
+        NOTE: packets are stored by reference, so a broadcast
+              shares a single copy between all recipients.
+
+    packets_version: `int`
+        Incremented whenever any input to the player's presence or
+        stats packets changes (status, stats, privileges, name).
+        XXX: cls.invalidate_packets() must be called after mutating
+             any of these, or stale cached packets will be served.
+
+    packet_cache: dict[`ServerPackets`, tuple[`int`, `bytes`]]
+        The player's most recently built presence & stats packets,
+        along with the `packets_version` they were built at.
     """
 
     def __init__(
@@ -274,6 +298,7 @@ class Player:
         self.channels: list[Channel] = []
         self.spectators: list[Player] = []
         self.spectating: Player | None = None
+        self.spectator_relay = SpectatorRelay()
         self.match: Match | None = None
         self.stealth = False
 
@@ -287,7 +312,10 @@ class Player:
         # store the last beatmap /np'ed by the user.
         self.last_np: LastNp | None = None
 
-        self._packet_queue = bytearray()
+        self._packet_queue: list[bytes] = []
+
+        self.packets_version = 0
+        self.packet_cache: dict[ServerPackets, tuple[int, bytes]] = {}
 
     def __repr__(self) -> str:
         return f"<{self.name} ({self.id})>"
@@ -405,6 +433,10 @@ class Player:
 
         log(f"{self} logged out.")
 
+    def invalidate_packets(self) -> None:
+        """Mark `self`'s cached presence & stats packets as stale."""
+        self.packets_version += 1
+
     async def update_privs(self, new: Privileges) -> None:
         """Update `self`'s privileges to `new`."""
 
@@ -412,6 +444,9 @@ class Player:
         if "bancho_priv" in vars(self):
             del self.bancho_priv  # wipe cached_property
 
+        app.state.sessions.players.repartition(self)
+        self.invalidate_packets()
+
         await users_repo.partial_update(
             id=self.id,
             priv=self.priv,
@@ -424,6 +459,9 @@ class Player:
         if "bancho_priv" in vars(self):
             del self.bancho_priv  # wipe cached_property
 
+        app.state.sessions.players.repartition(self)
+        self.invalidate_packets()
+
         await users_repo.partial_update(
             id=self.id,
             priv=self.priv,
@@ -441,6 +479,9 @@ class Player:
         if "bancho_priv" in vars(self):
             del self.bancho_priv  # wipe cached_property
 
+        app.state.sessions.players.repartition(self)
+        self.invalidate_packets()
+
         await users_repo.partial_update(
             id=self.id,
             priv=self.priv,
@@ -472,6 +513,9 @@ class Player:
                 self.id,
             )
 
+        # their scores are no longer visible on beatmap leaderboards.
+        leaderboards_usecases.invalidate_user(self.id)
+
         log_msg = f"{admin} restricted {self} for: {reason}."
 
         log(log_msg, Ansi.LRED)
@@ -509,6 +553,9 @@ class Player:
                 {str(self.id): stats.pp},
             )
 
+        # their scores are visible on beatmap leaderboards again.
+        leaderboards_usecases.invalidate_all()
+
         log_msg = f"{admin} unrestricted {self} for: {reason}."
 
         log(log_msg, Ansi.LRED)
@@ -791,6 +838,7 @@ class Player:
                 player.enqueue(app.packets.fellow_spectator_joined(spectator.id))
 
         self.spectators.append(player)
+        self.spectator_relay.add(player)
         player.spectating = self
 
         log(f"{player} is now spectating {self}.")
@@ -798,6 +846,7 @@ class Player:
     def remove_spectator(self, player: Player) -> None:
         """Attempt to remove `player` from `self`'s spectators."""
         self.spectators.remove(player)
+        self.spectator_relay.remove(player)
         player.spectating = None
 
         channel = app.state.sessions.channels.get_by_name(f"#spec_{self.id}")
@@ -917,6 +966,18 @@ class Player:
         )
         return cast(int, rank) + 1 if rank is not None else 0
 
+    async def get_global_ranks(self, modes: list[GameMode]) -> list[int]:
+        """Fetch `self`'s global rank in each of `modes`, in one round trip."""
+        if self.restricted or not modes:
+            return [0] * len(modes)
+
+        pipeline = app.state.services.redis.pipeline(transaction=False)
+        for mode in modes:
+            pipeline.zrevrank(f"bancho:leaderboard:{mode.value}", str(self.id))
+
+        ranks = await pipeline.execute()
+        return [rank + 1 if rank is not None else 0 for rank in ranks]
+
     async def get_country_rank(self, mode: GameMode) -> int:
         if self.restricted:
             return 0
@@ -950,8 +1011,11 @@ class Player:
 
     async def stats_from_sql_full(self) -> None:
         """Retrieve `self`'s stats (all modes) from sql."""
-        for row in await stats_repo.fetch_many(player_id=self.id):
-            game_mode = GameMode(row["mode"])
+        rows = await stats_repo.fetch_many(player_id=self.id)
+        modes = [GameMode(row["mode"]) for row in rows]
+        ranks = await self.get_global_ranks(modes)
+
+        for row, game_mode, rank in zip(rows, modes, ranks):
             self.stats[game_mode] = ModeData(
                 tscore=row["tscore"],
                 rscore=row["rscore"],
@@ -961,7 +1025,7 @@ class Player:
                 playtime=row["playtime"],
                 max_combo=row["max_combo"],
                 total_hits=row["total_hits"],
-                rank=await self.get_global_rank(game_mode),
+                rank=rank,
                 grades={
                     Grade.XH: row["xh_count"],
                     Grade.X: row["x_count"],
@@ -971,26 +1035,42 @@ class Player:
                 },
             )
 
+        self.invalidate_packets()
+
     def update_latest_activity_soon(self) -> None:
         """Update the player's latest activity in the database."""
-        task = users_repo.partial_update(
-            id=self.id,
-            latest_activity=int(time.time()),
+        app.state.sessions.background_jobs.submit(
+            f"update {self}'s latest activity",
+            partial(
+                users_repo.partial_update,
+                id=self.id,
+                latest_activity=int(time.time()),
+            ),
         )
-        app.state.loop.create_task(task)  # type: ignore[unused-awaitable]
 
     def enqueue(self, data: bytes) -> None:
         """Add data to be sent to the client."""
-        self._packet_queue += data
+        self._packet_queue.append(data)
 
     def dequeue(self) -> bytes | None:
         """Get data from the queue to send to the client."""
-        if self._packet_queue:
-            data = bytes(self._packet_queue)
-            self._packet_queue.clear()
-            return data
+        if self.spectating is not None:
+            # collect any frames our host has sent since our last poll
+            frames = self.spectating.spectator_relay.collect(self)
+            if frames is not None:
+                self._packet_queue.append(frames)
+
+        if not self._packet_queue:
+            return None
+
+        if len(self._packet_queue) == 1:
+            data = self._packet_queue[0]
+        else:
+            # stitch the pending packets together in a single copy
+            data = b"".join(self._packet_queue)
 
-        return None
+        self._packet_queue.clear()
+        return data
 
     def send(self, msg: str, sender: Player, chan: Channel | None = None) -> None:
         """Enqueue `sender`'s `msg` to `self`. Sent in `chan`, or dm."""
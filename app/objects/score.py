@@ -316,8 +316,12 @@ class Score:
         assert num_better_scores is not None
         return num_better_scores + 1
 
-    def calculate_performance(self, beatmap_id: int) -> tuple[float, float]:
-        """Calculate PP and star rating for our score."""
+    async def calculate_performance(self, beatmap_id: int) -> tuple[float, float]:
+        """\
+        Calculate PP and star rating for our score.
+
+        Raises `TimeoutError` or `BrokenProcessPool` if the calculation failed.
+        """
         mode_vn = self.mode.as_vanilla
 
         score_args = ScoreParams(
@@ -332,9 +336,10 @@ class Score:
             nmiss=self.nmiss,
         )
 
-        result = app.usecases.performance.calculate_performances(
+        result = await app.usecases.performance.calculate_performances_in_executor(
             osu_file_path=str(BEATMAPS_PATH / f"{beatmap_id}.osu"),
             scores=[score_args],
+            osu_file_md5=self.bmap.md5 if self.bmap else None,
         )
 
         return result[0]["performance"]["pp"], result[0]["difficulty"]["stars"]
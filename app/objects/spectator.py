@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from app.objects.player import Player
+
+# the most frame bundles a spectator may fall behind their host by;
+# any older bundles are dropped rather than buffered indefinitely.
+MAX_BUFFERED_FRAMES = 128
+
+
+class SpectatorRelay:
+    """A host's replay frames, shared between all of their spectators.
+
+    Frame bundles are stored once per host, and each spectator keeps a
+    cursor into them; when a spectator polls, all bundles received since
+    their last poll are collected into a single buffer, which is shared
+    with any other spectators polling from the same position.
+
+    Possibly confusing attributes
+    -----------
+    frames: list[`bytes`]
+        Framed SPECTATE_FRAMES packets which have not yet been
+        collected by every spectator; `frames[0]` is bundle `base`.
+
+    cursors: dict[`Player`, `int`]
+        The index of the next bundle each spectator will collect.
+    """
+
+    def __init__(self) -> None:
+        self.frames: list[bytes] = []
+        self.base = 0
+        self.cursors: dict[Player, int] = {}
+
+        # the last coalesced (start, stop, data) range.
+        self._coalesced: tuple[int, int, bytes] | None = None
+
+        self.frames_relayed = 0
+        self.bytes_relayed = 0
+
+        self._window_start = time.time()
+        self._window_frames = 0
+        self._window_bytes = 0
+        self._frames_per_second = 0.0
+        self._bytes_per_second = 0.0
+
+    def __repr__(self) -> str:
+        return (
+            f"<{len(self.cursors)} spectators @ {self.frames_per_second:.1f} "
+            f"frames/s, {self.bytes_per_second / 1024:.1f}KB/s>"
+        )
+
+    @property
+    def head(self) -> int:
+        """The index of the next bundle to be pushed."""
+        return self.base + len(self.frames)
+
+    @property
+    def frames_per_second(self) -> float:
+        if time.time() - self._window_start >= 2.0:
+            return 0.0  # host has stopped sending frames
+
+        return self._frames_per_second
+
+    @property
+    def bytes_per_second(self) -> float:
+        if time.time() - self._window_start >= 2.0:
+            return 0.0  # host has stopped sending frames
+
+        return self._bytes_per_second
+
+    def add(self, spectator: Player) -> None:
+        """Start relaying frames to `spectator`, from the next bundle."""
+        self.cursors[spectator] = self.head
+
+    def remove(self, spectator: Player) -> None:
+        """Stop relaying frames to `spectator`."""
+        self.cursors.pop(spectator, None)
+
+        if not self.cursors:
+            self.base = self.head
+            self.frames.clear()
+            self._coalesced = None
+
+    def push(self, data: bytes) -> None:
+        """Relay a framed SPECTATE_FRAMES packet to all spectators."""
+        now = time.time()
+        elapsed = now - self._window_start
+        if elapsed >= 1.0:
+            self._frames_per_second = self._window_frames / elapsed
+            self._bytes_per_second = self._window_bytes / elapsed
+            self._window_start = now
+            self._window_frames = self._window_bytes = 0
+
+        self._window_frames += 1
+        self._window_bytes += len(data)
+        self.frames_relayed += 1
+        self.bytes_relayed += len(data)
+
+        if not self.cursors:
+            return
+
+        self.frames.append(data)
+
+        if len(self.frames) > MAX_BUFFERED_FRAMES:
+            self._trim()
+
+    def _trim(self) -> None:
+        """Drop bundles which no spectator needs, or has fallen too far behind on."""
+        oldest = min(self.cursors.values())
+
+        # slow spectators skip ahead, losing their oldest bundles.
+        oldest = max(oldest, self.head - MAX_BUFFERED_FRAMES // 2)
+
+        del self.frames[: oldest - self.base]
+        self.base = oldest
+
+    def collect(self, spectator: Player) -> bytes | None:
+        """Collect all bundles pushed since `spectator`'s last collection."""
+        cursor = self.cursors.get(spectator)
+        if cursor is None:
+            return None
+
+        head = self.head
+        cursor = max(cursor, self.base)
+        if cursor == head:
+            return None
+
+        self.cursors[spectator] = head
+
+        if cursor == head - 1:
+            return self.frames[-1]
+
+        coalesced = self._coalesced
+        if coalesced is None or coalesced[0] != cursor or coalesced[1] != head:
+            data = b"".join(self.frames[cursor - self.base :])
+            coalesced = self._coalesced = (cursor, head, data)
+
+        return coalesced[2]
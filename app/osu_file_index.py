@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import hashlib
+import os
+from pathlib import Path
+
+import orjson
+
+from app.logging import Ansi
+from app.logging import log
+
+INDEX_VERSION = 1
+
+
+class OsuFileIndex:
+    """\
+    A persistent index of the md5, size & mtime of each .osu file on disk.
+
+    A file's md5 is only (re)computed when its size or mtime no longer
+    match the index, so checking a file is usually a single stat().
+
+    Possibly confusing attributes
+    -----------
+    _entries: dict[`int`, tuple[`str`, `int`, `int`]]
+        The (md5, size, mtime_ns) of each indexed file, by beatmap id.
+
+    dirty: `bool`
+        Whether the index has changed since it was last saved (or loaded).
+
+    Intended Usage:
+    >>> app.state.cache.osu_files.md5(bmap.id) == bmap.md5
+    """
+
+    def __init__(self, directory: Path, path: Path) -> None:
+        self.directory = directory
+        self.path = path
+
+        self._entries: dict[int, tuple[str, int, int]] = {}
+        self.dirty = False
+
+        self.hits = 0
+        self.rehashes = 0
+
+    def __repr__(self) -> str:
+        return f"<{len(self._entries):,} files, {self.hits} hits, {self.rehashes} rehashed>"
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def md5(self, beatmap_id: int) -> str | None:
+        """The md5 of a beatmap's .osu file, or None if it's not on disk."""
+        osu_file_path = self.directory / f"{beatmap_id}.osu"
+
+        try:
+            stat = osu_file_path.stat()
+        except FileNotFoundError:
+            if self._entries.pop(beatmap_id, None) is not None:
+                self.dirty = True
+            return None
+
+        entry = self._entries.get(beatmap_id)
+        if entry is not None and entry[1:] == (stat.st_size, stat.st_mtime_ns):
+            self.hits += 1
+            return entry[0]
+
+        # (stat'd before reading, so a write in between is caught next time)
+        osu_file_md5 = hashlib.md5(osu_file_path.read_bytes()).hexdigest()
+        self._entries[beatmap_id] = (osu_file_md5, stat.st_size, stat.st_mtime_ns)
+        self.rehashes += 1
+        self.dirty = True
+        return osu_file_md5
+
+    def record(self, beatmap_id: int, data: bytes) -> None:
+        """Index a .osu file which was just written with `data`."""
+        stat = (self.directory / f"{beatmap_id}.osu").stat()
+        self._entries[beatmap_id] = (
+            hashlib.md5(data).hexdigest(),
+            stat.st_size,
+            stat.st_mtime_ns,
+        )
+        self.dirty = True
+
+    def rebuild(self) -> int:
+        """Hash every .osu file in the directory, replacing the index."""
+        entries: dict[int, tuple[str, int, int]] = {}
+
+        with os.scandir(self.directory) as it:
+            for dir_entry in it:
+                beatmap_id, ext = os.path.splitext(dir_entry.name)
+                if ext != ".osu" or not beatmap_id.isdecimal():
+                    continue
+
+                stat = dir_entry.stat()
+                with open(dir_entry.path, "rb") as f:
+                    osu_file_md5 = hashlib.md5(f.read()).hexdigest()
+
+                entries[int(beatmap_id)] = (
+                    osu_file_md5,
+                    stat.st_size,
+                    stat.st_mtime_ns,
+                )
+
+        self._entries = entries
+        self.dirty = True
+        return len(entries)
+
+    def load(self) -> None:
+        """Load the index from disk; entries are verified as they're used."""
+        try:
+            data = orjson.loads(self.path.read_bytes())
+        except FileNotFoundError:
+            return
+        except (OSError, orjson.JSONDecodeError) as exc:
+            log(f"Failed to load the .osu file index: {exc!r}", Ansi.LYELLOW)
+            return
+
+        if data.get("version") != INDEX_VERSION:
+            return
+
+        self._entries = {
+            int(beatmap_id): (md5, size, mtime_ns)
+            for beatmap_id, (md5, size, mtime_ns) in data["files"].items()
+        }
+        self.dirty = False
+
+    def save(self) -> None:
+        """Save the index to disk, if it's changed."""
+        if not self.dirty:
+            return
+
+        self.dirty = False
+        data = orjson.dumps(
+            {"version": INDEX_VERSION, "files": self._entries},
+            option=orjson.OPT_NON_STR_KEYS,
+        )
+
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_bytes(data)
+        tmp_path.replace(self.path)  # atomic, so a crash can't corrupt it
@@ -13,6 +13,7 @@ from enum import IntEnum
 from enum import unique
 from functools import cache
 from functools import lru_cache
+from functools import wraps
 from typing import TYPE_CHECKING
 from typing import Any
 from typing import NamedTuple
@@ -302,6 +303,34 @@ class BasePacket(ABC):
 
 PacketMap = dict[ClientPackets, type[BasePacket]]
 
+# handlers indexed by packet id (None for unhandled ids).
+PacketTable = tuple[type[BasePacket] | None, ...]
+
+
+def make_packet_table(packet_map: PacketMap) -> PacketTable:
+    """Build a lookup table of `packet_map`'s handlers, indexed by packet id."""
+    table: list[type[BasePacket] | None] = [None] * (max(ClientPackets) + 1)
+
+    for packid, packet_cls in packet_map.items():
+        table[packid] = packet_cls
+
+    return tuple(table)
+
+
+PACKET_HEADER_FMT = struct.Struct("<HxI")
+
+_unpack_header = PACKET_HEADER_FMT.unpack_from
+_unpack_i8 = struct.Struct("<b").unpack_from
+_unpack_i16 = struct.Struct("<h").unpack_from
+_unpack_u16 = struct.Struct("<H").unpack_from
+_unpack_i32 = struct.Struct("<i").unpack_from
+_unpack_u32 = struct.Struct("<I").unpack_from
+_unpack_i64 = struct.Struct("<q").unpack_from
+_unpack_u64 = struct.Struct("<Q").unpack_from
+_unpack_f16 = struct.Struct("<e").unpack_from
+_unpack_f32 = struct.Struct("<f").unpack_from
+_unpack_f64 = struct.Struct("<d").unpack_from
+
 
 class BanchoPacketReader:
     """\
@@ -313,123 +342,138 @@ class BanchoPacketReader:
     body_view: `memoryview`
         A readonly view of the request's body.
 
-    packet_map: `dict[ClientPackets, BasePacket]`
-        The map of registered packets the reader may handle.
+    packet_table: `PacketTable`
+        The registered packets the reader may handle, indexed by id.
 
-    current_length: int
+    current_len: int
         The length in bytes of the packet currently being handled.
 
+    Possibly confusing attributes
+    -----------
+    offset: `int`
+        The reader's position in `body_view`; the body is walked
+        once in place, rather than being re-sliced after each read.
+
     Intended Usage:
     >>> with memoryview(await request.body()) as body_view:
-    ...     for packet in BanchoPacketReader(body_view):
+    ...     for packet in BanchoPacketReader(body_view, packet_table):
     ...         await packet.handle()
     """
 
-    def __init__(self, body_view: memoryview, packet_map: PacketMap) -> None:
+    def __init__(self, body_view: memoryview, packet_table: PacketTable) -> None:
         self.body_view = body_view  # readonly
-        self.packet_map = packet_map
+        self.packet_table = packet_table
 
+        self.offset = 0
         self.current_len = 0  # last read packet's length
 
     def __iter__(self) -> Iterator[BasePacket]:
         return self
 
     def __next__(self) -> BasePacket:
+        body_len = len(self.body_view)
+        packet_table = self.packet_table
+
+        p_type: int
+        p_len: int
+
         # do not break until we've read the
         # header of a packet we can handle.
-        p_type = ClientPackets.UNKNOWN_PACKET
-        p_len = 0
-        while self.body_view:  # len(self.view) < 7?
-            p_type, p_len = self._read_header()
-
-            if p_type not in self.packet_map:
-                # packet type not handled, remove
-                # from internal buffer and continue.
-                if p_len != 0:
-                    self.body_view = self.body_view[p_len:]
-            else:
-                # we can handle this one.
+        while self.offset + 7 <= body_len:
+            p_type, p_len = _unpack_header(self.body_view, self.offset)
+            start = self.offset + 7
+            end = start + p_len
+
+            if end > body_len:
+                # truncated packet; nothing more to read.
                 break
-        else:
-            raise StopIteration
 
-        # we have a packet handler for this.
-        packet_cls = self.packet_map[p_type]
-        self.current_len = p_len
+            # packet type not handled, skip over it and continue.
+            self.offset = end
+            if p_type >= len(packet_table):
+                continue
+
+            packet_cls = packet_table[p_type]
+            if packet_cls is None:
+                continue
+
+            # we have a packet handler for this.
+            self.offset = start
+            self.current_len = p_len
+            packet = packet_cls(self)
 
-        return packet_cls(self)
+            # always resume from the next packet's header,
+            # regardless of how much the handler has read.
+            self.offset = end
+            return packet
 
-    def _read_header(self) -> tuple[ClientPackets, int]:
-        """Read the header of an osu! packet (id & length)."""
-        # read type & length from the body
-        data = struct.unpack("<HxI", self.body_view[:7])
-        self.body_view = self.body_view[7:]
-        return ClientPackets(data[0]), data[1]
+        self.offset = body_len
+        raise StopIteration
 
     """ public API (exposed for packet handler's __init__ methods) """
 
     def read_raw(self) -> memoryview:
-        val = self.body_view[: self.current_len]
-        self.body_view = self.body_view[self.current_len :]
+        val = self.body_view[self.offset : self.offset + self.current_len]
+        self.offset += self.current_len
         return val
 
     # integral types
 
     def read_i8(self) -> int:
-        val = self.body_view[0]
-        self.body_view = self.body_view[1:]
-        return val - 256 if val > 127 else val
+        (val,) = _unpack_i8(self.body_view, self.offset)
+        self.offset += 1
+        return cast(int, val)
 
     def read_u8(self) -> int:
-        val = self.body_view[0]
-        self.body_view = self.body_view[1:]
+        val = self.body_view[self.offset]
+        self.offset += 1
         return val
 
     def read_i16(self) -> int:
-        val = int.from_bytes(self.body_view[:2], "little", signed=True)
-        self.body_view = self.body_view[2:]
-        return val
+        (val,) = _unpack_i16(self.body_view, self.offset)
+        self.offset += 2
+        return cast(int, val)
 
     def read_u16(self) -> int:
-        val = int.from_bytes(self.body_view[:2], "little", signed=False)
-        self.body_view = self.body_view[2:]
-        return val
+        (val,) = _unpack_u16(self.body_view, self.offset)
+        self.offset += 2
+        return cast(int, val)
 
     def read_i32(self) -> int:
-        val = int.from_bytes(self.body_view[:4], "little", signed=True)
-        self.body_view = self.body_view[4:]
-        return val
+        (val,) = _unpack_i32(self.body_view, self.offset)
+        self.offset += 4
+        return cast(int, val)
 
     def read_u32(self) -> int:
-        val = int.from_bytes(self.body_view[:4], "little", signed=False)
-        self.body_view = self.body_view[4:]
-        return val
+        (val,) = _unpack_u32(self.body_view, self.offset)
+        self.offset += 4
+        return cast(int, val)
 
     def read_i64(self) -> int:
-        val = int.from_bytes(self.body_view[:8], "little", signed=True)
-        self.body_view = self.body_view[8:]
-        return val
+        (val,) = _unpack_i64(self.body_view, self.offset)
+        self.offset += 8
+        return cast(int, val)
 
     def read_u64(self) -> int:
-        val = int.from_bytes(self.body_view[:8], "little", signed=False)
-        self.body_view = self.body_view[8:]
-        return val
+        (val,) = _unpack_u64(self.body_view, self.offset)
+        self.offset += 8
+        return cast(int, val)
 
     # floating-point types
 
     def read_f16(self) -> float:
-        (val,) = struct.unpack_from("<e", self.body_view[:2])
-        self.body_view = self.body_view[2:]
+        (val,) = _unpack_f16(self.body_view, self.offset)
+        self.offset += 2
         return cast(float, val)
 
     def read_f32(self) -> float:
-        (val,) = struct.unpack_from("<f", self.body_view[:4])
-        self.body_view = self.body_view[4:]
+        (val,) = _unpack_f32(self.body_view, self.offset)
+        self.offset += 4
         return cast(float, val)
 
     def read_f64(self) -> float:
-        (val,) = struct.unpack_from("<d", self.body_view[:8])
-        self.body_view = self.body_view[8:]
+        (val,) = _unpack_f64(self.body_view, self.offset)
+        self.offset += 8
         return cast(float, val)
 
     # complex types
@@ -437,35 +481,35 @@ class BanchoPacketReader:
     # XXX: some osu! packets use i16 for
     # array length, while others use i32
     def read_i32_list_i16l(self) -> tuple[int, ...]:
-        length = int.from_bytes(self.body_view[:2], "little")
-        self.body_view = self.body_view[2:]
-
-        val = struct.unpack(f'<{"I" * length}', self.body_view[: length * 4])
-        self.body_view = self.body_view[length * 4 :]
+        (length,) = _unpack_u16(self.body_view, self.offset)
+        val = struct.unpack_from(f"<{length}I", self.body_view, self.offset + 2)
+        self.offset += 2 + length * 4
         return val
 
     def read_i32_list_i32l(self) -> tuple[int, ...]:
-        length = int.from_bytes(self.body_view[:4], "little")
-        self.body_view = self.body_view[4:]
-
-        val = struct.unpack(f'<{"I" * length}', self.body_view[: length * 4])
-        self.body_view = self.body_view[length * 4 :]
+        (length,) = _unpack_u32(self.body_view, self.offset)
+        val = struct.unpack_from(f"<{length}I", self.body_view, self.offset + 4)
+        self.offset += 4 + length * 4
         return val
 
     def read_string(self) -> str:
-        exists = self.body_view[0] == 0x0B
-        self.body_view = self.body_view[1:]
+        body_view = self.body_view
+        offset = self.offset
+
+        exists = body_view[offset] == 0x0B
+        offset += 1
 
         if not exists:
             # no string sent.
+            self.offset = offset
             return ""
 
         # non-empty string, decode str length (uleb128)
         length = shift = 0
 
         while True:
-            byte = self.body_view[0]
-            self.body_view = self.body_view[1:]
+            byte = body_view[offset]
+            offset += 1
 
             length |= (byte & 0x7F) << shift
             if (byte & 0x80) == 0:
@@ -473,11 +517,12 @@ class BanchoPacketReader:
 
             shift += 7
 
+        if offset + length > len(body_view):
+            raise IndexError("string length exceeds packet body")
+
         # explicitly use UTF-8 encoding with error handling for emoji support
-        val = (
-            self.body_view[:length].tobytes().decode("utf-8", errors="replace")
-        )  # copy
-        self.body_view = self.body_view[length:]
+        val = str(body_view[offset : offset + length], "utf-8", "replace")  # copy
+        self.offset = offset + length
         return val
 
     # custom osu! types
@@ -534,8 +579,8 @@ class BanchoPacketReader:
         return match
 
     def read_scoreframe(self) -> ScoreFrame:
-        sf = ScoreFrame(*SCOREFRAME_FMT.unpack_from(self.body_view[:29]))
-        self.body_view = self.body_view[29:]
+        sf = ScoreFrame(*SCOREFRAME_FMT.unpack_from(self.body_view, self.offset))
+        self.offset += 29
 
         if sf.score_v2:
             sf.combo_portion = self.read_f64()
@@ -554,7 +599,7 @@ class BanchoPacketReader:
 
     def read_replayframe_bundle(self) -> ReplayFrameBundle:
         # save raw format to distribute to the other clients
-        raw_data = self.body_view[: self.current_len]
+        raw_data = self.body_view[self.offset : self.offset + self.current_len]
 
         extra = self.read_i32()  # bancho proto >= 18
         framecount = self.read_u16()
@@ -590,7 +635,10 @@ def write_string(s: str) -> bytes:
     if s:
         # explicitly use UTF-8 encoding with error handling for emoji support
         encoded = s.encode("utf-8", errors="replace")
-        ret = b"\x0b" + write_uleb128(len(encoded)) + encoded
+        if len(encoded) < 0x80:  # single byte uleb128 (most strings)
+            ret = b"\x0b" + bytes((len(encoded),)) + encoded
+        else:
+            ret = b"\x0b" + write_uleb128(len(encoded)) + encoded
     else:
         ret = b"\x00"
 
@@ -748,6 +796,97 @@ def write(packid: int, *args: tuple[Any, osuTypes]) -> bytes:
     return bytes(ret)
 
 
+_struct_format_chars: dict[osuTypes, str] = {
+    osuTypes.i8: "b",
+    osuTypes.u8: "B",
+    osuTypes.i16: "h",
+    osuTypes.u16: "H",
+    osuTypes.i32: "i",
+    osuTypes.u32: "I",
+    osuTypes.f32: "f",
+    osuTypes.i64: "q",
+    osuTypes.u64: "Q",
+    osuTypes.f64: "d",
+}
+
+
+# string headers (0x0b + single byte uleb128 length) for strings < 128 bytes
+_SHORT_STRING_HEADERS = tuple(bytes((0x0B, length)) for length in range(0x80))
+
+
+class PacketWriter:
+    """\
+    A precompiled writer for a server packet with a fixed layout.
+
+    Runs of fixed-size fields are compiled into a single `struct.Struct`,
+    while strings are left as variable-length slots. The encoded slots
+    and the header are joined into the packet with a single allocation;
+    layouts with no strings are packed (header included) in one call.
+
+    Intended Usage:
+    >>> write_user_id = PacketWriter(ServerPackets.USER_ID, osuTypes.i32)
+    >>> write_user_id(1001)
+    b'\\x05\\x00\\x00\\x04\\x00\\x00\\x00\\xe9\\x03\\x00\\x00'
+    """
+
+    def __init__(self, packid: ServerPackets, *layout: osuTypes) -> None:
+        self.packid = packid
+        self.layout = layout
+
+        # [(packer for a run of fixed fields | None for a string, start, stop)]
+        self._segments: list[tuple[Callable[..., bytes] | None, int, int]] = []
+
+        fmt = ""
+        for idx, p_type in enumerate(layout):
+            if p_type == osuTypes.string:
+                if fmt:
+                    self._add_fixed_segment(fmt, idx)
+                    fmt = ""
+                self._segments.append((None, idx, idx + 1))
+            elif p_type in _struct_format_chars:
+                fmt += _struct_format_chars[p_type]
+            else:
+                raise ValueError(f"{p_type!r} is not supported by PacketWriter.")
+
+        if fmt:
+            self._add_fixed_segment(fmt, len(layout))
+
+        # fastpath for layouts without any variable-length slots
+        self._fixed: struct.Struct | None = None
+        if osuTypes.string not in layout:
+            self._fixed = struct.Struct(f"{PACKET_HEADER_FMT.format}{fmt}")
+
+    def _add_fixed_segment(self, fmt: str, stop: int) -> None:
+        self._segments.append((struct.Struct(f"<{fmt}").pack, stop - len(fmt), stop))
+
+    def __repr__(self) -> str:
+        return f"<PacketWriter {self.packid!r}>"
+
+    def __call__(self, *args: Any) -> bytes:
+        if self._fixed is not None:
+            return self._fixed.pack(self.packid, self._fixed.size - 7, *args)
+
+        parts = [b""]  # header placeholder
+        append = parts.append
+
+        for pack, start, stop in self._segments:
+            if pack is not None:
+                append(pack(*args[start:stop]))
+            elif args[start]:
+                # explicitly use UTF-8 encoding with error handling for emoji support
+                encoded = args[start].encode("utf-8", errors="replace")
+                if len(encoded) < 0x80:
+                    append(_SHORT_STRING_HEADERS[len(encoded)])
+                else:
+                    append(b"\x0b" + write_uleb128(len(encoded)))
+                append(encoded)
+            else:
+                append(b"\x00")
+
+        parts[0] = PACKET_HEADER_FMT.pack(self.packid, sum(map(len, parts)))
+        return b"".join(parts)
+
+
 #
 # packets
 #
@@ -778,11 +917,17 @@ def login_reply(user_id: int) -> bytes:
 
 
 # packet id: 7
+_write_send_message = PacketWriter(
+    ServerPackets.SEND_MESSAGE,
+    osuTypes.string,  # sender
+    osuTypes.string,  # msg
+    osuTypes.string,  # recipient
+    osuTypes.i32,  # sender_id
+)
+
+
 def send_message(sender: str, msg: str, recipient: str, sender_id: int) -> bytes:
-    return write(
-        ServerPackets.SEND_MESSAGE,
-        ((sender, msg, recipient, sender_id), osuTypes.message),
-    )
+    return _write_send_message(sender, msg, recipient, sender_id)
 
 
 # packet id: 8
@@ -817,30 +962,74 @@ BOT_STATUSES = (
 # `bg_loops.reroll_bot_status` to keep fresh.
 
 
-@cache
+# packet id: 11
+_write_user_stats = PacketWriter(
+    ServerPackets.USER_STATS,
+    osuTypes.i32,  # id
+    osuTypes.u8,  # action
+    osuTypes.string,  # info_text
+    osuTypes.string,  # map_md5
+    osuTypes.i32,  # mods
+    osuTypes.u8,  # mode
+    osuTypes.i32,  # map_id
+    osuTypes.i64,  # rscore
+    osuTypes.f32,  # acc
+    osuTypes.i32,  # plays
+    osuTypes.i64,  # tscore
+    osuTypes.i32,  # rank
+    osuTypes.u16,  # pp
+)
+
+
+def player_packet(
+    packid: ServerPackets,
+) -> Callable[[Callable[[Player], bytes]], Callable[[Player], bytes]]:
+    """\
+    Cache a player's packet until their `packets_version` changes.
+
+    Presence & stats are requested far more often than
+    they change, so we only rebuild them once invalidated.
+    """
+
+    def decorator(func: Callable[[Player], bytes]) -> Callable[[Player], bytes]:
+        @wraps(func)
+        def wrapper(player: Player) -> bytes:
+            cached = player.packet_cache.get(packid)
+            if cached is not None and cached[0] == player.packets_version:
+                return cached[1]
+
+            packet = func(player)
+            player.packet_cache[packid] = (player.packets_version, packet)
+            return packet
+
+        return wrapper
+
+    return decorator
+
+
+# NOTE: the bot's status is re-rolled by invalidating its packets.
+@player_packet(ServerPackets.USER_STATS)
 def bot_stats(player: Player) -> bytes:
     # pick at random from list of potential statuses.
     status_id, status_txt = random.choice(BOT_STATUSES)
 
-    return write(
-        ServerPackets.USER_STATS,
-        (player.id, osuTypes.i32),  # id
-        (status_id, osuTypes.u8),  # action
-        (status_txt, osuTypes.string),  # info_text
-        ("", osuTypes.string),  # map_md5
-        (0, osuTypes.i32),  # mods
-        (0, osuTypes.u8),  # mode
-        (0, osuTypes.i32),  # map_id
-        (0, osuTypes.i64),  # rscore
-        (0.0, osuTypes.f32),  # acc
-        (0, osuTypes.i32),  # plays
-        (0, osuTypes.i64),  # tscore
-        (0, osuTypes.i32),  # rank
-        (0, osuTypes.u16),  # pp
+    return _write_user_stats(
+        player.id,
+        status_id,
+        status_txt,
+        "",  # map_md5
+        0,  # mods
+        0,  # mode
+        0,  # map_id
+        0,  # rscore
+        0.0,  # acc
+        0,  # plays
+        0,  # tscore
+        0,  # rank
+        0,  # pp
     )
 
 
-# packet id: 11
 def _user_stats(
     user_id: int,
     action: int,
@@ -862,25 +1051,28 @@ def _user_stats(
         ranked_score = pp
         pp = 0
 
-    return write(
-        ServerPackets.USER_STATS,
-        (user_id, osuTypes.i32),
-        (action, osuTypes.u8),
-        (info_text, osuTypes.string),
-        (map_md5, osuTypes.string),
-        (mods, osuTypes.i32),
-        (mode, osuTypes.u8),
-        (map_id, osuTypes.i32),
-        (ranked_score, osuTypes.i64),
-        (accuracy / 100.0, osuTypes.f32),
-        (plays, osuTypes.i32),
-        (total_score, osuTypes.i64),
-        (global_rank, osuTypes.i32),
-        (pp, osuTypes.u16),
+    return _write_user_stats(
+        user_id,
+        action,
+        info_text,
+        map_md5,
+        mods,
+        mode,
+        map_id,
+        ranked_score,
+        accuracy / 100.0,
+        plays,
+        total_score,
+        global_rank,
+        pp,
     )
 
 
+@player_packet(ServerPackets.USER_STATS)
 def user_stats(player: Player) -> bytes:
+    if player.is_bot_client:
+        return bot_stats(player)
+
     gm_stats = player.gm_stats
     if gm_stats.pp > 0xFFFF:
         # HACK: if pp is over osu!'s ingame cap,
@@ -891,21 +1083,20 @@ def user_stats(player: Player) -> bytes:
         rscore = gm_stats.rscore
         pp = gm_stats.pp
 
-    return write(
-        ServerPackets.USER_STATS,
-        (player.id, osuTypes.i32),
-        (player.status.action, osuTypes.u8),
-        (player.status.info_text, osuTypes.string),
-        (player.status.map_md5, osuTypes.string),
-        (player.status.mods, osuTypes.i32),
-        (player.status.mode.as_vanilla, osuTypes.u8),
-        (player.status.map_id, osuTypes.i32),
-        (rscore, osuTypes.i64),
-        (gm_stats.acc / 100.0, osuTypes.f32),
-        (gm_stats.plays, osuTypes.i32),
-        (gm_stats.tscore, osuTypes.i64),
-        (gm_stats.rank, osuTypes.i32),
-        (pp, osuTypes.u16),
+    return _write_user_stats(
+        player.id,
+        player.status.action,
+        player.status.info_text,
+        player.status.map_md5,
+        player.status.mods,
+        player.status.mode.as_vanilla,
+        player.status.map_id,
+        rscore,
+        gm_stats.acc / 100.0,
+        gm_stats.plays,
+        gm_stats.tscore,
+        gm_stats.rank,
+        pp,
     )
 
 
@@ -1057,9 +1248,17 @@ def channel_join(name: str) -> bytes:
 
 
 # packet id: 65
+_write_channel_info = PacketWriter(
+    ServerPackets.CHANNEL_INFO,
+    osuTypes.string,  # name
+    osuTypes.string,  # topic
+    osuTypes.u16,  # player count
+)
+
+
 @lru_cache(maxsize=8)
 def channel_info(name: str, topic: str, p_count: int) -> bytes:
-    return write(ServerPackets.CHANNEL_INFO, ((name, topic, p_count), osuTypes.channel))
+    return _write_channel_info(name, topic, p_count)
 
 
 # packet id: 66
@@ -1131,26 +1330,38 @@ def match_player_skipped(user_id: int) -> bytes:
     return write(ServerPackets.MATCH_PLAYER_SKIPPED, (user_id, osuTypes.i32))
 
 
+# packet id: 83
+_write_user_presence = PacketWriter(
+    ServerPackets.USER_PRESENCE,
+    osuTypes.i32,  # id
+    osuTypes.string,  # name
+    osuTypes.u8,  # utc offset (+24)
+    osuTypes.u8,  # country code
+    osuTypes.u8,  # bancho privileges | mode << 5
+    osuTypes.f32,  # longitude
+    osuTypes.f32,  # latitude
+    osuTypes.i32,  # global rank
+)
+
+
 # since the bot is always online and is
 # also automatically added to all player's
 # friends list, their presence is requested
 # *very* frequently; only build it once.
-@cache
+@player_packet(ServerPackets.USER_PRESENCE)
 def bot_presence(player: Player) -> bytes:
-    return write(
-        ServerPackets.USER_PRESENCE,
-        (player.id, osuTypes.i32),
-        (player.name, osuTypes.string),
-        (-5 + 24, osuTypes.u8),
-        (245, osuTypes.u8),  # satellite provider
-        (31, osuTypes.u8),
-        (1234.0, osuTypes.f32),  # send coordinates waaay
-        (4321.0, osuTypes.f32),  # off the map for the bot
-        (0, osuTypes.i32),
+    return _write_user_presence(
+        player.id,
+        player.name,
+        -5 + 24,
+        245,  # satellite provider
+        31,
+        1234.0,  # send coordinates waaay
+        4321.0,  # off the map for the bot
+        0,
     )
 
 
-# packet id: 83
 def _user_presence(
     user_id: int,
     name: str,
@@ -1162,30 +1373,32 @@ def _user_presence(
     longitude: int,
     global_rank: int,
 ) -> bytes:
-    return write(
-        ServerPackets.USER_PRESENCE,
-        (user_id, osuTypes.i32),
-        (name, osuTypes.string),
-        (utc_offset + 24, osuTypes.u8),
-        (country_code, osuTypes.u8),
-        (bancho_privileges | (mode << 5), osuTypes.u8),
-        (longitude, osuTypes.f32),
-        (latitude, osuTypes.f32),
-        (global_rank, osuTypes.i32),
+    return _write_user_presence(
+        user_id,
+        name,
+        utc_offset + 24,
+        country_code,
+        bancho_privileges | (mode << 5),
+        longitude,
+        latitude,
+        global_rank,
     )
 
 
+@player_packet(ServerPackets.USER_PRESENCE)
 def user_presence(player: Player) -> bytes:
-    return write(
-        ServerPackets.USER_PRESENCE,
-        (player.id, osuTypes.i32),
-        (player.name, osuTypes.string),
-        (player.utc_offset + 24, osuTypes.u8),
-        (player.geoloc["country"]["numeric"], osuTypes.u8),
-        (player.bancho_priv | (player.status.mode.as_vanilla << 5), osuTypes.u8),
-        (player.geoloc["longitude"], osuTypes.f32),
-        (player.geoloc["latitude"], osuTypes.f32),
-        (player.gm_stats.rank, osuTypes.i32),
+    if player.is_bot_client:
+        return bot_presence(player)
+
+    return _write_user_presence(
+        player.id,
+        player.name,
+        player.utc_offset + 24,
+        player.geoloc["country"]["numeric"],
+        player.bancho_priv | (player.status.mode.as_vanilla << 5),
+        player.geoloc["longitude"],
+        player.geoloc["latitude"],
+        player.gm_stats.rank,
     )
 
 
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any
+from typing import TypeVar
+
+T = TypeVar("T")
+
+
+class ProcessPool:
+    """\
+    A pool of worker processes, each running one call at a time.
+
+    Unlike a single `ProcessPoolExecutor` (where one killed worker breaks
+    the pool, failing every call running or queued on it), each worker
+    here is its own executor, so a call which times out has only its own
+    worker killed & replaced; calls on the other workers carry on.
+
+    Possibly confusing attributes
+    -----------
+    _workers: set[`ProcessPoolExecutor`]
+        Every worker, each a single process executor, whether idle or not.
+
+    _idle: asyncio.Queue[`ProcessPoolExecutor`]
+        The started workers not currently running a call.
+
+    _starting: set[`asyncio.Future`]
+        The start up of each worker whose process hasn't started yet.
+
+    timeouts: `int`
+        The number of calls which timed out.
+
+    replaced: `int`
+        The number of workers killed (or found dead) & replaced.
+
+    Intended Usage:
+    >>> results = await app.state.services.pp_workers.run(
+    ...     calculate_performances,
+    ...     osu_file_path,
+    ...     scores,
+    ...     timeout=app.settings.PP_CALCULATION_TIMEOUT,
+    ... )
+    """
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+
+        self._workers: set[ProcessPoolExecutor] = set()
+        self._idle: asyncio.Queue[ProcessPoolExecutor] = asyncio.Queue()
+        self._starting: set[asyncio.Future[int]] = set()
+
+        self.timeouts = 0
+        self.replaced = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"<{len(self._workers)} workers, {self._idle.qsize()} idle, "
+            f"{self.timeouts} timeouts, {self.replaced} replaced>"
+        )
+
+    async def start(self) -> None:
+        """Start the pool's worker processes on the running event loop."""
+        self._add_workers()
+        await asyncio.gather(*self._starting)
+
+    async def run(self, func: Callable[..., T], *args: Any, timeout: float) -> T:
+        """\
+        Run `func(*args)` on the next idle worker, waiting for one if all
+        are busy; `timeout` only counts the call, not the wait for a worker.
+
+        Raises `TimeoutError` if the call took too long, or
+        `BrokenProcessPool` if its worker died while running it.
+        """
+        self._add_workers()
+
+        worker = await self._idle.get()
+        call = worker.submit(func, *args)
+
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(call), timeout)
+        except TimeoutError:
+            # the worker would carry on with the call regardless.
+            self.timeouts += 1
+            self._replace_worker(worker)
+            raise
+        except BrokenProcessPool:
+            # the worker died (e.g. crashed on a malformed beatmap).
+            self._replace_worker(worker)
+            raise
+        except asyncio.CancelledError:
+            # the call can't be stopped; hand the worker on once it's done.
+            asyncio.wrap_future(call).add_done_callback(
+                lambda _: self._release_worker(worker),
+            )
+            raise
+        except Exception:
+            self._release_worker(worker)
+            raise
+
+        self._release_worker(worker)
+        return result
+
+    async def shutdown(self) -> None:
+        """Shut down all of the pool's workers, including any running calls."""
+        workers, self._workers = self._workers, set()
+
+        def shutdown_workers() -> None:
+            for worker in workers:
+                worker.shutdown(wait=True, cancel_futures=True)
+
+        # waiting for the workers to exit blocks, so do so off the event loop.
+        await asyncio.to_thread(shutdown_workers)
+
+    def _add_workers(self) -> None:
+        for _ in range(self.size - len(self._workers)):
+            self._add_worker()
+
+    def _add_worker(self) -> None:
+        # spawn rather than fork; the server process has running threads.
+        worker = ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        self._workers.add(worker)
+
+        # start the worker's process before handing it any calls,
+        # so its start up isn't counted against their timeouts.
+        started = asyncio.wrap_future(worker.submit(os.getpid))
+        started.add_done_callback(self._starting.discard)
+        started.add_done_callback(lambda _: self._release_worker(worker))
+        self._starting.add(started)
+
+    def _release_worker(self, worker: ProcessPoolExecutor) -> None:
+        if worker in self._workers:
+            self._idle.put_nowait(worker)
+
+    def _replace_worker(self, worker: ProcessPoolExecutor) -> None:
+        self._workers.discard(worker)
+
+        # (ProcessPoolExecutor has no public way to stop its workers)
+        for process in list(worker._processes.values()):
+            process.kill()
+
+        worker.shutdown(wait=False, cancel_futures=True)
+        self.replaced += 1
+
+        self._add_worker()
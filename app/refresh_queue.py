@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Callable
+from collections.abc import Coroutine
+from collections.abc import Hashable
+from typing import Any
+
+import app.state
+from app.logging import Ansi
+from app.logging import log
+
+Refresh = Callable[[], Coroutine[Any, Any, object]]
+
+
+class RefreshQueue:
+    """\
+    A queue of stale items to be refreshed in the background, with
+    bounded concurrency and a limit on the rate of refreshes.
+
+    Items are refreshed in order of the number of times they were
+    requested while queued, most requested first; requests for items
+    already queued (or being refreshed) don't queue them again.
+
+    Possibly confusing attributes
+    -----------
+    _pending: dict[`Hashable`, list[`int`, `Refresh`]]
+        The request count & refresh of each queued item, by key.
+
+    max_pending: `int`
+        The most items queued at once; requests for new items beyond
+        this are ignored (a stale item will be requested again).
+
+    rate_limit: `float`
+        The most refreshes started per second, across all workers.
+
+    Intended Usage:
+    >>> app.state.sessions.beatmap_refreshes.request(
+    ...     bmap_set.id,
+    ...     bmap_set._update_if_expired,
+    ... )
+    """
+
+    def __init__(
+        self,
+        name: str,
+        concurrency: int,
+        rate_limit: float,
+        max_pending: int = 10_000,
+    ) -> None:
+        self.name = name
+        self.concurrency = concurrency
+        self.rate_limit = rate_limit
+        self.max_pending = max_pending
+
+        self._pending: dict[Hashable, list[Any]] = {}
+        self._in_flight: set[Hashable] = set()
+        self._ready = asyncio.Event()
+        self._next_start = 0.0
+        self._workers: set[asyncio.Task[None]] = set()
+
+        self.completed = 0
+        self.failed = 0
+        self.ignored = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"<{self.name}: {len(self._pending)} queued, "
+            f"{len(self._in_flight)} refreshing, {self.completed} completed, "
+            f"{self.failed} failed, {self.ignored} ignored>"
+        )
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._pending or key in self._in_flight
+
+    @property
+    def running(self) -> bool:
+        """Whether the queue has workers to refresh requested items."""
+        return bool(self._workers)
+
+    def request(self, key: Hashable, refresh: Refresh) -> None:
+        """Request `refresh()` be run in the background, if not already queued."""
+        if key in self._in_flight:
+            return
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            pending[0] += 1
+            return
+
+        if len(self._pending) >= self.max_pending:
+            self.ignored += 1
+            return
+
+        self._pending[key] = [1, refresh]
+        self._ready.set()
+        self._report_pending()
+
+    def start(self) -> None:
+        """Start the queue's workers on the running event loop."""
+        loop = asyncio.get_running_loop()
+
+        for _ in range(self.concurrency - len(self._workers)):
+            self._workers.add(loop.create_task(self._worker()))
+
+    async def stop(self) -> None:
+        """Stop the workers; queued items are left unrefreshed."""
+        for worker in self._workers:
+            worker.cancel()
+
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+
+    async def _worker(self) -> None:
+        while True:
+            while not self._pending:
+                self._ready.clear()
+                await self._ready.wait()
+
+            await self._throttle()
+            if not self._pending:
+                continue  # another worker took the last item
+
+            # the queue is small, and only popped a few times a second.
+            key = max(self._pending, key=lambda k: self._pending[k][0])
+            _, refresh = self._pending.pop(key)
+            self._report_pending()
+
+            self._in_flight.add(key)
+            try:
+                await refresh()
+            except Exception as exc:
+                self.failed += 1
+                log(f"{self.name}: failed to refresh {key!r}: {exc!r}", Ansi.LRED)
+            else:
+                self.completed += 1
+            finally:
+                self._in_flight.discard(key)
+
+    async def _throttle(self) -> None:
+        # space the starts of refreshes evenly, across all workers.
+        now = time.monotonic()
+        start = max(now, self._next_start)
+        self._next_start = start + 1 / self.rate_limit
+
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    def _report_pending(self) -> None:
+        if app.state.services.datadog:
+            app.state.services.datadog.gauge(  # type: ignore[no-untyped-call]
+                f"bancho.{self.name}.pending",
+                len(self._pending),
+            )
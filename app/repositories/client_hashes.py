@@ -59,6 +59,15 @@ class ClientHashWithPlayer(ClientHash):
     priv: int
 
 
+class ClientHashCreateFields(TypedDict):
+    userid: int
+    osupath: str
+    adapters: str
+    uninstall_id: str
+    disk_serial: str
+    latest_time: datetime
+
+
 async def create(
     userid: int,
     osupath: str,
@@ -100,6 +109,25 @@ async def create(
     return cast(ClientHash, client_hash)
 
 
+async def create_many(client_hashes: list[ClientHashCreateFields]) -> None:
+    """\
+    Create or update many client hash entries in the database, in a
+    single query; duplicates within the batch are each counted.
+    """
+    if not client_hashes:
+        return
+
+    insert_stmt = mysql_insert(ClientHashesTable).values(
+        [{**client_hash, "occurrences": 1} for client_hash in client_hashes],
+    )
+    upsert_stmt: MysqlInsert = insert_stmt.on_duplicate_key_update(
+        latest_time=insert_stmt.inserted.latest_time,
+        occurrences=ClientHashesTable.occurrences + 1,
+    )
+
+    await app.state.services.database.execute(upsert_stmt)
+
+
 async def fetch_any_hardware_matches_for_user(
     userid: int,
     running_under_wine: bool,
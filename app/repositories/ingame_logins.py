@@ -55,6 +55,14 @@ class InGameLoginUpdateFields(TypedDict, total=False):
     osu_stream: str
 
 
+class InGameLoginCreateFields(TypedDict):
+    userid: int
+    ip: str
+    osu_ver: date
+    osu_stream: str
+    datetime: datetime
+
+
 async def create(
     user_id: int,
     ip: str,
@@ -78,6 +86,15 @@ async def create(
     return cast(IngameLogin, ingame_login)
 
 
+async def create_many(logins: list[InGameLoginCreateFields]) -> None:
+    """Create many login entries in the database, in a single query."""
+    if not logins:
+        return
+
+    insert_stmt = insert(IngameLoginsTable).values(logins)
+    await app.state.services.database.execute(insert_stmt)
+
+
 async def fetch_one(id: int) -> IngameLogin | None:
     """Fetch a login entry from the database."""
     select_stmt = select(*READ_PARAMS).where(IngameLoginsTable.id == id)
@@ -181,11 +181,19 @@ async def fetch_many(
     clan_priv: int | None = None,
     preferred_mode: int | None = None,
     play_style: int | None = None,
+    ids: list[int] | None = None,
     page: int | None = None,
     page_size: int | None = None,
+    fetch_all_fields: bool = False,
 ) -> list[User]:
     """Fetch multiple users from the database."""
-    select_stmt = select(*READ_PARAMS)
+    if fetch_all_fields:
+        select_stmt = select(UsersTable)
+    else:
+        select_stmt = select(*READ_PARAMS)
+
+    if ids is not None:
+        select_stmt = select_stmt.where(UsersTable.id.in_(ids))
     if priv is not None:
         select_stmt = select_stmt.where(UsersTable.priv == priv)
     if country is not None:
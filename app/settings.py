@@ -50,6 +50,9 @@ DEBUG = read_bool(os.environ["DEBUG"])
 REDIRECT_OSU_URLS = read_bool(os.environ["REDIRECT_OSU_URLS"])
 
 PP_CACHED_ACCURACIES = [int(acc) for acc in read_list(os.environ["PP_CACHED_ACCS"])]
+PP_CALCULATION_WORKERS = int(os.environ.get("PP_CALCULATION_WORKERS") or 2)
+PP_CALCULATION_TIMEOUT = float(os.environ.get("PP_CALCULATION_TIMEOUT") or 10)
+PP_BEATMAP_CACHE_SIZE = int(os.environ.get("PP_BEATMAP_CACHE_SIZE") or 64)
 
 DISALLOWED_NAMES = read_list(os.environ["DISALLOWED_NAMES"])
 DISALLOWED_PASSWORDS = read_list(os.environ["DISALLOWED_PASSWORDS"])
@@ -62,6 +65,30 @@ AUTOMATICALLY_REPORT_PROBLEMS = read_bool(os.environ["AUTOMATICALLY_REPORT_PROBL
 
 LOG_WITH_COLORS = read_bool(os.environ["LOG_WITH_COLORS"])
 
+BACKGROUND_WORKERS = int(os.environ.get("BACKGROUND_WORKERS") or 4)
+BACKGROUND_QUEUE_SIZE = int(os.environ.get("BACKGROUND_QUEUE_SIZE") or 10_000)
+
+LOGIN_CONCURRENCY = int(os.environ.get("LOGIN_CONCURRENCY") or 16)
+LOGIN_QUEUE_SIZE = int(os.environ.get("LOGIN_QUEUE_SIZE") or 500)
+LOGIN_QUEUE_TIMEOUT = float(os.environ.get("LOGIN_QUEUE_TIMEOUT") or 5)
+
+REDIS_SUBMISSION_LOCKS = read_bool(os.environ.get("REDIS_SUBMISSION_LOCKS") or "False")
+
+FAST_START = read_bool(os.environ.get("FAST_START") or "False")
+
+RESTORE_SESSIONS = read_bool(os.environ.get("RESTORE_SESSIONS") or "False")
+SESSION_SNAPSHOT_TTL = int(os.environ.get("SESSION_SNAPSHOT_TTL") or 120)
+
+SCORE_CHECKSUM_FILTER_CAPACITY = int(
+    os.environ.get("SCORE_CHECKSUM_FILTER_CAPACITY") or 5_000_000,
+)
+
+BEATMAP_CACHE_MAX_SETS = int(os.environ.get("BEATMAP_CACHE_MAX_SETS") or 0)
+BEATMAP_CACHE_MAX_MB = int(os.environ.get("BEATMAP_CACHE_MAX_MB") or 256)
+UNSUBMITTED_MAP_TTL = int(os.environ.get("UNSUBMITTED_MAP_TTL") or 30 * 60)
+BEATMAP_REFRESH_CONCURRENCY = int(os.environ.get("BEATMAP_REFRESH_CONCURRENCY") or 2)
+BEATMAP_REFRESH_RATE_LIMIT = float(os.environ.get("BEATMAP_REFRESH_RATE_LIMIT") or 2)
+
 # advanced dev settings
 
 ## WARNING touch this once you've
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from collections.abc import Coroutine
+from typing import Any
+from typing import TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """\
+    Coalesces concurrent calls for the same key into a single call.
+
+    While a call for some key is in flight, any further callers for
+    that key await its result (or exception), rather than making a
+    call of their own; once it completes, the next caller starts anew.
+
+    Possibly confusing attributes
+    -----------
+    _calls: dict[`str`, `asyncio.Task`]
+        The call in flight for each key.
+
+    coalesced: `int`
+        The number of callers which awaited another caller's call.
+
+    Intended Usage:
+    >>> bmap = await app.state.sessions.beatmap_fetches(
+    ...     f"md5:{md5}",
+    ...     lambda: Beatmap._from_md5_uncached(md5),
+    ... )
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[str, asyncio.Task[Any]] = {}
+
+        self.calls = 0
+        self.coalesced = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"<{len(self._calls)} in flight, {self.calls} calls, "
+            f"{self.coalesced} coalesced>"
+        )
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._calls
+
+    async def __call__(
+        self,
+        key: str,
+        call: Callable[[], Coroutine[Any, Any, T]],
+    ) -> T:
+        task = self._calls.get(key)
+
+        if task is None:
+            task = asyncio.get_running_loop().create_task(call())
+            task.add_done_callback(lambda t: self._done(key, t))
+            self._calls[key] = task
+            self.calls += 1
+        else:
+            self.coalesced += 1
+
+        # a caller being cancelled mustn't cancel the call for the others.
+        return await asyncio.shield(task)
+
+    def _done(self, key: str, task: asyncio.Task[Any]) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+        # if every caller was cancelled, no one is left to see an error.
+        if not task.cancelled():
+            task.exception()
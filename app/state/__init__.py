@@ -1,10 +1,12 @@
 from __future__ import annotations
 
-import asyncio
-from collections import defaultdict
 from typing import TYPE_CHECKING
 from typing import Literal
 
+import app.settings
+from app.keyed_lock import KeyedLock
+from app.keyed_lock import RedisKeyedLock
+
 from . import cache
 from . import services
 from . import sessions
@@ -14,13 +16,25 @@ if TYPE_CHECKING:
 
     from app.packets import BasePacket
     from app.packets import ClientPackets
+    from app.packets import PacketTable
 
 loop: AbstractEventLoop
-score_submission_locks: defaultdict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+score_submission_locks: KeyedLock = (
+    RedisKeyedLock("bancho:score_submission_locks")
+    if app.settings.REDIS_SUBMISSION_LOCKS
+    else KeyedLock()
+)
 packets: dict[Literal["all", "restricted"], dict[ClientPackets, type[BasePacket]]] = {
     "all": {},
     "restricted": {},
 }
+packet_tables: dict[Literal["all", "restricted"], PacketTable] = {
+    "all": (),
+    "restricted": (),
+}
 shutting_down = False
 server_start_time: float = 0.0
+startup_timings: dict[str, float] = {}  # {phase: seconds}
+pending_warmups: set[str] = set()  # readiness is reported until this is empty
+failed_warmups: set[str] = set()  # reported by the health check
 reconnected_on_startup: set[int] = set()  # Track players who already reconnected
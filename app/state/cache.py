@@ -1,14 +1,29 @@
 from __future__ import annotations
 
+from pathlib import Path
 from typing import TYPE_CHECKING
 
+import app.settings
+from app.beatmap_cache import BeatmapCache
+from app.bloom_filter import BloomFilter
+from app.expiring_set import ExpiringSet
+from app.osu_file_index import OsuFileIndex
+
 if TYPE_CHECKING:
-    from app.objects.beatmap import Beatmap
-    from app.objects.beatmap import BeatmapSet
+    from app.usecases.leaderboards import Leaderboard
+    from app.usecases.leaderboards import LeaderboardKey
 
 
 bcrypt: dict[bytes, bytes] = {}  # {bcrypt: md5, ...}
-beatmap: dict[str | int, Beatmap] = {}  # {md5: map, id: map, ...}
-beatmapset: dict[int, BeatmapSet] = {}  # {bsid: map_set}
-unsubmitted: set[str] = set()  # {md5, ...}
+beatmaps = BeatmapCache(
+    max_sets=app.settings.BEATMAP_CACHE_MAX_SETS,
+    max_bytes=app.settings.BEATMAP_CACHE_MAX_MB * 1024**2,
+)
+unsubmitted = ExpiringSet(ttl=app.settings.UNSUBMITTED_MAP_TTL)  # {md5, ...}
 needs_update: set[str] = set()  # {md5, ...}
+leaderboards: dict[LeaderboardKey, Leaderboard] = {}  # {(md5, mode, metric): lb}
+score_checksums = BloomFilter(app.settings.SCORE_CHECKSUM_FILTER_CAPACITY)
+osu_files = OsuFileIndex(
+    directory=Path.cwd() / ".data/osu",
+    path=Path.cwd() / ".data/osu_index.json",
+)
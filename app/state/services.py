@@ -23,6 +23,7 @@ from app._typing import IPAddress
 from app.adapters.database import Database
 from app.logging import Ansi
 from app.logging import log
+from app.process_pool import ProcessPool
 
 STRANGE_LOG_DIR = Path.cwd() / ".data/logs"
 
@@ -46,6 +47,9 @@ if str(app.settings.DATADOG_API_KEY) and str(app.settings.DATADOG_APP_KEY):
 
 ip_resolver: IPResolver
 
+# worker processes for pp calculation, started on first use
+pp_workers: ProcessPool | None = None
+
 """ session usecases """
 
 
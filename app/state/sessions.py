@@ -4,11 +4,19 @@ import asyncio
 from typing import TYPE_CHECKING
 from typing import Any
 
+import app.settings
+from app.admission import AdmissionController
+from app.batch_writer import BatchWriter
 from app.logging import Ansi
 from app.logging import log
 from app.objects.collections import Channels
 from app.objects.collections import Matches
 from app.objects.collections import Players
+from app.refresh_queue import RefreshQueue
+from app.repositories import client_hashes as client_hashes_repo
+from app.repositories import ingame_logins as logins_repo
+from app.single_flight import SingleFlight
+from app.work_queue import WorkQueue
 
 if TYPE_CHECKING:
     from app.objects.player import Player
@@ -21,6 +29,35 @@ api_keys: dict[str, int] = {}
 
 housekeeping_tasks: set[asyncio.Task[Any]] = set()
 
+# non-critical work moved off of the request path
+background_jobs = WorkQueue(
+    "background_jobs",
+    app.settings.BACKGROUND_WORKERS,
+    max_size=app.settings.BACKGROUND_QUEUE_SIZE,
+)
+
+# bounds the number of logins processed at once
+login_admission = AdmissionController(
+    "login_admission",
+    concurrency=app.settings.LOGIN_CONCURRENCY,
+    max_queued=app.settings.LOGIN_QUEUE_SIZE,
+    max_wait=app.settings.LOGIN_QUEUE_TIMEOUT,
+)
+
+# login audit rows, inserted in batches off of the login path
+ingame_logins_writer = BatchWriter("ingame_logins", logins_repo.create_many)
+client_hashes_writer = BatchWriter("client_hashes", client_hashes_repo.create_many)
+
+# coalesces concurrent beatmap fetches (& updates) for the same map or set
+beatmap_fetches = SingleFlight()
+
+# expired beatmap sets, updated from the osu!api off of the request path
+beatmap_refreshes = RefreshQueue(
+    "beatmap_refreshes",
+    concurrency=app.settings.BEATMAP_REFRESH_CONCURRENCY,
+    rate_limit=app.settings.BEATMAP_REFRESH_RATE_LIMIT,
+)
+
 bot: Player
 
 
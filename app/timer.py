@@ -25,3 +25,21 @@ class Timer:
         if self.start_time is None or self.end_time is None:
             raise ValueError("Timer has not been started or stopped.")
         return self.end_time - self.start_time
+
+
+class PhaseTimer:
+    """Times the consecutive phases of a process, e.g. a login."""
+
+    def __init__(self) -> None:
+        self.start_time = time.perf_counter()
+        self._lap_time = self.start_time
+        self.phases: dict[str, float] = {}
+
+    def lap(self, phase: str) -> None:
+        """Record the time since the previous lap as `phase`."""
+        now = time.perf_counter()
+        self.phases[phase] = now - self._lap_time
+        self._lap_time = now
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start_time
@@ -0,0 +1,293 @@
+from __future__ import annotations
+
+import time
+from bisect import bisect_left
+from dataclasses import dataclass
+from dataclasses import field
+from typing import TYPE_CHECKING
+from typing import Any
+from typing import Literal
+
+import app.state
+from app.constants.gamemodes import GameMode
+from app.repositories import clans as clans_repo
+from app.usecases import top_scores as top_scores_usecases
+
+if TYPE_CHECKING:
+    from app.objects.player import Player
+    from app.objects.score import Score
+
+# the number of beatmap leaderboards kept in memory at once.
+MAX_CACHED_LEADERBOARDS = 1000
+
+# how long a leaderboard is trusted before being refetched from sql;
+# this bounds staleness from changes made outside of the server.
+LEADERBOARD_CACHE_TTL = 60 * 10
+
+# the number of scores shown on a beatmap's leaderboard in-game.
+LEADERBOARD_SIZE = 50
+
+ScoringMetric = Literal["pp", "score"]
+LeaderboardKey = tuple[str, int, ScoringMetric]  # (map_md5, mode, metric)
+
+SCORE_ROW_COLUMNS = (
+    "s.id, s.{scoring_metric} AS _score, "
+    "s.max_combo, s.n50, s.n100, s.n300, "
+    "s.nmiss, s.nkatu, s.ngeki, s.perfect, s.mods, "
+    "UNIX_TIMESTAMP(s.play_time) time, u.id userid, "
+    "COALESCE(CONCAT('[', c.tag, '] ', u.name), u.name) AS name, "
+    "u.country, (u.priv & 1) = 0 AS restricted"
+)
+SCORE_ROW_TABLES = (
+    "FROM scores s "
+    "INNER JOIN users u ON u.id = s.userid "
+    "LEFT JOIN clans c ON c.id = u.clan_id"
+)
+
+
+def _sort_key(row: dict[str, Any]) -> tuple[float, int]:
+    # highest metric first, earliest submission breaking ties.
+    return (-row["_score"], row["id"])
+
+
+@dataclass
+class Leaderboard:
+    """\
+    The top unrestricted personal best scores on a beatmap in a single mode.
+
+    Possibly confusing attributes
+    -----------
+    rows: list[dict[`str`, `Any`]]
+        Up to `LEADERBOARD_SIZE` score rows, ordered by `_score`.
+
+    complete: `bool`
+        Whether `rows` holds every unrestricted personal best on the
+        map; if not, views filtering `rows` may come up short.
+    """
+
+    rows: list[dict[str, Any]]
+    complete: bool = True
+    by_user: dict[int, dict[str, Any]] = field(default_factory=dict)
+    fetched_at: float = field(default_factory=time.time)
+
+    def __post_init__(self) -> None:
+        self.rows.sort(key=_sort_key)
+        self.by_user = {row["userid"]: row for row in self.rows}
+
+    def add(self, row: dict[str, Any]) -> bool:
+        """Add a new personal best, replacing any previous one.
+
+        Returns whether the leaderboard is still accurate; if not,
+        it should be refetched.
+        """
+        previous = self.by_user.pop(row["userid"], None)
+        if previous is not None:
+            del self.rows[bisect_left(self.rows, _sort_key(previous), key=_sort_key)]
+
+        index = bisect_left(self.rows, _sort_key(row), key=_sort_key)
+        if index == len(self.rows) and not self.complete:
+            # scores which aren't cached may rank above it; if its previous
+            # score was removed from the leaderboard, only sql can fill the gap.
+            return len(self.rows) == LEADERBOARD_SIZE
+
+        if index >= LEADERBOARD_SIZE:
+            self.complete = False
+            return True  # below the top scores
+
+        self.rows.insert(index, row)
+        self.by_user[row["userid"]] = row
+
+        if len(self.rows) > LEADERBOARD_SIZE:
+            del self.by_user[self.rows.pop()["userid"]]
+            self.complete = False
+
+        return True
+
+    def rank_of(self, row: dict[str, Any]) -> int:
+        """Return the rank of `row`, which must be on the leaderboard."""
+        # scores of the same value share a rank (ids are always positive).
+        return 1 + bisect_left(self.rows, (-row["_score"], 0), key=_sort_key)
+
+
+async def fetch(
+    map_md5: str,
+    mode: int,
+    scoring_metric: ScoringMetric,
+) -> Leaderboard:
+    """Fetch a beatmap's leaderboard, from the cache if possible."""
+    key: LeaderboardKey = (map_md5, mode, scoring_metric)
+
+    leaderboard = app.state.cache.leaderboards.pop(key, None)
+    if (
+        leaderboard is None
+        or time.time() - leaderboard.fetched_at > LEADERBOARD_CACHE_TTL
+    ):
+        rows = await app.state.services.database.fetch_all(
+            f"SELECT {SCORE_ROW_COLUMNS.format(scoring_metric=scoring_metric)} "
+            f"{SCORE_ROW_TABLES} "
+            "WHERE s.map_md5 = :map_md5 AND s.status = 2 "  # 2: =best score
+            "AND s.mode = :mode AND u.priv & 1 "
+            "ORDER BY _score DESC, s.id LIMIT :limit",
+            {"map_md5": map_md5, "mode": mode, "limit": LEADERBOARD_SIZE},
+        )
+        leaderboard = Leaderboard(
+            [dict(row) for row in rows],
+            complete=len(rows) < LEADERBOARD_SIZE,
+        )
+
+    # (re)insert as the most recently used leaderboard.
+    app.state.cache.leaderboards[key] = leaderboard
+
+    if len(app.state.cache.leaderboards) > MAX_CACHED_LEADERBOARDS:
+        del app.state.cache.leaderboards[next(iter(app.state.cache.leaderboards))]
+
+    return leaderboard
+
+
+async def fetch_filtered(
+    map_md5: str,
+    mode: int,
+    scoring_metric: ScoringMetric,
+    user_id: int,
+    mods: int | None = None,
+    user_ids: set[int] | None = None,
+    country: str | None = None,
+) -> list[dict[str, Any]]:
+    """\
+    Fetch the top scores on a beatmap matching the given filters from sql,
+    including `user_id`'s own score, even if they're restricted.
+
+    Used for views which the cached leaderboard can't fully serve.
+    """
+    query = [
+        f"SELECT {SCORE_ROW_COLUMNS.format(scoring_metric=scoring_metric)} "
+        f"{SCORE_ROW_TABLES} "
+        "WHERE s.map_md5 = :map_md5 AND s.status = 2 "  # 2: =best score
+        "AND s.mode = :mode AND (u.priv & 1 OR u.id = :user_id)",
+    ]
+    params: dict[str, Any] = {"map_md5": map_md5, "mode": mode, "user_id": user_id}
+
+    if mods is not None:
+        query.append("AND s.mods = :mods")
+        params["mods"] = mods
+    if user_ids is not None:
+        query.append("AND s.userid IN :user_ids")
+        params["user_ids"] = user_ids
+    if country is not None:
+        query.append("AND u.country = :country")
+        params["country"] = country
+
+    query.append("ORDER BY _score DESC, s.id LIMIT :limit")
+    params["limit"] = LEADERBOARD_SIZE
+
+    rows = await app.state.services.database.fetch_all(" ".join(query), params)
+    return [dict(row) for row in rows]
+
+
+async def fetch_personal_best(
+    map_md5: str,
+    mode: int,
+    scoring_metric: ScoringMetric,
+    user_id: int,
+) -> tuple[dict[str, Any], int] | None:
+    """Fetch a player's personal best on a beatmap & its rank from sql."""
+    row = await app.state.services.database.fetch_one(
+        f"SELECT {SCORE_ROW_COLUMNS.format(scoring_metric=scoring_metric)}, "
+        "1 + ("
+        "SELECT COUNT(*) FROM scores os "
+        "INNER JOIN users ou ON ou.id = os.userid "
+        "WHERE os.map_md5 = s.map_md5 AND os.mode = s.mode "
+        "AND os.status = 2 AND ou.priv & 1 "
+        f"AND os.{scoring_metric} > s.{scoring_metric}"
+        ") AS _rank "
+        f"{SCORE_ROW_TABLES} "
+        "WHERE s.map_md5 = :map_md5 AND s.mode = :mode "
+        "AND s.userid = :user_id AND s.status = 2",
+        {"map_md5": map_md5, "mode": mode, "user_id": user_id},
+    )
+    if row is None:
+        return None
+
+    score_row = dict(row)
+    return score_row, score_row.pop("_rank")
+
+
+async def add_score(score: Score) -> None:
+    """Add a newly submitted personal best to its cached leaderboard."""
+    assert score.bmap is not None
+
+    scoring_metric: ScoringMetric = (
+        "pp" if score.mode >= GameMode.RELAX_OSU else "score"
+    )
+    key: LeaderboardKey = (score.bmap.md5, score.mode, scoring_metric)
+
+    leaderboard = app.state.cache.leaderboards.get(key)
+    if leaderboard is None:
+        return  # not cached, will be fetched on next request
+
+    player = score.player
+    assert player is not None
+
+    if player.restricted:
+        return  # restricted players' scores aren't on the leaderboard
+    clan = (
+        await clans_repo.fetch_one(id=player.clan_id)
+        if player.clan_id is not None
+        else None
+    )
+
+    accurate = leaderboard.add(
+        {
+            "id": score.id,
+            "_score": score.pp if scoring_metric == "pp" else score.score,
+            "max_combo": score.max_combo,
+            "n50": score.n50,
+            "n100": score.n100,
+            "n300": score.n300,
+            "nmiss": score.nmiss,
+            "nkatu": score.nkatu,
+            "ngeki": score.ngeki,
+            "perfect": int(score.perfect),
+            "mods": int(score.mods),
+            "time": int(score.server_time.timestamp()),
+            "userid": player.id,
+            "name": f"[{clan['tag']}] {player.name}" if clan else player.name,
+            "country": player.geoloc["country"]["acronym"],
+            "restricted": False,
+        },
+    )
+    if not accurate:
+        del app.state.cache.leaderboards[key]  # refetched on next request
+
+
+def invalidate_user(user_id: int) -> None:
+    """Drop all cached leaderboards `user_id` has a score on.
+
+    Should be called whenever a player is restricted,
+    or their name or clan changes.
+    """
+    for key, leaderboard in list(app.state.cache.leaderboards.items()):
+        if user_id in leaderboard.by_user:
+            del app.state.cache.leaderboards[key]
+
+
+def invalidate_maps(map_md5s: set[str]) -> None:
+    """Drop all cached leaderboards for the beatmaps of `map_md5s`.
+
+    Should be called whenever scores on the beatmaps are deleted;
+    the best scores cached for players' totals are dropped too.
+    """
+    for key in list(app.state.cache.leaderboards):
+        if key[0] in map_md5s:
+            del app.state.cache.leaderboards[key]
+
+    top_scores_usecases.invalidate_maps(map_md5s)
+
+
+def invalidate_all() -> None:
+    """Drop all cached leaderboards.
+
+    Should be called whenever a player is unrestricted; their scores
+    may now belong on leaderboards which don't yet include them.
+    """
+    app.state.cache.leaderboards.clear()
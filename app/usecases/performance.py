@@ -1,14 +1,22 @@
 from __future__ import annotations
 
+import asyncio
 import math
+import os
 from collections.abc import Iterable
+from concurrent.futures.process import BrokenProcessPool
 from dataclasses import dataclass
 from typing import TypedDict
 
 import akatsuki_pp_py
 import rosu_pp_py
 
+import app.settings
+import app.state
 from app.constants.mods import Mods
+from app.logging import Ansi
+from app.logging import log
+from app.process_pool import ProcessPool
 
 
 @dataclass
@@ -57,15 +65,142 @@ class PerformanceResult(TypedDict):
     difficulty: DifficultyRating
 
 
+# a rough size of a parsed beatmap, relative to its .osu file's size.
+PARSED_BEATMAP_SIZE_FACTOR = 2
+DIFFICULTY_ATTRIBUTES_SIZE = 512
+
+
+class _CachedBeatmap:
+    __slots__ = ("osu_file_size", "rosu", "akatsuki", "difficulties", "size")
+
+    def __init__(self, osu_file_size: int) -> None:
+        self.osu_file_size = osu_file_size
+        self.rosu: rosu_pp_py.Beatmap | None = None
+        self.akatsuki: akatsuki_pp_py.Beatmap | None = None
+        # {mods: attrs}
+        self.difficulties: dict[int, rosu_pp_py.DifficultyAttributes] = {}
+        self.size = 0
+
+
+class BeatmapCache:
+    """\
+    A size-bounded LRU cache of parsed beatmaps & their difficulty
+    attributes, keyed by md5 so that an updated .osu file is never
+    confused with its previous version.
+
+    Each process calculating pp keeps its own cache.
+
+    Possibly confusing attributes
+    -----------
+    size: `int`
+        The approximate memory used by the cache, in bytes; parsed
+        beatmaps are estimated from the size of their .osu file.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.size = 0
+        self._entries: dict[str, _CachedBeatmap] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __repr__(self) -> str:
+        lookups = self.hits + self.misses
+        return (
+            f"<{len(self)} beatmaps, {self.size / 1024**2:.1f}/"
+            f"{self.max_size / 1024**2:.0f}MB, "
+            f"{self.hits / lookups if lookups else 0:.1%} hit rate, "
+            f"{self.evictions} evictions>"
+        )
+
+    def _get(self, osu_file_md5: str, osu_file_path: str) -> _CachedBeatmap:
+        # (re)insert as the most recently used beatmap.
+        entry = self._entries.pop(osu_file_md5, None)
+        if entry is None:
+            entry = _CachedBeatmap(os.path.getsize(osu_file_path))
+
+        self._entries[osu_file_md5] = entry
+        return entry
+
+    def _grow(self, entry: _CachedBeatmap, size: int) -> None:
+        entry.size += size
+        self.size += size
+
+        # evict the least recently used beatmaps, keeping the current one.
+        while self.size > self.max_size and len(self._entries) > 1:
+            oldest_md5 = next(iter(self._entries))
+            if self._entries[oldest_md5] is entry:
+                break
+
+            self.size -= self._entries.pop(oldest_md5).size
+            self.evictions += 1
+
+    def rosu_beatmap(self, osu_file_md5: str, osu_file_path: str) -> rosu_pp_py.Beatmap:
+        entry = self._get(osu_file_md5, osu_file_path)
+        if entry.rosu is not None:
+            self.hits += 1
+            return entry.rosu
+
+        self.misses += 1
+        entry.rosu = rosu_pp_py.Beatmap(path=osu_file_path)
+        self._grow(entry, entry.osu_file_size * PARSED_BEATMAP_SIZE_FACTOR)
+        return entry.rosu
+
+    def akatsuki_beatmap(
+        self,
+        osu_file_md5: str,
+        osu_file_path: str,
+    ) -> akatsuki_pp_py.Beatmap:
+        entry = self._get(osu_file_md5, osu_file_path)
+        if entry.akatsuki is not None:
+            self.hits += 1
+            return entry.akatsuki
+
+        self.misses += 1
+        entry.akatsuki = akatsuki_pp_py.Beatmap(path=osu_file_path)
+        self._grow(entry, entry.osu_file_size * PARSED_BEATMAP_SIZE_FACTOR)
+        return entry.akatsuki
+
+    def rosu_difficulty(
+        self,
+        osu_file_md5: str,
+        osu_file_path: str,
+        mods: int,
+    ) -> rosu_pp_py.DifficultyAttributes:
+        entry = self._get(osu_file_md5, osu_file_path)
+        difficulty = entry.difficulties.get(mods)
+        if difficulty is not None:
+            self.hits += 1
+            return difficulty
+
+        beatmap = self.rosu_beatmap(osu_file_md5, osu_file_path)
+        difficulty = rosu_pp_py.Difficulty(mods=mods, lazer=False).calculate(beatmap)
+        entry.difficulties[mods] = difficulty
+        self._grow(entry, DIFFICULTY_ATTRIBUTES_SIZE)
+        return difficulty
+
+
+beatmap_cache = BeatmapCache(max_size=app.settings.PP_BEATMAP_CACHE_SIZE * 1024**2)
+
+
 def calculate_performances(
     osu_file_path: str,
     scores: Iterable[ScoreParams],
+    osu_file_md5: str | None = None,
 ) -> list[PerformanceResult]:
     """\
     Calculate performance for multiple scores on a single beatmap.
 
     Typically most useful for mass-recalculation situations.
 
+    If `osu_file_md5` is given, the parsed beatmap & its difficulty
+    attributes are cached for future calculations on the same file.
+
     TODO: Some level of error handling & returning to caller should be
     implemented here to handle cases where e.g. the beatmap file is invalid
     or there an issue during calculation.
@@ -83,8 +218,19 @@ def calculate_performances(
         for score in scores_list
     )
 
-    akatsuki_bmap = akatsuki_pp_py.Beatmap(path=osu_file_path) if use_akatsuki else None
-    rosu_bmap = rosu_pp_py.Beatmap(path=osu_file_path) if use_rosu else None
+    akatsuki_bmap: akatsuki_pp_py.Beatmap | None = None
+    rosu_bmap: rosu_pp_py.Beatmap | None = None
+
+    if use_akatsuki:
+        akatsuki_bmap = (
+            beatmap_cache.akatsuki_beatmap(osu_file_md5, osu_file_path)
+            if osu_file_md5 is not None
+            else akatsuki_pp_py.Beatmap(path=osu_file_path)
+        )
+
+    if use_rosu and osu_file_md5 is None:
+        # otherwise, cached difficulty attributes are used for each score.
+        rosu_bmap = rosu_pp_py.Beatmap(path=osu_file_path)
 
     results: list[PerformanceResult] = []
 
@@ -143,7 +289,18 @@ def calculate_performances(
                 perf_kwargs["misses"] = score.nmiss
 
             perf = rosu_pp_py.Performance(**perf_kwargs)
-            result = perf.calculate(rosu_bmap)  # type: ignore[arg-type, assignment]
+
+            if osu_file_md5 is not None:
+                # calculating difficulty is the expensive part,
+                # and only depends on the beatmap & mods.
+                difficulty = beatmap_cache.rosu_difficulty(
+                    osu_file_md5,
+                    osu_file_path,
+                    score.mods or 0,
+                )
+                result = perf.calculate(difficulty)  # type: ignore[assignment]
+            else:
+                result = perf.calculate(rosu_bmap)  # type: ignore[arg-type, assignment]
 
         pp: float = result.pp
 
@@ -192,3 +349,56 @@ def calculate_performances(
         )
 
     return results
+
+
+def _get_workers() -> ProcessPool:
+    if app.state.services.pp_workers is None:
+        app.state.services.pp_workers = ProcessPool(app.settings.PP_CALCULATION_WORKERS)
+
+    return app.state.services.pp_workers
+
+
+async def calculate_performances_in_executor(
+    osu_file_path: str,
+    scores: Iterable[ScoreParams],
+    osu_file_md5: str | None = None,
+) -> list[PerformanceResult]:
+    """\
+    Calculate performance for multiple scores on a single beatmap,
+    in a worker process, so the event loop isn't blocked meanwhile.
+
+    Raises `TimeoutError` if the calculation takes longer than
+    `PP_CALCULATION_TIMEOUT` seconds (not counting any wait for
+    a free worker), or `BrokenProcessPool` if its worker died.
+    """
+    try:
+        return await _get_workers().run(
+            calculate_performances,
+            osu_file_path,
+            list(scores),
+            osu_file_md5,
+            timeout=app.settings.PP_CALCULATION_TIMEOUT,
+        )
+    except TimeoutError:
+        # the worker was killed & is being replaced.
+        log(f"A pp calculation timed out while processing {osu_file_path}.", Ansi.LRED)
+        raise
+    except BrokenProcessPool:
+        log(
+            f"A pp calculation worker died while processing {osu_file_path}.",
+            Ansi.LRED,
+        )
+        raise
+
+
+async def start_executor() -> None:
+    """Start the pp calculation worker processes ahead of their first use."""
+    await _get_workers().start()
+
+
+async def shutdown_executor() -> None:
+    """Shut down the pp calculation worker processes, if any were started."""
+    workers = app.state.services.pp_workers
+    if workers is not None:
+        app.state.services.pp_workers = None
+        await workers.shutdown()
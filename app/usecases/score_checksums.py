@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import app.settings
+import app.state
+from app.logging import Ansi
+from app.logging import log
+
+POPULATE_BATCH_SIZE = 5_000
+
+
+async def populate() -> None:
+    """Add every submitted score's checksum to the checksum filter."""
+    if app.settings.REDIS_SUBMISSION_LOCKS:
+        # other processes submit scores this process's filter never sees.
+        return
+
+    checksums = app.state.cache.score_checksums
+    start_time = time.perf_counter()
+
+    last_id = 0
+    while True:
+        rows = await app.state.services.database.fetch_all(
+            "SELECT id, online_checksum FROM scores "
+            "WHERE id > :last_id ORDER BY id LIMIT :limit",
+            {"last_id": last_id, "limit": POPULATE_BATCH_SIZE},
+        )
+
+        for row in rows:
+            checksums.add(row["online_checksum"])
+
+        if len(rows) < POPULATE_BATCH_SIZE:
+            break
+
+        last_id = rows[-1]["id"]
+        await asyncio.sleep(0)  # let other tasks run between batches
+
+    # scores submitted while we were populating were added as they came in.
+    checksums.populated = True
+
+    log(
+        f"Populated score checksum filter in "
+        f"{time.perf_counter() - start_time:.2f}s: {checksums!r}",
+        Ansi.LCYAN,
+    )
+
+    if checksums.count > checksums.capacity:
+        log(
+            f"Score checksum filter is over capacity ({checksums.count:,} > "
+            f"{checksums.capacity:,}), consider raising SCORE_CHECKSUM_FILTER_CAPACITY.",
+            Ansi.LYELLOW,
+        )
+
+
+def add(checksum: str) -> None:
+    """Add a newly submitted score's checksum to the checksum filter."""
+    app.state.cache.score_checksums.add(checksum)
+
+
+async def is_duplicate(checksum: str) -> bool:
+    """Check whether a score with the given checksum has already been submitted."""
+    checksums = app.state.cache.score_checksums
+
+    # a miss is definitive, only a (possible) hit needs confirming from sql;
+    # unless scores are also being submitted through other processes.
+    if (
+        checksums.populated
+        and not app.settings.REDIS_SUBMISSION_LOCKS
+        and checksum not in checksums
+    ):
+        return False
+
+    exists = await app.state.services.database.fetch_one(
+        "SELECT 1 FROM scores WHERE online_checksum = :checksum",
+        {"checksum": checksum},
+    )
+
+    if checksums.populated and exists is None:
+        checksums.record_false_positive()
+
+    return exists is not None
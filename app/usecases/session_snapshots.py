@@ -0,0 +1,585 @@
+from __future__ import annotations
+
+import base64
+import time
+from collections.abc import Mapping
+from datetime import date
+from ipaddress import ip_address
+from typing import TypedDict
+
+import orjson
+
+import app.settings
+import app.state
+from app.constants.gamemodes import GameMode
+from app.constants.mods import Mods
+from app.constants.privileges import ClanPrivileges
+from app.constants.privileges import Privileges
+from app.logging import Ansi
+from app.logging import log
+from app.objects.channel import Channel
+from app.objects.match import Match
+from app.objects.match import MatchTeams
+from app.objects.match import MatchTeamTypes
+from app.objects.match import MatchWinConditions
+from app.objects.match import SlotStatus
+from app.objects.player import Action
+from app.objects.player import ClientDetails
+from app.objects.player import ModeData
+from app.objects.player import OsuStream
+from app.objects.player import OsuVersion
+from app.objects.player import Player
+from app.objects.player import PresenceFilter
+from app.objects.player import Status
+from app.objects.score import Grade
+from app.repositories import tourney_pools as tourney_pools_repo
+from app.repositories import users as users_repo
+from app.repositories.tourney_pools import TourneyPool
+from app.repositories.users import User
+from app.state.services import Geolocation
+
+SNAPSHOT_KEY = "bancho:session_snapshot"
+
+# bumped whenever the snapshot format changes; snapshots
+# from other versions are discarded rather than restored.
+SNAPSHOT_VERSION = 1
+
+
+class ClientDetailsSnapshot(TypedDict):
+    osu_version: tuple[str, int | None, str]  # date, revision, stream
+    osu_path_md5: str
+    adapters_md5: str
+    uninstall_md5: str
+    disk_signature_md5: str
+    adapters: list[str]
+    ip: str
+
+
+class ModeDataSnapshot(TypedDict):
+    tscore: int
+    rscore: int
+    pp: int
+    acc: float
+    plays: int
+    playtime: int
+    max_combo: int
+    total_hits: int
+    rank: int
+    grades: dict[str, int]
+
+
+class PlayerSnapshot(TypedDict):
+    token: str
+    id: int
+    priv: int
+    geoloc: Geolocation
+    utc_offset: int
+    pm_private: bool
+    client_details: ClientDetailsSnapshot | None
+    login_time: float
+    is_tourney_client: bool
+    away_msg: str | None
+    in_lobby: bool
+    stealth: bool
+    pres_filter: int
+    status: tuple[int, str, str, int, int, int]
+    friends: list[int]
+    blocks: list[int]
+    stats: dict[str, ModeDataSnapshot]
+    channels: list[str]
+    spectating: str | None  # host's token
+    packet_queue: str  # base64
+
+
+class SlotSnapshot(TypedDict):
+    player: str | None  # token
+    status: int
+    team: int
+    mods: int
+    loaded: bool
+    skipped: bool
+
+
+class MatchSnapshot(TypedDict):
+    id: int
+    name: str
+    passwd: str
+    has_public_history: bool
+    host_id: int
+    referees: list[str]  # tokens
+    map_id: int
+    map_md5: str
+    map_name: str
+    prev_map_id: int
+    mods: int
+    mode: int
+    freemods: bool
+    slots: list[SlotSnapshot]
+    team_type: int
+    win_condition: int
+    in_progress: bool
+    seed: int
+    tourney_pool_id: int | None
+    is_scrimming: bool
+    match_points: list[tuple[str, int]]
+    bans: list[tuple[int, int]]
+    winners: list[str | None]
+    winning_pts: int
+    use_pp_scoring: bool
+    tourney_clients: list[int]
+
+
+class SessionSnapshot(TypedDict):
+    version: int
+    time: float
+    players: list[PlayerSnapshot]
+    matches: list[MatchSnapshot]
+
+
+def _encode_competitor(competitor: MatchTeams | Player) -> str:
+    """Encode a scrim competitor (a team, or a player's token)."""
+    if isinstance(competitor, MatchTeams):
+        return f"team:{competitor.value}"
+    else:
+        return f"player:{competitor.token}"
+
+
+def _decode_competitor(
+    competitor: str,
+    players: Mapping[str, Player],
+) -> MatchTeams | Player | None:
+    kind, _, value = competitor.partition(":")
+    if kind == "team":
+        return MatchTeams(int(value))
+    else:
+        return players.get(value)
+
+
+def snapshot_player(player: Player) -> PlayerSnapshot:
+    """Capture an online player's session state."""
+    client_details: ClientDetailsSnapshot | None = None
+    if player.client_details is not None:
+        osu_version = player.client_details.osu_version
+        client_details = {
+            "osu_version": (
+                osu_version.date.isoformat(),
+                osu_version.revision,
+                osu_version.stream.value,
+            ),
+            "osu_path_md5": player.client_details.osu_path_md5,
+            "adapters_md5": player.client_details.adapters_md5,
+            "uninstall_md5": player.client_details.uninstall_md5,
+            "disk_signature_md5": player.client_details.disk_signature_md5,
+            "adapters": player.client_details.adapters,
+            "ip": str(player.client_details.ip),
+        }
+
+    return {
+        "token": player.token,
+        "id": player.id,
+        "priv": player.priv.value,
+        "geoloc": player.geoloc,
+        "utc_offset": player.utc_offset,
+        "pm_private": player.pm_private,
+        "client_details": client_details,
+        "login_time": player.login_time,
+        "is_tourney_client": player.is_tourney_client,
+        "away_msg": player.away_msg,
+        "in_lobby": player.in_lobby,
+        "stealth": player.stealth,
+        "pres_filter": player.pres_filter.value,
+        "status": (
+            player.status.action.value,
+            player.status.info_text,
+            player.status.map_md5,
+            player.status.mods.value,
+            player.status.mode.value,
+            player.status.map_id,
+        ),
+        "friends": list(player.friends),
+        "blocks": list(player.blocks),
+        "stats": {
+            str(mode.value): {
+                "tscore": stats.tscore,
+                "rscore": stats.rscore,
+                "pp": stats.pp,
+                "acc": stats.acc,
+                "plays": stats.plays,
+                "playtime": stats.playtime,
+                "max_combo": stats.max_combo,
+                "total_hits": stats.total_hits,
+                "rank": stats.rank,
+                "grades": {grade.name: count for grade, count in stats.grades.items()},
+            }
+            for mode, stats in player.stats.items()
+        },
+        "channels": [channel.real_name for channel in player.channels],
+        "spectating": player.spectating.token if player.spectating else None,
+        "packet_queue": base64.b64encode(b"".join(player._packet_queue)).decode(),
+    }
+
+
+def snapshot_match(match: Match) -> MatchSnapshot:
+    """Capture a multiplayer match's state."""
+    return {
+        "id": match.id,
+        "name": match.name,
+        "passwd": match.passwd,
+        "has_public_history": match.has_public_history,
+        "host_id": match.host_id,
+        "referees": [player.token for player in match.referees],
+        "map_id": match.map_id,
+        "map_md5": match.map_md5,
+        "map_name": match.map_name,
+        "prev_map_id": match.prev_map_id,
+        "mods": match.mods.value,
+        "mode": match.mode.value,
+        "freemods": match.freemods,
+        "slots": [
+            {
+                "player": slot.player.token if slot.player else None,
+                "status": slot.status.value,
+                "team": slot.team.value,
+                "mods": slot.mods.value,
+                "loaded": slot.loaded,
+                "skipped": slot.skipped,
+            }
+            for slot in match.slots
+        ],
+        "team_type": match.team_type.value,
+        "win_condition": match.win_condition.value,
+        "in_progress": match.in_progress,
+        "seed": match.seed,
+        "tourney_pool_id": match.tourney_pool["id"] if match.tourney_pool else None,
+        "is_scrimming": match.is_scrimming,
+        "match_points": [
+            (_encode_competitor(competitor), points)
+            for competitor, points in match.match_points.items()
+        ],
+        "bans": [(mods.value, slot_id) for mods, slot_id in match.bans],
+        "winners": [
+            _encode_competitor(winner) if winner is not None else None
+            for winner in match.winners
+        ],
+        "winning_pts": match.winning_pts,
+        "use_pp_scoring": match.use_pp_scoring,
+        "tourney_clients": list(match.tourney_clients),
+    }
+
+
+def create_snapshot() -> SessionSnapshot:
+    """Capture the state of all online sessions & multiplayer matches."""
+    return {
+        "version": SNAPSHOT_VERSION,
+        "time": time.time(),
+        "players": [
+            snapshot_player(player)
+            for player in app.state.sessions.players
+            if not player.is_bot_client
+        ],
+        "matches": [
+            snapshot_match(match) for match in app.state.sessions.matches if match
+        ],
+    }
+
+
+def _restore_player(snapshot: PlayerSnapshot, user: User) -> Player:
+    client_details = None
+    if snapshot["client_details"] is not None:
+        details = snapshot["client_details"]
+        version_date, revision, stream = details["osu_version"]
+        client_details = ClientDetails(
+            osu_version=OsuVersion(
+                date=date.fromisoformat(version_date),
+                revision=revision,
+                stream=OsuStream(stream),
+            ),
+            osu_path_md5=details["osu_path_md5"],
+            adapters_md5=details["adapters_md5"],
+            uninstall_md5=details["uninstall_md5"],
+            disk_signature_md5=details["disk_signature_md5"],
+            adapters=details["adapters"],
+            ip=ip_address(details["ip"]),
+        )
+
+    player = Player(
+        id=user["id"],
+        name=user["name"],
+        priv=Privileges(user["priv"]),
+        pw_bcrypt=user["pw_bcrypt"].encode(),
+        token=snapshot["token"],
+        clan_id=user["clan_id"] or None,
+        clan_priv=ClanPrivileges(user["clan_priv"]) if user["clan_id"] else None,
+        geoloc=snapshot["geoloc"],
+        utc_offset=snapshot["utc_offset"],
+        pm_private=snapshot["pm_private"],
+        silence_end=user["silence_end"],
+        donor_end=user["donor_end"],
+        client_details=client_details,
+        login_time=snapshot["login_time"],
+        is_tourney_client=snapshot["is_tourney_client"],
+        api_key=user["api_key"],
+    )
+
+    # give the client a full ping interval to reconnect.
+    player.last_recv_time = time.time()
+
+    player.away_msg = snapshot["away_msg"]
+    player.in_lobby = snapshot["in_lobby"]
+    player.stealth = snapshot["stealth"]
+    player.pres_filter = PresenceFilter(snapshot["pres_filter"])
+
+    action, info_text, map_md5, mods, mode, map_id = snapshot["status"]
+    player.status = Status(
+        action=Action(action),
+        info_text=info_text,
+        map_md5=map_md5,
+        mods=Mods(mods),
+        mode=GameMode(mode),
+        map_id=map_id,
+    )
+
+    player.friends = set(snapshot["friends"])
+    player.blocks = set(snapshot["blocks"])
+
+    for mode_value, stats in snapshot["stats"].items():
+        player.stats[GameMode(int(mode_value))] = ModeData(
+            tscore=stats["tscore"],
+            rscore=stats["rscore"],
+            pp=stats["pp"],
+            acc=stats["acc"],
+            plays=stats["plays"],
+            playtime=stats["playtime"],
+            max_combo=stats["max_combo"],
+            total_hits=stats["total_hits"],
+            rank=stats["rank"],
+            grades={Grade[grade]: count for grade, count in stats["grades"].items()},
+        )
+
+    packet_queue = base64.b64decode(snapshot["packet_queue"])
+    if packet_queue:
+        player.enqueue(packet_queue)
+
+    return player
+
+
+def _restore_match(
+    snapshot: MatchSnapshot,
+    players: Mapping[str, Player],
+    tourney_pools: Mapping[int, TourneyPool],
+) -> Match | None:
+    slot_players = [
+        players.get(slot["player"]) if slot["player"] else None
+        for slot in snapshot["slots"]
+    ]
+    if not any(slot_players):
+        return None
+
+    chat_channel = Channel(
+        name=f"#multi_{snapshot['id']}",
+        topic=f"MID {snapshot['id']}'s multiplayer channel.",
+        auto_join=False,
+        instance=True,
+    )
+
+    match = Match(
+        id=snapshot["id"],
+        name=snapshot["name"],
+        password=snapshot["passwd"],
+        has_public_history=snapshot["has_public_history"],
+        map_name=snapshot["map_name"],
+        map_id=snapshot["map_id"],
+        map_md5=snapshot["map_md5"],
+        host_id=snapshot["host_id"],
+        mode=GameMode(snapshot["mode"]),
+        mods=Mods(snapshot["mods"]),
+        win_condition=MatchWinConditions(snapshot["win_condition"]),
+        team_type=MatchTeamTypes(snapshot["team_type"]),
+        freemods=snapshot["freemods"],
+        seed=snapshot["seed"],
+        chat_channel=chat_channel,
+    )
+
+    for slot, slot_snapshot, player in zip(
+        match.slots,
+        snapshot["slots"],
+        slot_players,
+    ):
+        if slot_snapshot["player"] is not None and player is None:
+            # the player's session couldn't be restored.
+            continue
+
+        slot.player = player
+        slot.status = SlotStatus(slot_snapshot["status"])
+        slot.team = MatchTeams(slot_snapshot["team"])
+        slot.mods = Mods(slot_snapshot["mods"])
+        slot.loaded = slot_snapshot["loaded"]
+        slot.skipped = slot_snapshot["skipped"]
+
+        if player is not None:
+            player.match = match
+
+    if not any(player.id == match.host_id for player in slot_players if player):
+        # the host's session couldn't be restored, pass it on.
+        match.host_id = next(player for player in slot_players if player).id
+
+    match.referees = {
+        player for token in snapshot["referees"] if (player := players.get(token))
+    }
+    match.prev_map_id = snapshot["prev_map_id"]
+    match.in_progress = snapshot["in_progress"]
+
+    if snapshot["tourney_pool_id"] is not None:
+        match.tourney_pool = tourney_pools.get(snapshot["tourney_pool_id"])
+
+    match.is_scrimming = snapshot["is_scrimming"]
+    for encoded, points in snapshot["match_points"]:
+        competitor = _decode_competitor(encoded, players)
+        if competitor is not None:
+            match.match_points[competitor] = points
+    match.bans = {(Mods(mods), slot_id) for mods, slot_id in snapshot["bans"]}
+    match.winners = [
+        _decode_competitor(winner, players) if winner is not None else None
+        for winner in snapshot["winners"]
+    ]
+    match.winning_pts = snapshot["winning_pts"]
+    match.use_pp_scoring = snapshot["use_pp_scoring"]
+    match.tourney_clients = set(snapshot["tourney_clients"])
+
+    return match
+
+
+def restore_snapshot(
+    snapshot: SessionSnapshot,
+    users: Mapping[int, User],
+    tourney_pools: Mapping[int, TourneyPool] | None = None,
+) -> list[Player]:
+    """\
+    Restore sessions & matches from `snapshot` into the global collections.
+
+    Sessions whose user no longer exists, or whose privileges have changed
+    since the snapshot was taken, are dropped; their clients will be told
+    to log in again. Returns the restored players.
+    """
+    players: dict[str, Player] = {}
+    restored: list[tuple[Player, PlayerSnapshot]] = []
+
+    for player_snapshot in snapshot["players"]:
+        user = users.get(player_snapshot["id"])
+        if user is None or user["priv"] != player_snapshot["priv"]:
+            continue
+
+        player = _restore_player(player_snapshot, user)
+        players[player.token] = player
+        restored.append((player, player_snapshot))
+        app.state.sessions.players.append(player)
+
+    for match_snapshot in snapshot["matches"]:
+        match = _restore_match(match_snapshot, players, tourney_pools or {})
+        if match is None:
+            continue
+
+        app.state.sessions.matches[match.id] = match
+        app.state.sessions.channels.append(match.chat)
+
+    # channels are joined silently, as clients are already in them.
+    for player, player_snapshot in restored:
+        for channel_name in player_snapshot["channels"]:
+            channel = app.state.sessions.channels.get_by_name(channel_name)
+            if channel is None and channel_name.startswith("#spec_"):
+                host_id = int(channel_name.removeprefix("#spec_"))
+                host = app.state.sessions.players.get(id=host_id)
+                if host is None:
+                    continue
+
+                channel = Channel(
+                    name=channel_name,
+                    topic=f"{host.name}'s spectator channel.",
+                    auto_join=False,
+                    instance=True,
+                )
+                app.state.sessions.channels.append(channel)
+
+            if channel is None or not channel.can_read(player.priv):
+                continue
+
+            channel.append(player)
+            player.channels.append(channel)
+
+    for player, player_snapshot in restored:
+        if player_snapshot["spectating"] is None:
+            continue
+
+        host = players.get(player_snapshot["spectating"])
+        if host is None:
+            # the host's session couldn't be restored.
+            continue
+
+        host.spectators.append(player)
+        host.spectator_relay.add(player)
+        player.spectating = host
+
+    return list(players.values())
+
+
+async def save() -> None:
+    """Save a snapshot of all online sessions to redis."""
+    snapshot = create_snapshot()
+
+    await app.state.services.redis.set(
+        SNAPSHOT_KEY,
+        orjson.dumps(snapshot),
+        ex=app.settings.SESSION_SNAPSHOT_TTL,
+    )
+
+    log(
+        f"Saved {len(snapshot['players'])} sessions & "
+        f"{len(snapshot['matches'])} matches to redis.",
+        Ansi.LCYAN,
+    )
+
+
+async def restore() -> None:
+    """Restore online sessions from the snapshot saved to redis, if any."""
+    data = await app.state.services.redis.getdel(SNAPSHOT_KEY)
+    if data is None:
+        return
+
+    snapshot: SessionSnapshot = orjson.loads(data)
+    if snapshot["version"] != SNAPSHOT_VERSION:
+        log(
+            f"Discarding session snapshot from version {snapshot['version']}.",
+            Ansi.LYELLOW,
+        )
+        return
+
+    user_ids = [player["id"] for player in snapshot["players"]]
+    users = {
+        user["id"]: user
+        for user in await users_repo.fetch_many(ids=user_ids, fetch_all_fields=True)
+    }
+
+    tourney_pools: dict[int, TourneyPool] = {}
+    for match in snapshot["matches"]:
+        pool_id = match["tourney_pool_id"]
+        if pool_id is not None and pool_id not in tourney_pools:
+            tourney_pool = await tourney_pools_repo.fetch_by_id(pool_id)
+            if tourney_pool is not None:
+                tourney_pools[pool_id] = tourney_pool
+
+    restored = restore_snapshot(snapshot, users, tourney_pools)
+
+    # their client state is intact; don't force them to reconnect.
+    app.state.reconnected_on_startup.update(player.id for player in restored)
+
+    if app.state.services.datadog:
+        app.state.services.datadog.increment(  # type: ignore[no-untyped-call]
+            "bancho.online_players",
+            sum(not player.restricted for player in restored),
+        )
+
+    log(
+        f"Restored {len(restored)}/{len(snapshot['players'])} sessions "
+        f"from {time.time() - snapshot['time']:.1f}s ago.",
+        Ansi.LCYAN,
+    )
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import math
+import operator
+import time
+from bisect import bisect_right
+from typing import TypedDict
+
+import app.state
+
+# the number of best scores which are weighted into a player's totals.
+# weights decay geometrically (0.95**i), so beyond this point a score
+# contributes less than a double's precision; only the count matters.
+TOP_SCORES_LIMIT = 1000
+
+WEIGHTS = tuple(0.95**i for i in range(TOP_SCORES_LIMIT))
+
+# how long a player's best scores are trusted before being refetched from
+# sql; this bounds staleness from changes made outside of the server.
+TOP_SCORES_CACHE_TTL = 60 * 10
+
+
+class Totals(TypedDict):
+    pp: int
+    acc: float
+
+
+def calculate_totals(pps: list[float], accs: list[float], count: int) -> Totals:
+    """Calculate weighted pp & acc totals from pp-ordered scores."""
+    if count == 0:
+        return {"pp": 0, "acc": 0.0}
+
+    # calculate total weighted accuracy
+    weighted_acc = math.fsum(map(operator.mul, accs, WEIGHTS))
+    bonus_acc = 100.0 / (20 * (1 - 0.95**count))
+
+    # calculate total weighted pp
+    weighted_pp = math.fsum(map(operator.mul, pps, WEIGHTS))
+    bonus_pp = 416.6667 * (1 - 0.9994**count)
+
+    return {
+        "pp": round(weighted_pp + bonus_pp),
+        "acc": (weighted_acc * bonus_acc) / 100,
+    }
+
+
+class TopScores:
+    """\
+    A player's best scores on ranked & approved maps in a single mode.
+
+    Possibly confusing attributes
+    -----------
+    pps & accs: list[`float`]
+        Parallel arrays of the top `TOP_SCORES_LIMIT` scores' pp & acc,
+        ordered by pp descending.
+
+    md5s: dict[`str`, `float`]
+        The pp of the best score on every ranked map the player has
+        played, including those beyond `TOP_SCORES_LIMIT`; its length
+        is the score count used for bonus pp & acc.
+    """
+
+    def __init__(self) -> None:
+        self.pps: list[float] = []
+        self.accs: list[float] = []
+        self._top_md5s: list[str] = []
+        self.md5s: dict[str, float] = {}
+        self.fetched_at = time.time()
+
+    def __len__(self) -> int:
+        return len(self.md5s)
+
+    def add(self, map_md5: str, pp: float, acc: float) -> None:
+        """Add or replace the player's best score on `map_md5`."""
+        previous = self.md5s.get(map_md5)
+        if previous is not None:
+            idx = bisect_right(self.pps, -previous, key=operator.neg) - 1
+            # walk back over ties to find the map's entry.
+            while idx >= 0 and self.pps[idx] == previous:
+                if self._top_md5s[idx] == map_md5:
+                    del self.pps[idx]
+                    del self.accs[idx]
+                    del self._top_md5s[idx]
+                    break
+                idx -= 1
+
+        self.md5s[map_md5] = pp
+
+        idx = bisect_right(self.pps, -pp, key=operator.neg)
+        if idx < TOP_SCORES_LIMIT:
+            self.pps.insert(idx, pp)
+            self.accs.insert(idx, acc)
+            self._top_md5s.insert(idx, map_md5)
+
+            if len(self.pps) > TOP_SCORES_LIMIT:
+                del self.pps[TOP_SCORES_LIMIT:]
+                del self.accs[TOP_SCORES_LIMIT:]
+                del self._top_md5s[TOP_SCORES_LIMIT:]
+
+    def totals(self) -> Totals:
+        """Calculate the player's weighted pp & acc totals."""
+        return calculate_totals(self.pps, self.accs, len(self.md5s))
+
+    def expired(self) -> bool:
+        return time.time() - self.fetched_at > TOP_SCORES_CACHE_TTL
+
+
+async def _fetch_best_scores(
+    user_id: int,
+    mode: int,
+) -> list[tuple[str, float, float]]:
+    """Fetch a player's ranked best scores' (map_md5, pp, acc), by pp."""
+    rows = await app.state.services.database.fetch_all(
+        "SELECT s.map_md5, s.pp, s.acc FROM scores s "
+        "INNER JOIN maps m ON s.map_md5 = m.md5 "
+        "WHERE s.userid = :user_id AND s.mode = :mode "
+        "AND s.status = 2 AND m.status IN (2, 3) "  # ranked, approved
+        "ORDER BY s.pp DESC",
+        {"user_id": user_id, "mode": mode},
+    )
+    return [(row["map_md5"], row["pp"], row["acc"]) for row in rows]
+
+
+async def fetch(user_id: int, mode: int) -> TopScores:
+    """Load a player's best scores from sql."""
+    top_scores = TopScores()
+
+    for map_md5, pp, acc in await _fetch_best_scores(user_id, mode):
+        top_scores.add(map_md5, pp, acc)
+
+    return top_scores
+
+
+def invalidate_maps(map_md5s: set[str]) -> None:
+    """Drop the cached best scores of online players with a score on `map_md5s`.
+
+    Should be called whenever scores on the beatmaps are deleted.
+    """
+    for player in app.state.sessions.players:
+        for stats in player.stats.values():
+            top_scores = stats.top_scores
+            if top_scores is not None and map_md5s & top_scores.md5s.keys():
+                stats.top_scores = None
+
+
+def invalidate_all() -> None:
+    """Drop all online players' cached best scores.
+
+    Should be called whenever a beatmap's ranked status changes;
+    its scores may now count towards players' totals, or no longer.
+    """
+    for player in app.state.sessions.players:
+        for stats in player.stats.values():
+            stats.top_scores = None
+
+
+async def check_consistency(
+    user_id: int,
+    mode: int,
+    top_scores: TopScores,
+) -> list[str]:
+    """\
+    Compare `top_scores`' totals against a full recalculation from sql.
+
+    Returns a list of human-readable discrepancies (empty if consistent).
+    """
+    best_scores = await _fetch_best_scores(user_id, mode)
+
+    # the original, unbounded calculation
+    weighted_acc = sum(acc * 0.95**i for i, (_, _, acc) in enumerate(best_scores))
+    bonus_acc = 100.0 / (20 * (1 - 0.95 ** len(best_scores))) if best_scores else 0.0
+    weighted_pp = sum(pp * 0.95**i for i, (_, pp, _) in enumerate(best_scores))
+    bonus_pp = 416.6667 * (1 - 0.9994 ** len(best_scores))
+
+    expected: Totals = {
+        "pp": round(weighted_pp + bonus_pp),
+        "acc": (weighted_acc * bonus_acc) / 100,
+    }
+    actual = top_scores.totals()
+
+    discrepancies = []
+
+    if len(top_scores) != len(best_scores):
+        discrepancies.append(
+            f"score count: {len(top_scores)} cached, {len(best_scores)} in sql",
+        )
+
+    if abs(actual["pp"] - expected["pp"]) > 1:
+        discrepancies.append(f"pp: {actual['pp']} cached, {expected['pp']} in sql")
+
+    if not math.isclose(actual["acc"], expected["acc"], abs_tol=1e-6):
+        discrepancies.append(
+            f"acc: {actual['acc']:.6f} cached, {expected['acc']:.6f} in sql",
+        )
+
+    return discrepancies
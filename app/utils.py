@@ -192,6 +192,9 @@ def ensure_persistent_volumes_are_available() -> None:
         subdir = DATA_PATH / sub_dir
         subdir.mkdir(exist_ok=True)
 
+
+def download_missing_assets() -> None:
+    """Download any static assets not yet saved to disk (on first startup)."""
     # download achievement images from osu!
     if not ACHIEVEMENTS_ASSETS_PATH.exists():
         ACHIEVEMENTS_ASSETS_PATH.mkdir(parents=True)
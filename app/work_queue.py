@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable
+from collections.abc import Callable
+from typing import Any
+from typing import NamedTuple
+
+import app.state
+from app.logging import Ansi
+from app.logging import log
+
+
+class Job(NamedTuple):
+    description: str
+    func: Callable[..., Awaitable[object]]
+    args: tuple[Any, ...]
+    retry: bool
+
+
+class WorkQueue:
+    """\
+    A queue of background jobs, run with bounded concurrency.
+
+    Used to take non-critical work (e.g. counters & broadcasts) off of
+    the request path; failed jobs are retried with exponential backoff,
+    unless they were submitted as not safe to run more than once.
+
+    Possibly confusing attributes
+    -----------
+    depth: `int`
+        The number of jobs submitted but not yet completed,
+        including those currently being run by a worker.
+
+    max_size: `int`
+        The most jobs queued at once; jobs submitted beyond
+        this are dropped (and counted in `dropped`).
+
+    Intended Usage:
+    >>> queue.submit("update map plays", update_map_plays, bmap, retry=False)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        concurrency: int,
+        max_retries: int = 3,
+        retry_delay: float = 0.5,
+        max_size: int = 10_000,
+    ) -> None:
+        self.name = name
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.max_size = max_size
+
+        self._queue: asyncio.Queue[Job] = asyncio.Queue(max_size)
+        self._workers: set[asyncio.Task[None]] = set()
+
+        self.in_flight = 0
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"<{self.name}: {self.depth} queued, {self.completed} completed, "
+            f"{self.retried} retried, {self.failed} failed, {self.dropped} dropped>"
+        )
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() + self.in_flight
+
+    def submit(
+        self,
+        description: str,
+        func: Callable[..., Awaitable[object]],
+        *args: Any,
+        retry: bool = True,
+    ) -> None:
+        """\
+        Submit `func(*args)` to be run in the background.
+
+        Jobs which aren't idempotent (e.g. incrementing a counter) must
+        be submitted with `retry=False`, as a failed attempt may have
+        already taken effect.
+        """
+        try:
+            self._queue.put_nowait(Job(description, func, args, retry))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            log(f"{self.name} is full, dropped job: {description}.", Ansi.LRED)
+
+            if app.state.services.datadog:
+                app.state.services.datadog.increment(  # type: ignore[no-untyped-call]
+                    f"bancho.{self.name}.dropped",
+                )
+            return
+
+        self._report_depth()
+
+    def start(self) -> None:
+        """Start the queue's workers on the running event loop."""
+        loop = asyncio.get_running_loop()
+
+        for _ in range(self.concurrency - len(self._workers)):
+            self._workers.add(loop.create_task(self._worker()))
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Wait up to `timeout` seconds for queued jobs, then stop the workers."""
+        if self._workers:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except TimeoutError:
+                log(
+                    f"{self.name} shutting down with {self.depth} unfinished jobs.",
+                    Ansi.LRED,
+                )
+
+        for worker in self._workers:
+            worker.cancel()
+
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            self.in_flight += 1
+
+            try:
+                await self._run(job)
+            finally:
+                self.in_flight -= 1
+                self._queue.task_done()
+                self._report_depth()
+
+    async def _run(self, job: Job) -> None:
+        max_retries = self.max_retries if job.retry else 0
+
+        for attempt in range(max_retries + 1):
+            try:
+                await job.func(*job.args)
+            except Exception as exc:
+                if attempt == max_retries:
+                    self.failed += 1
+                    log(
+                        f"{self.name}: {job.description} failed "
+                        f"after {attempt + 1} attempts: {exc!r}",
+                        Ansi.LRED,
+                    )
+                    return
+
+                self.retried += 1
+                await asyncio.sleep(self.retry_delay * 2**attempt)
+            else:
+                self.completed += 1
+                return
+
+    def _report_depth(self) -> None:
+        if app.state.services.datadog:
+            app.state.services.datadog.gauge(  # type: ignore[no-untyped-call]
+                f"bancho.{self.name}.depth",
+                self.depth,
+            )
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import time
+import tracemalloc
+
+import app.packets
+from app.constants.privileges import Privileges
+from app.objects.collections import Players
+from app.objects.player import Player
+
+PLAYERS = 10_000
+BROADCASTS = 50
+
+
+def build_players() -> Players:
+    players = Players()
+    for id in range(PLAYERS):
+        players.append(
+            Player(
+                id=id,
+                name=f"player {id}",
+                priv=Privileges.UNRESTRICTED,
+                pw_bcrypt=None,
+                token=Player.generate_token(),
+            ),
+        )
+    return players
+
+
+def build_packets() -> list[bytes]:
+    return [
+        app.packets._user_stats(
+            user_id=id,
+            action=2,
+            info_text="Camellia - Exit This Earth's Atomosphere [Evolution]",
+            map_md5="60b725f10c9c85c70d97880dfe8191b3",
+            mods=64,
+            mode=0,
+            map_id=1723723,
+            ranked_score=1_238_917_112,
+            accuracy=98.32,
+            plays=12_345,
+            total_score=9_876_543_210,
+            global_rank=id,
+            pp=8_400,
+        )
+        for id in range(BROADCASTS)
+    ]
+
+
+def test_broadcast_storm():
+    players = build_players()
+    packets = build_packets()
+
+    # the previous implementation copied every packet
+    # into each recipient's own `bytearray` queue.
+    legacy_queues = [bytearray() for _ in range(PLAYERS)]
+    tracemalloc.start()
+    st = time.perf_counter()
+    for packet in packets:
+        for queue in legacy_queues:
+            queue += packet
+    legacy_time = time.perf_counter() - st
+    legacy_mem = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del legacy_queues
+
+    tracemalloc.start()
+    st = time.perf_counter()
+    for packet in packets:
+        players.enqueue(packet)
+    enqueue_time = time.perf_counter() - st
+    enqueue_mem = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    st = time.perf_counter()
+    expected = b"".join(packets)
+    for player in players:
+        assert player.dequeue() == expected
+    dequeue_time = time.perf_counter() - st
+
+    print(
+        f"\n{BROADCASTS} broadcasts to {PLAYERS:,} players:"
+        f"\n  legacy:  {legacy_time * 1000:.1f}ms, {legacy_mem / 1024**2:.1f}MiB queued"
+        f"\n  shared:  {enqueue_time * 1000:.1f}ms, {enqueue_mem / 1024**2:.1f}MiB queued"
+        f"\n  dequeue: {dequeue_time * 1000:.1f}ms",
+    )
+
+    # queues hold references rather than copies of each packet.
+    assert enqueue_mem < legacy_mem
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import asyncio
+import time
+import tracemalloc
+from collections import defaultdict
+
+from app.keyed_lock import KeyedLock
+
+SUBMISSIONS = 1_000_000
+TRACED_SUBMISSIONS = 100_000  # tracing every allocation is slow
+
+
+async def submit_many(locks: KeyedLock, start: int, stop: int) -> None:
+    for i in range(start, stop):
+        async with locks(f"{i:032x}"):
+            pass
+
+
+async def test_keyed_lock_memory_is_bounded():
+    locks = KeyedLock()
+
+    st = time.perf_counter()
+    await submit_many(locks, 0, SUBMISSIONS - TRACED_SUBMISSIONS)
+    elapsed = time.perf_counter() - st
+
+    # trace the last submissions, after the table has long been warm.
+    tracemalloc.start()
+    await submit_many(locks, SUBMISSIONS - TRACED_SUBMISSIONS, SUBMISSIONS)
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # the previous implementation; a lock is kept for every checksum.
+    legacy_locks: defaultdict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    tracemalloc.start()
+    for i in range(TRACED_SUBMISSIONS):
+        async with legacy_locks[f"{i:032x}"]:
+            pass
+    legacy_retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print(
+        f"\n{SUBMISSIONS:,} submissions, "
+        f"{(SUBMISSIONS - TRACED_SUBMISSIONS) / elapsed:,.0f}/s untraced"
+        f"\nlast {TRACED_SUBMISSIONS:,}: {retained / 1024:.1f}KiB retained "
+        f"(legacy: {legacy_retained / 1024 / 1024:.1f}MiB)",
+    )
+
+    assert len(locks) == 0
+    assert retained < 64 * 1024
+    assert len(legacy_locks) == TRACED_SUBMISSIONS
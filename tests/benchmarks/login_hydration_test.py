@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import asyncio
+import gc
+import hashlib
+import statistics
+import time
+from ipaddress import ip_address
+from typing import Any
+
+import pytest
+from sqlalchemy.sql import Select
+
+import app.settings
+import app.state
+from app.api.domains.cho import handle_osu_login_request
+from app.batch_writer import BatchWriter
+from app.constants.privileges import Privileges
+from app.objects.collections import Players
+from app.repositories.stats import StatsTable
+from app.repositories.users import UsersTable
+from app.work_queue import WorkQueue
+
+LOGINS = 400
+CONCURRENT_LOGINS = 16  # LOGIN_CONCURRENCY's default
+POOL_SIZE = 10
+ROUND_TRIP_TIME = 0.002
+
+# the user, hardware matches, stats, relationships & mail are each a
+# database round trip, and the global ranks are one redis round trip;
+# the login & client hash audit rows are written in shared batches.
+ROUND_TRIPS_PER_LOGIN = 7
+
+FIRST_USER_ID = 1000
+PASSWORD_MD5 = hashlib.md5(b"password").hexdigest().encode()
+PASSWORD_BCRYPT = "$2b$12$" + "a" * 53
+
+STATS_ROWS = [
+    {
+        "id": 3,
+        "mode": mode,
+        "tscore": 0,
+        "rscore": 0,
+        "pp": 0,
+        "plays": 0,
+        "playtime": 0,
+        "acc": 0.0,
+        "max_combo": 0,
+        "total_hits": 0,
+        "replay_views": 0,
+        "xh_count": 0,
+        "x_count": 0,
+        "sh_count": 0,
+        "s_count": 0,
+        "a_count": 0,
+    }
+    for mode in (0, 1, 2, 3, 4, 5, 6, 8)
+]
+
+LOGIN_HEADERS = {
+    "CF-IPCountry": "CA",
+    "CF-IPLatitude": "45.5",
+    "CF-IPLongitude": "-73.6",
+}
+
+
+def make_user(user_id: int) -> dict[str, Any]:
+    return {
+        "id": user_id,
+        "name": f"player {user_id}",
+        "safe_name": f"player_{user_id}",
+        "priv": Privileges.UNRESTRICTED | Privileges.VERIFIED,
+        "pw_bcrypt": PASSWORD_BCRYPT,
+        "country": "ca",
+        "silence_end": 0,
+        "donor_end": 0,
+        "creation_time": 0,
+        "latest_activity": 0,
+        "clan_id": 0,
+        "clan_priv": 0,
+        "preferred_mode": 0,
+        "play_style": 0,
+        "custom_badge_name": None,
+        "custom_badge_icon": None,
+        "userpage_content": None,
+        "api_key": None,
+    }
+
+
+def make_login_body(user_id: int) -> bytes:
+    client_hashes = ":".join(
+        [
+            "a" * 32,  # osu! path
+            "00-11-22-33-44-55.",  # adapters
+            "b" * 32,  # adapters md5
+            "c" * 32,  # uninstall id
+            "d" * 32,  # disk signature
+        ],
+    )
+    return (
+        f"player {user_id}\n{PASSWORD_MD5.decode()}\n"
+        f"b20240123|0|0|{client_hashes}:|0\n"
+    ).encode()
+
+
+class LatencyDatabase:
+    """A connection pool to a database with a fixed round trip time."""
+
+    def __init__(self) -> None:
+        self.pool = asyncio.Semaphore(POOL_SIZE)
+        self.round_trips = 0
+
+    async def round_trip(self) -> None:
+        async with self.pool:
+            self.round_trips += 1
+            await asyncio.sleep(ROUND_TRIP_TIME)
+
+    async def execute(self, query: Any, values: Any = None) -> int:
+        await self.round_trip()
+        return 1
+
+    async def fetch_one(self, query: Any, values: Any = None) -> Any:
+        await self.round_trip()
+        if (
+            isinstance(query, Select)
+            and UsersTable.__table__ in query.get_final_froms()
+        ):
+            (safe_name,) = query.compile().params.values()
+            return make_user(int(safe_name.removeprefix("player_")))
+        return None
+
+    async def fetch_all(self, query: Any, values: Any = None) -> list[Any]:
+        await self.round_trip()
+        if (
+            isinstance(query, Select)
+            and StatsTable.__table__ in query.get_final_froms()
+        ):
+            return STATS_ROWS
+        return []
+
+
+class LatencyRedis:
+    def __init__(self) -> None:
+        self.round_trips = 0
+
+    def pipeline(self, transaction: bool = True) -> LatencyRedisPipeline:
+        return LatencyRedisPipeline(self)
+
+
+class LatencyRedisPipeline:
+    def __init__(self, redis: LatencyRedis) -> None:
+        self.redis = redis
+        self.commands = 0
+
+    def zrevrank(self, key: str, member: str) -> None:
+        self.commands += 1
+
+    async def execute(self) -> list[int]:
+        self.redis.round_trips += 1
+        await asyncio.sleep(ROUND_TRIP_TIME / 4)
+        return [41] * self.commands
+
+
+async def measure_logins() -> list[float]:
+    slots = asyncio.Semaphore(CONCURRENT_LOGINS)
+    latencies: list[float] = []
+
+    # don't let earlier tests' garbage land in the tail.
+    gc.collect()
+
+    async def timed_login(user_id: int) -> None:
+        async with slots:
+            st = time.perf_counter()
+            response = await handle_osu_login_request(
+                LOGIN_HEADERS,
+                make_login_body(user_id),
+                ip_address("127.0.0.1"),
+            )
+            latencies.append(time.perf_counter() - st)
+
+        player = app.state.sessions.players.get(id=user_id)
+        assert player is not None and response["osu_token"] == player.token
+
+    await asyncio.gather(
+        *[timed_login(FIRST_USER_ID + i) for i in range(LOGINS)],
+    )
+    return latencies
+
+
+async def test_login_round_trips(monkeypatch: pytest.MonkeyPatch):
+    database, redis = LatencyDatabase(), LatencyRedis()
+    monkeypatch.setattr(app.state.services, "database", database)
+    monkeypatch.setattr(app.state.services, "redis", redis)
+    monkeypatch.setattr(app.settings, "DISALLOW_OLD_CLIENTS", False)
+
+    # every login shares a password, which is already in the bcrypt cache.
+    monkeypatch.setitem(
+        app.state.cache.bcrypt,
+        PASSWORD_BCRYPT.encode(),
+        PASSWORD_MD5,
+    )
+
+    monkeypatch.setattr(app.state.sessions, "players", Players())
+    monkeypatch.setattr(app.state.sessions, "background_jobs", WorkQueue("test", 1))
+    for name in ("ingame_logins_writer", "client_hashes_writer"):
+        writer: BatchWriter[Any] = getattr(app.state.sessions, name)
+        monkeypatch.setattr(
+            app.state.sessions,
+            name,
+            BatchWriter(writer.name, writer.write, flush_interval=0.05),
+        )
+        getattr(app.state.sessions, name).start()
+
+    latencies = await measure_logins()
+    await app.state.sessions.ingame_logins_writer.stop()
+    await app.state.sessions.client_hashes_writer.stop()
+    round_trips = database.round_trips + redis.round_trips
+
+    cuts = statistics.quantiles(latencies, n=100)
+    print(
+        f"\n{LOGINS} logins, {CONCURRENT_LOGINS} at a time, "
+        f"{ROUND_TRIP_TIME * 1000:.0f}ms db round trips: "
+        f"p50 {cuts[49] * 1000:.1f}ms, p99 {cuts[98] * 1000:.1f}ms, "
+        f"{round_trips / LOGINS:.2f} round trips/login",
+    )
+
+    assert app.state.sessions.ingame_logins_writer.written == LOGINS
+    assert app.state.sessions.client_hashes_writer.written == LOGINS
+    assert round_trips <= LOGINS * ROUND_TRIPS_PER_LOGIN
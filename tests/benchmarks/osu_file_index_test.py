@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import random
+import time
+from pathlib import Path
+
+import pytest
+
+from app.osu_file_index import OsuFileIndex
+
+OSU_FILES = 100_000
+OSU_FILE_SIZE = 2048  # real .osu files are typically 10-50x larger
+LOOKUPS = 10_000
+
+
+def populate_beatmaps_directory(directory: Path) -> dict[int, str]:
+    rng = random.Random(727)
+    md5s: dict[int, str] = {}
+
+    for beatmap_id in range(1, OSU_FILES + 1):
+        data = rng.randbytes(OSU_FILE_SIZE)
+        with open(directory / f"{beatmap_id}.osu", "wb") as f:
+            f.write(data)
+        md5s[beatmap_id] = hashlib.md5(data).hexdigest()
+
+    return md5s
+
+
+def test_osu_file_index_lookup_time(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    directory = tmp_path / "osu"
+    directory.mkdir()
+    md5s = populate_beatmaps_directory(directory)
+
+    index = OsuFileIndex(directory=directory, path=tmp_path / "osu_index.json")
+
+    st = time.perf_counter()
+    assert index.rebuild() == OSU_FILES
+    rebuild_time = time.perf_counter() - st
+
+    st = time.perf_counter()
+    index.save()
+    save_time = time.perf_counter() - st
+
+    # a fresh process
+    index = OsuFileIndex(directory=directory, path=tmp_path / "osu_index.json")
+    st = time.perf_counter()
+    index.load()
+    load_time = time.perf_counter() - st
+
+    beatmap_ids = random.Random(1337).choices(range(1, OSU_FILES + 1), k=LOOKUPS)
+
+    # what `disk_has_expected_osu_file` did before the index.
+    st = time.perf_counter()
+    for beatmap_id in beatmap_ids:
+        osu_file_path = directory / f"{beatmap_id}.osu"
+        if osu_file_path.exists():
+            hashlib.md5(osu_file_path.read_bytes()).hexdigest()
+    hashing_time = time.perf_counter() - st
+
+    # lookups are served from the index, without reading any files.
+    def read_bytes(self: Path) -> bytes:
+        raise AssertionError(f"{self} was read")
+
+    monkeypatch.setattr(Path, "read_bytes", read_bytes)
+
+    st = time.perf_counter()
+    for beatmap_id in beatmap_ids:
+        assert index.md5(beatmap_id) == md5s[beatmap_id]
+    index_time = time.perf_counter() - st
+
+    monkeypatch.undo()
+
+    print(
+        f"\n{OSU_FILES:,} .osu files: index rebuilt in {rebuild_time:.2f}s, "
+        f"saved in {save_time * 1000:.0f}ms "
+        f"({os.path.getsize(tmp_path / 'osu_index.json') / 1024**2:.1f}MB), "
+        f"loaded in {load_time * 1000:.0f}ms"
+        f"\nper lookup: {hashing_time / LOOKUPS * 1e6:.1f}µs hashing, "
+        f"{index_time / LOOKUPS * 1e6:.1f}µs indexed",
+    )
+
+    assert index.rehashes == 0
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import random
+import struct
+import time
+
+import app.packets
+import app.state
+from app.api.domains import cho  # noqa: F401 (registers packet handlers)
+from app.packets import BanchoPacketReader
+from app.packets import ClientPackets
+from app.packets import osuTypes
+
+REQUESTS = 5_000
+FUZZ_ITERATIONS = 20_000
+
+
+def client_packet(packid: ClientPackets, payload: bytes = b"") -> bytes:
+    return app.packets.PACKET_HEADER_FMT.pack(packid, len(payload)) + payload
+
+
+def spectate_frames(frame_count: int) -> bytes:
+    payload = bytearray()
+    payload += struct.pack("<iH", 0, frame_count)  # extra, frame count
+    for i in range(frame_count):
+        payload += struct.pack("<BBffi", 1, 0, 256.0, 192.0, i * 16)
+
+    payload += struct.pack("<B", 0)  # action
+    payload += app.packets.SCOREFRAME_FMT.pack(
+        1000,
+        0,
+        300,
+        10,
+        0,
+        0,
+        5,
+        1,
+        1_000_000,
+        100,
+        120,
+        True,
+        0,
+        0,
+        False,
+    )
+    payload += struct.pack("<H", 1)  # sequence
+    return client_packet(ClientPackets.SPECTATE_FRAMES, bytes(payload))
+
+
+def realistic_body() -> bytes:
+    """A typical spectating client's request: frames, chat & a status."""
+    return b"".join(
+        (
+            client_packet(ClientPackets.PING),
+            spectate_frames(frame_count=8),
+            spectate_frames(frame_count=8),
+            client_packet(
+                ClientPackets.SEND_PUBLIC_MESSAGE,
+                app.packets.write(
+                    ClientPackets.SEND_PUBLIC_MESSAGE,  # type: ignore[arg-type]
+                    (("", "nice fc!!", "#spectator", 0), osuTypes.message),
+                )[7:],
+            ),
+            client_packet(
+                ClientPackets.CHANGE_ACTION,
+                struct.pack("<B", 2)
+                + app.packets.write_string("Camellia - Exit This Earth's Atomosphere")
+                + app.packets.write_string("60b725f10c9c85c70d97880dfe8191b3")
+                + struct.pack("<IBi", 64, 0, 1723723),
+            ),
+            client_packet(ClientPackets.RECEIVE_UPDATES, struct.pack("<i", 1)),
+            client_packet(ClientPackets.LOGOUT, struct.pack("<i", 0)),
+            app.packets.PACKET_HEADER_FMT.pack(0xFFFF, 4) + b"\x00" * 4,  # unknown
+            client_packet(ClientPackets.PING),
+        ),
+    )
+
+
+def test_packet_reader_throughput():
+    body = realistic_body()
+    packet_table = app.state.packet_tables["all"]
+
+    with memoryview(body) as body_view:
+        per_request = sum(1 for _ in BanchoPacketReader(body_view, packet_table))
+
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        with memoryview(body) as body_view:
+            for _packet in BanchoPacketReader(body_view, packet_table):
+                pass
+    elapsed = time.perf_counter() - start
+
+    total = per_request * REQUESTS
+    print(
+        f"\n{total:,} packets ({len(body)} byte bodies) "
+        f"in {elapsed * 1000:.1f}ms ({total / elapsed:,.0f} packets/s)",
+    )
+
+    assert per_request == 8
+    assert total / elapsed > 10_000
+
+
+def test_packet_reader_fuzz_framing():
+    """Random bodies must never break the reader's framing."""
+    rng = random.Random(1337)
+
+    class RawPacket(app.packets.BasePacket):
+        def __init__(self, reader: BanchoPacketReader) -> None:
+            self.data = reader.read_raw()
+
+        async def handle(self, player): ...
+
+    packet_table = app.packets.make_packet_table(
+        {p: RawPacket for p in ClientPackets if p >= 0},
+    )
+    seed = realistic_body()
+
+    for _ in range(FUZZ_ITERATIONS):
+        if rng.random() < 0.5:
+            body = rng.randbytes(rng.randrange(64))
+        else:  # flip a few bytes of a realistic body
+            body = bytearray(seed)
+            for _ in range(rng.randrange(1, 8)):
+                body[rng.randrange(len(body))] = rng.randrange(256)
+            body = bytes(body[: rng.randrange(len(body) + 1)])
+
+        with memoryview(body) as body_view:
+            reader = BanchoPacketReader(body_view, packet_table)
+            for packet in reader:
+                assert len(packet.data) == reader.current_len
+
+            assert reader.offset == len(body)
+
+
+def test_packet_reader_fuzz_handlers():
+    """Malformed payloads may only fail within the handler's own reads."""
+    rng = random.Random(7331)
+    packet_table = app.state.packet_tables["all"]
+    seed = realistic_body()
+    failures = 0
+
+    for _ in range(FUZZ_ITERATIONS):
+        body = bytearray(seed)
+        for _ in range(rng.randrange(1, 8)):
+            body[rng.randrange(len(body))] = rng.randrange(256)
+
+        with memoryview(body) as body_view:
+            try:
+                for _packet in BanchoPacketReader(body_view, packet_table):
+                    pass
+            except (struct.error, IndexError, ValueError):
+                failures += 1
+
+    print(f"\n{failures:,}/{FUZZ_ITERATIONS:,} mutated bodies had malformed packets")
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import timeit
+
+import pytest
+
+import app.packets
+from app.packets import PacketWriter
+from app.packets import ServerPackets
+from app.packets import osuTypes
+
+ITERATIONS = 20_000
+
+
+@pytest.mark.parametrize(
+    ("packid", "args"),
+    [
+        (
+            ServerPackets.USER_STATS,
+            [
+                (1001, osuTypes.i32),
+                (2, osuTypes.u8),
+                ("Camellia - Exit This Earth's Atomosphere", osuTypes.string),
+                ("60b725f10c9c85c70d97880dfe8191b3", osuTypes.string),
+                (64, osuTypes.i32),
+                (0, osuTypes.u8),
+                (1723723, osuTypes.i32),
+                (1_238_917_112, osuTypes.i64),
+                (0.9832, osuTypes.f32),
+                (12_345, osuTypes.i32),
+                (9_876_543_210, osuTypes.i64),
+                (42, osuTypes.i32),
+                (8_400, osuTypes.u16),
+            ],
+        ),
+        (
+            ServerPackets.USER_PRESENCE,
+            [
+                (1001, osuTypes.i32),
+                ("cmyui", osuTypes.string),
+                (19, osuTypes.u8),
+                (38, osuTypes.u8),
+                (31, osuTypes.u8),
+                (43.768, osuTypes.f32),
+                (-79.522, osuTypes.f32),
+                (42, osuTypes.i32),
+            ],
+        ),
+        (
+            ServerPackets.SEND_MESSAGE,
+            [
+                ("cmyui", osuTypes.string),
+                ("woah woah crazy!!", osuTypes.string),
+                ("#osu", osuTypes.string),
+                (1001, osuTypes.i32),
+            ],
+        ),
+        (
+            ServerPackets.USER_LOGOUT,
+            [
+                (1001, osuTypes.i32),
+                (0, osuTypes.u8),
+            ],
+        ),
+    ],
+)
+def test_packet_writer_throughput(packid, args):
+    writer = PacketWriter(packid, *(p_type for _, p_type in args))
+    values = [value for value, _ in args]
+
+    assert writer(*values) == app.packets.write(packid, *args)
+
+    write_time = timeit.timeit(
+        lambda: app.packets.write(packid, *args),
+        number=ITERATIONS,
+    )
+    writer_time = timeit.timeit(lambda: writer(*values), number=ITERATIONS)
+
+    print(
+        f"\n{packid!r}: write() {ITERATIONS / write_time:,.0f}/s, "
+        f"PacketWriter {ITERATIONS / writer_time:,.0f}/s "
+        f"({write_time / writer_time:.1f}x)",
+    )
+
+    assert writer_time < write_time
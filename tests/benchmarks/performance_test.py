@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Awaitable
+from collections.abc import Callable
+from pathlib import Path
+
+import app.usecases.performance
+from app.usecases.performance import ScoreParams
+
+SAMPLE_OSU_FILE = Path("testing/sample_data/vivid_osu_file.osu")
+HIT_OBJECTS = 50_000
+CALCULATIONS = 5
+
+
+def write_long_map(path: Path) -> None:
+    header = SAMPLE_OSU_FILE.read_text().split("[HitObjects]")[0]
+    hit_objects = "\n".join(
+        f"{64 + (i * 37) % 384},{48 + (i * 53) % 288},{520 + i * 89},1,0,"
+        for i in range(HIT_OBJECTS)
+    )
+    path.write_text(f"{header}[HitObjects]\n{hit_objects}\n")
+
+
+async def measure_max_stall(calculate: Callable[[], Awaitable[None]]) -> float:
+    """Measure the longest the event loop went unresponsive during `calculate`."""
+    max_stall = 0.0
+
+    async def ticker() -> None:
+        nonlocal max_stall
+        while True:
+            st = time.perf_counter()
+            await asyncio.sleep(0.001)
+            max_stall = max(max_stall, time.perf_counter() - st - 0.001)
+
+    ticker_task = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)  # let the ticker settle
+    await calculate()
+    await asyncio.sleep(0.01)  # let the ticker observe any final stall
+    ticker_task.cancel()
+
+    return max_stall
+
+
+async def test_pp_calculation_event_loop_stall(tmp_path: Path):
+    osu_file_path = tmp_path / "long_map.osu"
+    write_long_map(osu_file_path)
+    scores = [ScoreParams(mode=0, mods=64, acc=98.0)]
+
+    async def inline() -> None:
+        for _ in range(CALCULATIONS):
+            app.usecases.performance.calculate_performances(str(osu_file_path), scores)
+            await asyncio.sleep(0)  # as if each were a separate request
+
+    async def in_executor() -> None:
+        for _ in range(CALCULATIONS):
+            await app.usecases.performance.calculate_performances_in_executor(
+                str(osu_file_path),
+                scores,
+            )
+
+    try:
+        # start the worker processes up front.
+        await app.usecases.performance.calculate_performances_in_executor(
+            str(SAMPLE_OSU_FILE),
+            scores,
+        )
+
+        inline_stall = await measure_max_stall(inline)
+        executor_stall = await measure_max_stall(in_executor)
+    finally:
+        await app.usecases.performance.shutdown_executor()
+
+    print(
+        f"\nmax event loop stall over {CALCULATIONS} calculations "
+        f"({HIT_OBJECTS:,} objects): {inline_stall * 1000:.1f}ms inline, "
+        f"{executor_stall * 1000:.1f}ms in executor",
+    )
+
+    assert executor_stall < inline_stall
+
+
+def test_beatmap_cache_throughput(tmp_path: Path):
+    osu_file_path = tmp_path / "long_map.osu"
+    write_long_map(osu_file_path)
+    scores = [ScoreParams(mode=0, mods=64, acc=98.0)]
+
+    st = time.perf_counter()
+    for _ in range(CALCULATIONS):
+        app.usecases.performance.calculate_performances(str(osu_file_path), scores)
+    uncached_time = time.perf_counter() - st
+
+    st = time.perf_counter()
+    for _ in range(CALCULATIONS):
+        app.usecases.performance.calculate_performances(
+            str(osu_file_path),
+            scores,
+            osu_file_md5="a" * 32,
+        )
+    cached_time = time.perf_counter() - st
+
+    print(
+        f"\n{CALCULATIONS} calculations ({HIT_OBJECTS:,} objects): "
+        f"{uncached_time * 1000:.1f}ms uncached, {cached_time * 1000:.1f}ms cached"
+        f"\n{app.usecases.performance.beatmap_cache!r}",
+    )
+
+    assert cached_time < uncached_time
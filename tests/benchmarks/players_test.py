@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import random
+import time
+
+from app.constants.privileges import Privileges
+from app.objects.collections import Players
+from app.objects.player import Player
+
+LOOKUPS = 10_000
+
+
+def build_players(count: int) -> Players:
+    players = Players()
+    for id in range(count):
+        players.append(
+            Player(
+                id=id,
+                name=f"player {id}",
+                priv=Privileges.UNRESTRICTED,
+                pw_bcrypt=None,
+                token=Player.generate_token(),
+            ),
+        )
+    return players
+
+
+def time_token_lookups(players: Players) -> float:
+    tokens = [random.choice(players).token for _ in range(LOOKUPS)]
+
+    st = time.perf_counter()
+    for token in tokens:
+        players.get(token=token)
+    return (time.perf_counter() - st) / LOOKUPS
+
+
+def test_players_lookup_time_is_flat():
+    timings = {}
+    for count in (100, 1_000, 10_000, 50_000):
+        players = build_players(count)
+        timings[count] = time_token_lookups(players)
+        players.check_invariants()
+
+    for count, per_lookup in timings.items():
+        print(f"{count:>6} sessions: {per_lookup * 1e9:,.0f}ns/lookup")
+
+    # a linear scan would be ~500x slower at 50k than at
+    # 100 sessions; leave plenty of headroom for noisy ci.
+    assert timings[50_000] < timings[100] * 10
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import time
+
+import bcrypt
+import orjson
+import pytest
+
+import app.state
+from app.constants.gamemodes import GameMode
+from app.constants.privileges import Privileges
+from app.objects.channel import Channel
+from app.objects.collections import Channels
+from app.objects.collections import Matches
+from app.objects.collections import Players
+from app.objects.player import ModeData
+from app.objects.player import Player
+from app.usecases import session_snapshots
+
+SESSIONS = 5_000
+SPECTATORS = 500
+BCRYPT_SAMPLES = 3
+
+
+@pytest.fixture(autouse=True)
+def empty_sessions(monkeypatch: pytest.MonkeyPatch) -> None:
+    channels = Channels()
+    channels.append(Channel(name="#osu", topic="General discussion."))
+    channels.append(Channel(name="#announce", topic="Exemplary performance."))
+
+    monkeypatch.setattr(app.state.sessions, "players", Players())
+    monkeypatch.setattr(app.state.sessions, "channels", channels)
+    monkeypatch.setattr(app.state.sessions, "matches", Matches())
+
+
+def simulate_sessions(count: int) -> None:
+    channels = [c for c in app.state.sessions.channels]
+
+    for id in range(2, count + 2):
+        player = Player(
+            id=id,
+            name=f"player {id}",
+            priv=Privileges.UNRESTRICTED | Privileges.VERIFIED,
+            pw_bcrypt=b"$2b$12$bcrypt",
+            token=Player.generate_token(),
+        )
+        for mode in (GameMode.VANILLA_OSU, GameMode.RELAX_OSU):
+            player.stats[mode] = ModeData(
+                tscore=1_000_000,
+                rscore=500_000,
+                pp=id,
+                acc=98.5,
+                plays=100,
+                playtime=36_000,
+                max_combo=727,
+                total_hits=50_000,
+                rank=id,
+                grades={},
+            )
+
+        app.state.sessions.players.append(player)
+        for channel in channels:
+            channel.append(player)
+            player.channels.append(channel)
+
+    players = list(app.state.sessions.players)
+    for host, spectator in zip(players[:SPECTATORS], players[SPECTATORS:]):
+        host.add_spectator(spectator)
+
+    for player in players:
+        player.dequeue()
+
+
+def test_restore_sessions_time():
+    simulate_sessions(SESSIONS)
+    tokens = [p.token for p in app.state.sessions.players]
+
+    st = time.perf_counter()
+    data = orjson.dumps(session_snapshots.create_snapshot())
+    save_time = time.perf_counter() - st
+
+    users = {
+        p.id: {
+            "id": p.id,
+            "name": p.name,
+            "priv": p.priv.value,
+            "pw_bcrypt": "$2b$12$bcrypt",
+            "clan_id": 0,
+            "clan_priv": 0,
+            "silence_end": 0,
+            "donor_end": 0,
+            "api_key": None,
+        }
+        for p in app.state.sessions.players
+    }
+
+    # a fresh process
+    app.state.sessions.players = Players()
+    app.state.sessions.channels = Channels(
+        [Channel(name=c.name, topic=c.topic) for c in app.state.sessions.channels[:2]],
+    )
+    app.state.sessions.matches = Matches()
+
+    st = time.perf_counter()
+    restored = session_snapshots.restore_snapshot(
+        orjson.loads(data),
+        users,  # type: ignore[arg-type]
+    )
+    restore_time = time.perf_counter() - st
+
+    # time-to-full-service: every client's next poll finds its session.
+    assert len(restored) == SESSIONS
+    assert all(app.state.sessions.players.get(token=token) for token in tokens)
+    app.state.sessions.players.check_invariants()
+
+    # without a snapshot, each client must log in again; the password
+    # check alone (before any sql) dwarfs the entire restore.
+    pw_bcrypt = bcrypt.hashpw(b"password md5", bcrypt.gensalt())
+    st = time.perf_counter()
+    for _ in range(BCRYPT_SAMPLES):
+        bcrypt.checkpw(b"password md5", pw_bcrypt)
+    relogin_time = (time.perf_counter() - st) / BCRYPT_SAMPLES * SESSIONS
+
+    print(
+        f"\n{SESSIONS:,} sessions: {len(data) / 1024**2:.1f}MB snapshot, "
+        f"saved in {save_time * 1000:.0f}ms, restored in {restore_time * 1000:.0f}ms"
+        f"\nre-login stampede: ~{relogin_time:.0f}s of bcrypt alone",
+    )
+
+    assert restore_time < relogin_time / 10
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import time
+import tracemalloc
+
+from app.constants.privileges import Privileges
+from app.objects.player import Player
+
+SPECTATORS = 500
+POLLS = 20
+BUNDLES_PER_POLL = 4  # frame bundles sent by the host between polls
+BUNDLE_SIZE = 400
+
+
+def make_player(id: int) -> Player:
+    return Player(
+        id=id,
+        name=f"player {id}",
+        priv=Privileges.UNRESTRICTED,
+        pw_bcrypt=None,
+        token=Player.generate_token(),
+    )
+
+
+def test_spectator_relay_popular_stream():
+    host = make_player(0)
+    spectators = [make_player(id) for id in range(1, SPECTATORS + 1)]
+    bundles = [bytes([i % 256]) * BUNDLE_SIZE for i in range(BUNDLES_PER_POLL)]
+
+    # the previous implementation enqueued each bundle to every spectator,
+    # and each spectator's poll then stitched together its own response.
+    tracemalloc.start()
+    st = time.perf_counter()
+    for _ in range(POLLS):
+        for bundle in bundles:
+            for spectator in spectators:
+                spectator.enqueue(bundle)
+        responses = [spectator.dequeue() for spectator in spectators]
+    legacy_time = time.perf_counter() - st
+    legacy_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    for spectator in spectators:
+        spectator.spectating = host
+        host.spectator_relay.add(spectator)
+
+    expected = b"".join(bundles)
+
+    tracemalloc.start()
+    st = time.perf_counter()
+    for _ in range(POLLS):
+        for bundle in bundles:
+            host.spectator_relay.push(bundle)
+        responses = [spectator.dequeue() for spectator in spectators]
+    relay_time = time.perf_counter() - st
+    relay_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    frames = POLLS * BUNDLES_PER_POLL * SPECTATORS
+    print(
+        f"\n{POLLS * BUNDLES_PER_POLL} bundles to {SPECTATORS} spectators:"
+        f"\n  legacy: {legacy_time * 1000:.1f}ms ({frames / legacy_time:,.0f} frames/s), "
+        f"peak {legacy_peak / 1024:.0f}KiB"
+        f"\n  relay:  {relay_time * 1000:.1f}ms ({frames / relay_time:,.0f} frames/s), "
+        f"peak {relay_peak / 1024:.0f}KiB"
+        f"\n  host:   {host.spectator_relay}",
+    )
+
+    assert all(data == expected for data in responses)
+    assert host.spectator_relay.frames_relayed == POLLS * BUNDLES_PER_POLL
+    # responses share a single coalesced buffer, rather than one per spectator.
+    assert relay_peak < legacy_peak
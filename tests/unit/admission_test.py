@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import asyncio
+
+from app.admission import AdmissionController
+
+
+async def test_admission_bounds_concurrency_in_order():
+    controller = AdmissionController("test", concurrency=2, max_queued=10, max_wait=1)
+    running = 0
+    max_running = 0
+    order: list[int] = []
+
+    async def login(i: int) -> None:
+        nonlocal running, max_running
+        async with controller(f"client {i}") as admitted:
+            assert admitted
+            order.append(i)
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.001)
+            running -= 1
+
+    await asyncio.gather(*[login(i) for i in range(10)])
+
+    assert max_running == 2
+    assert order == list(range(10))
+    assert controller.admitted == 10
+    assert controller.active == controller.queued == 0
+
+
+async def test_admission_turns_away_excess_requests():
+    controller = AdmissionController("test", concurrency=1, max_queued=2, max_wait=0.05)
+    release = asyncio.Event()
+    outcomes: dict[str, bool] = {}
+
+    async def login(key: str) -> None:
+        async with controller(key) as admitted:
+            outcomes[key] = admitted
+            if admitted:
+                await release.wait()
+
+    tasks = [asyncio.create_task(login(f"client {i}")) for i in range(4)]
+    await asyncio.sleep(0)
+
+    # one is running, two are queued; the last is turned away immediately.
+    assert controller.active == 1
+    assert controller.queued == 2
+    await tasks[3]
+    assert outcomes["client 3"] is False
+
+    # the queued clients wait too long, and are turned away too.
+    await asyncio.gather(tasks[1], tasks[2])
+    assert outcomes["client 1"] is outcomes["client 2"] is False
+
+    release.set()
+    await tasks[0]
+    assert controller.rejected == 3
+    assert controller.active == 0
+
+
+async def test_admission_retries_keep_their_place():
+    controller = AdmissionController("test", concurrency=1, max_queued=1, max_wait=1)
+    release = asyncio.Event()
+    order: list[str] = []
+
+    async def login(key: str) -> bool:
+        async with controller(key) as admitted:
+            if admitted:
+                order.append(key)
+                await release.wait()
+            return admitted
+
+    running = asyncio.create_task(login("running"))
+    queued = asyncio.create_task(login("queued"))
+    await asyncio.sleep(0)
+
+    # turned away while the queue is full.
+    assert await login("retrying") is False
+
+    release.set()
+    await asyncio.gather(running, queued)
+    release.clear()
+
+    # when the queue frees up, the retrying client is ahead of newcomers.
+    blocker = asyncio.create_task(login("blocker"))
+    await asyncio.sleep(0)
+    controller.max_queued = 2
+    newcomer = asyncio.create_task(login("newcomer"))
+    await asyncio.sleep(0)
+    retrying = asyncio.create_task(login("retrying"))
+    await asyncio.sleep(0)
+
+    release.set()
+    await asyncio.gather(blocker, newcomer, retrying)
+
+    assert order == ["running", "queued", "blocker", "retrying", "newcomer"]
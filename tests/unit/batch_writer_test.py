@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import pytest
+
+from app.batch_writer import BatchWriter
+
+
+async def test_flush_writes_in_batches():
+    batches: list[list[int]] = []
+
+    async def write(rows: list[int]) -> None:
+        batches.append(rows)
+
+    writer = BatchWriter("test", write, max_batch_size=2)
+    for row in range(5):
+        writer.add(row)
+
+    await writer.flush()
+
+    assert batches == [[0, 1], [2, 3], [4]]
+    assert writer.written == 5
+
+
+async def test_failed_writes_are_retried():
+    batches: list[list[int]] = []
+    failures = 1
+
+    async def write(rows: list[int]) -> None:
+        nonlocal failures
+        if failures:
+            failures -= 1
+            raise ConnectionError("database went away")
+        batches.append(rows)
+
+    writer = BatchWriter("test", write, max_batch_size=2)
+    for row in range(3):
+        writer.add(row)
+
+    await writer.flush()
+    assert batches == []
+    assert writer.dropped == 0
+
+    await writer.flush()
+    assert batches == [[0, 1], [2]]
+    assert writer.written == 3
+
+
+@pytest.mark.parametrize("max_batch_size", [1, 3])
+async def test_stop_flushes_buffered_rows(max_batch_size: int):
+    written: list[int] = []
+
+    async def write(rows: list[int]) -> None:
+        written.extend(rows)
+
+    writer = BatchWriter("test", write, max_batch_size=max_batch_size)
+    writer.start()
+    writer.add(1)
+    writer.add(2)
+    await writer.stop()
+
+    assert written == [1, 2]
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from datetime import datetime
+from datetime import timedelta
+
+from app.beatmap_cache import BeatmapCache
+from app.beatmap_cache import estimate_size
+from app.objects.beatmap import Beatmap
+from app.objects.beatmap import BeatmapSet
+
+
+def make_set(
+    bsid: int,
+    maps: int = 2,
+    checked_ago: timedelta = timedelta(),
+) -> BeatmapSet:
+    beatmap_set = BeatmapSet(id=bsid, last_osuapi_check=datetime.now() - checked_ago)
+    beatmap_set.maps = [
+        Beatmap(
+            beatmap_set,
+            md5=f"{bsid:016x}{i:016x}",
+            id=bsid * 100 + i,
+            set_id=bsid,
+            last_update=datetime.now(),
+        )
+        for i in range(maps)
+    ]
+    return beatmap_set
+
+
+def test_evicts_least_recently_used_sets():
+    cache = BeatmapCache(max_sets=2)
+    first, second, third = make_set(1), make_set(2), make_set(3)
+
+    cache.add_set(first)
+    cache.add_set(second)
+    assert cache.get_map(first.maps[0].md5) is first.maps[0]
+
+    cache.add_set(third)
+
+    # both keys of each of the second set's maps leave with it.
+    assert cache.get_set(2) is None
+    assert all(cache.get_map(bmap.md5) is None for bmap in second.maps)
+    assert all(cache.get_map(bmap.id) is None for bmap in second.maps)
+
+    assert cache.get_set(1) is first
+    assert cache.get_map(third.maps[1].id) is third.maps[1]
+    assert cache.evictions == 1
+
+
+def test_evicts_to_byte_limit():
+    size = estimate_size(make_set(1))
+    cache = BeatmapCache(max_bytes=size * 3)
+
+    for bsid in range(1, 11):
+        cache.add_set(make_set(bsid))
+
+    assert len(cache) == 3
+    assert cache.total_bytes <= size * 3
+    assert [cache.get_set(bsid) is not None for bsid in (7, 8, 9, 10)] == [
+        False,
+        True,
+        True,
+        True,
+    ]
+
+
+def test_refresh_set_reindexes_changed_maps():
+    cache = BeatmapCache()
+    beatmap_set = make_set(1)
+    cache.add_set(beatmap_set)
+
+    old_md5 = beatmap_set.maps[0].md5
+    beatmap_set.maps[0].md5 = "f" * 32
+    del beatmap_set.maps[1]
+    cache.refresh_set(beatmap_set)
+
+    assert cache.get_map(old_md5) is None
+    assert cache.get_map("f" * 32) is beatmap_set.maps[0]
+    assert cache.get_map(101) is None
+    assert cache.total_bytes == estimate_size(beatmap_set)
+
+
+def test_evict_expired_sets():
+    cache = BeatmapCache()
+    fresh, expired = make_set(1), make_set(2, checked_ago=timedelta(days=2))
+    cache.add_set(fresh)
+    cache.add_set(expired)
+
+    assert cache.evict_expired() == 1
+    assert cache.get_set(1) is fresh
+    assert cache.get_set(2) is None
+    assert cache.get_map(expired.maps[0].md5) is None
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import random
+
+from app.bloom_filter import BloomFilter
+
+CAPACITY = 100_000
+
+
+def random_checksum(rng: random.Random) -> str:
+    return f"{rng.getrandbits(128):032x}"
+
+
+def test_bloom_filter_has_no_false_negatives():
+    rng = random.Random(1337)
+    checksums = [random_checksum(rng) for _ in range(CAPACITY)]
+
+    bloom_filter = BloomFilter(CAPACITY)
+    for checksum in checksums:
+        bloom_filter.add(checksum)
+
+    assert all(checksum in bloom_filter for checksum in checksums)
+    assert bloom_filter.count == CAPACITY
+
+
+def test_bloom_filter_false_positive_rate():
+    rng = random.Random(1337)
+
+    bloom_filter = BloomFilter(CAPACITY, error_rate=0.001)
+    for _ in range(CAPACITY):
+        bloom_filter.add(random_checksum(rng))
+
+    false_positives = sum(random_checksum(rng) in bloom_filter for _ in range(CAPACITY))
+
+    # at capacity, both the observed & estimated rates should be near target.
+    assert false_positives / CAPACITY < 0.002
+    assert bloom_filter.estimated_false_positive_rate < 0.002
+
+    # ~1.44 * log2(1 / error_rate) bits per key
+    assert bloom_filter.memory_usage < CAPACITY * 15 / 8
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import pytest
+
+from app.constants.privileges import Privileges
+from app.objects.collections import Players
+from app.objects.player import Player
+
+
+def make_player(id: int, name: str | None = None) -> Player:
+    return Player(
+        id=id,
+        name=name or f"player {id}",
+        priv=Privileges.UNRESTRICTED,
+        pw_bcrypt=None,
+        token=Player.generate_token(),
+    )
+
+
+def test_players_lookup_by_token_id_and_name():
+    players = Players()
+    player = make_player(1000, "Cool Guy")
+    players.append(player)
+
+    assert players.get(token=player.token) is player
+    assert players.get(id=1000) is player
+    assert players.get(name="cool_guy") is player
+    assert players.get(name="Cool Guy") is player
+    assert "Cool Guy" in players
+    assert "cool_guy" not in players  # exact name only
+    assert player in players
+    assert players.get(id=1001) is None
+
+    players.check_invariants()
+
+
+def test_players_logout_removes_stale_token():
+    players = Players()
+    player = make_player(1000)
+    players.append(player)
+
+    token = player.token
+    player.token = ""  # as done by `Player.logout`
+    players.remove(player)
+
+    assert players.get(token=token) is None
+    assert players.get(id=1000) is None
+    assert player not in players
+    players.check_invariants()
+
+
+def test_players_multiple_sessions_per_id():
+    players = Players()
+    first = make_player(1000)
+    tourney = make_player(1000)
+    players.append(first)
+    players.append(tourney)
+
+    assert players.get(id=1000) is first
+    players.remove(first)
+    assert players.get(id=1000) is tourney
+    players.check_invariants()
+
+
+def test_players_reindex_after_name_change():
+    players = Players()
+    player = make_player(1000, "old name")
+    players.append(player)
+
+    player.name = "new name"
+    with pytest.raises(RuntimeError):
+        players.check_invariants()
+
+    players.reindex(player)
+    assert players.get(name="old name") is None
+    assert players.get(name="new name") is player
+    players.check_invariants()
+
+
+def test_players_double_append_is_ignored():
+    players = Players()
+    player = make_player(1000)
+    players.append(player)
+    players.append(player)
+
+    assert len(players) == 1
+    players.check_invariants()
+
+
+def test_players_privilege_views():
+    players = Players()
+    player = make_player(1000)
+    staff = make_player(1001)
+    staff.priv |= Privileges.MODERATOR
+    players.append(player)
+    players.append(staff)
+
+    assert players.unrestricted == {player, staff}
+    assert players.staff == {staff}
+    assert players.restricted == set()
+    assert sorted(players.unrestricted_ids) == [1000, 1001]
+    assert players.staff_ids == (1001,)
+    unrestricted = players.unrestricted
+
+    player.priv &= ~Privileges.UNRESTRICTED  # as done by `Player.restrict`
+    players.repartition(player)
+
+    assert players.unrestricted == {staff}
+    assert players.restricted == {player}
+    assert players.unrestricted_ids == (1001,)
+    assert players.restricted_ids == (1000,)
+    assert unrestricted == {player, staff}  # views are snapshots
+    players.check_invariants()
+
+    players.remove(staff)
+    assert players.staff == set()
+    assert players.staff_ids == ()
+    players.check_invariants()
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import asyncio
+
+from app.keyed_lock import KeyedLock
+
+
+async def test_keyed_lock_serializes_same_key():
+    locks = KeyedLock()
+    events: list[str] = []
+
+    async def submit(key: str, name: str) -> None:
+        async with locks(key):
+            events.append(f"{name} start")
+            await asyncio.sleep(0.001)
+            events.append(f"{name} end")
+
+    await asyncio.gather(submit("a", "first"), submit("a", "second"))
+
+    assert events == ["first start", "first end", "second start", "second end"]
+    assert len(locks) == 0
+
+
+async def test_keyed_lock_removes_entries_of_cancelled_waiters():
+    locks = KeyedLock()
+    release = asyncio.Event()
+
+    async def holder() -> None:
+        async with locks("a"):
+            await release.wait()
+
+    holding = asyncio.create_task(holder())
+    await asyncio.sleep(0)
+
+    async def waiter() -> None:
+        async with locks("a"):
+            pass
+
+    waiting = asyncio.create_task(waiter())
+    await asyncio.sleep(0)
+    waiting.cancel()
+    await asyncio.gather(waiting, return_exceptions=True)
+    assert "a" in locks
+
+    release.set()
+    await holding
+    assert "a" not in locks
@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import time
+from typing import Any
+
+import pytest
+
+import app.state
+from app.api.domains.osu import LeaderboardType
+from app.api.domains.osu import get_leaderboard_scores
+from app.constants.mods import Mods
+from app.constants.privileges import Privileges
+from app.objects.player import Player
+from app.usecases import leaderboards as leaderboards_usecases
+from app.usecases.leaderboards import LEADERBOARD_SIZE
+from app.usecases.leaderboards import Leaderboard
+
+MAP_MD5 = "60b725f10c9c85c70d97880dfe8191b3"
+
+
+def make_row(
+    id: int,
+    userid: int,
+    score: float,
+    mods: int = 0,
+    country: str = "ca",
+    restricted: bool = False,
+) -> dict:
+    return {
+        "id": id,
+        "_score": score,
+        "max_combo": 100,
+        "n50": 0,
+        "n100": 0,
+        "n300": 100,
+        "nmiss": 0,
+        "nkatu": 0,
+        "ngeki": 0,
+        "perfect": 1,
+        "mods": mods,
+        "time": 0,
+        "userid": userid,
+        "name": f"player {userid}",
+        "country": country,
+        "restricted": restricted,
+    }
+
+
+def make_player(id: int, priv: Privileges = Privileges.UNRESTRICTED) -> Player:
+    return Player(
+        id=id,
+        name=f"player {id}",
+        priv=priv,
+        pw_bcrypt=None,
+        token=Player.generate_token(),
+    )
+
+
+async def fetch_ids(
+    leaderboard_type: LeaderboardType,
+    player: Player,
+    mods: Mods = Mods.NOMOD,
+) -> tuple[list[int], dict[str, Any] | None]:
+    rows, personal_best = await get_leaderboard_scores(
+        leaderboard_type,
+        MAP_MD5,
+        0,
+        mods,
+        player,
+        "score",
+    )
+    return [row["id"] for row in rows], personal_best
+
+
+def test_leaderboard_add_replaces_personal_best():
+    leaderboard = Leaderboard([make_row(1, 1, 500), make_row(2, 2, 300)])
+
+    leaderboard.add(make_row(3, 2, 700))
+    assert [row["id"] for row in leaderboard.rows] == [3, 1]
+    assert leaderboard.by_user[2]["id"] == 3
+
+    # ties are broken by submission order
+    leaderboard.add(make_row(4, 3, 500))
+    assert [row["id"] for row in leaderboard.rows] == [3, 1, 4]
+
+
+def test_leaderboard_keeps_only_the_top_scores():
+    leaderboard = Leaderboard(
+        [make_row(id, id, 1000 - id) for id in range(1, LEADERBOARD_SIZE + 1)],
+    )
+    assert leaderboard.complete
+
+    # scores below the top scores aren't kept.
+    leaderboard.add(make_row(100, 100, 1))
+    assert 100 not in leaderboard.by_user
+    assert len(leaderboard.rows) == LEADERBOARD_SIZE
+
+    # scores among them push the lowest score off the leaderboard.
+    leaderboard.add(make_row(101, 101, 5000))
+    assert leaderboard.rows[0]["id"] == 101
+    assert len(leaderboard.rows) == LEADERBOARD_SIZE
+    assert LEADERBOARD_SIZE not in leaderboard.by_user
+    assert not leaderboard.complete
+
+
+def test_leaderboard_add_below_the_cached_scores():
+    leaderboard = Leaderboard(
+        [make_row(id, id, 1000 - id) for id in range(1, LEADERBOARD_SIZE + 1)],
+        complete=False,
+    )
+
+    # a new score below the top scores is simply left out.
+    assert leaderboard.add(make_row(100, 100, 1))
+    assert len(leaderboard.rows) == LEADERBOARD_SIZE
+
+    # but a personal best moving below them (e.g. a better pp score with
+    # a lower score) leaves a gap which only a refetch can fill.
+    assert not leaderboard.add(make_row(101, 1, 1))
+
+
+def test_leaderboard_rank_shared_by_equal_scores():
+    leaderboard = Leaderboard(
+        [make_row(1, 1, 900), make_row(2, 2, 800), make_row(3, 3, 800)],
+    )
+    assert leaderboard.rank_of(leaderboard.by_user[1]) == 1
+    assert leaderboard.rank_of(leaderboard.by_user[2]) == 2
+    assert leaderboard.rank_of(leaderboard.by_user[3]) == 2
+
+
+@pytest.fixture
+def sql_leaderboards(monkeypatch: pytest.MonkeyPatch) -> list[dict[str, Any]]:
+    """The scores behind the cached leaderboards, as seen by sql."""
+    score_rows: list[dict[str, Any]] = [
+        make_row(2, 2, 800, restricted=True),
+        make_row(5, 5, 500, mods=Mods.HIDDEN),
+    ]
+
+    async def fetch_filtered(
+        map_md5: str,
+        mode: int,
+        scoring_metric: str,
+        user_id: int,
+        mods: int | None = None,
+        user_ids: set[int] | None = None,
+        country: str | None = None,
+    ) -> list[dict[str, Any]]:
+        board = app.state.cache.leaderboards[(map_md5, mode, scoring_metric)]
+        return [
+            row
+            for row in sorted(score_rows + board.rows, key=lambda r: -r["_score"])
+            if (not row["restricted"] or row["userid"] == user_id)
+            and (mods is None or row["mods"] == mods)
+            and (user_ids is None or row["userid"] in user_ids)
+        ]
+
+    async def fetch_personal_best(
+        map_md5: str,
+        mode: int,
+        scoring_metric: str,
+        user_id: int,
+    ) -> tuple[dict[str, Any], int] | None:
+        for row in score_rows:
+            if row["userid"] == user_id:
+                return row, 2
+        return None
+
+    monkeypatch.setattr(leaderboards_usecases, "fetch_filtered", fetch_filtered)
+    monkeypatch.setattr(
+        leaderboards_usecases,
+        "fetch_personal_best",
+        fetch_personal_best,
+    )
+    return score_rows
+
+
+async def test_leaderboard_views_derived_from_cache(
+    sql_leaderboards: list[dict[str, Any]],
+):
+    app.state.cache.leaderboards[(MAP_MD5, 0, "score")] = Leaderboard(
+        [
+            make_row(1, 1, 900, mods=Mods.HIDDEN, country="us"),
+            make_row(3, 3, 700, mods=Mods.HIDDEN),
+            make_row(4, 4, 600),
+        ],
+        fetched_at=time.time(),
+    )
+    player = make_player(4)
+    player.friends = {3}
+    player.geoloc["country"]["acronym"] = "ca"
+
+    ids, personal_best = await fetch_ids(LeaderboardType.Top, player)
+    assert ids == [1, 3, 4]
+    assert personal_best is not None and personal_best["rank"] == 3
+    assert "rank" not in app.state.cache.leaderboards[(MAP_MD5, 0, "score")].by_user[4]
+
+    assert (await fetch_ids(LeaderboardType.Mods, player, Mods.HIDDEN))[0] == [1, 3]
+    assert (await fetch_ids(LeaderboardType.Friends, player))[0] == [3, 4]
+    assert (await fetch_ids(LeaderboardType.Country, player))[0] == [3, 4]
+
+    # restricted players may see their own scores
+    restricted = make_player(2, priv=Privileges(0))
+    ids, personal_best = await fetch_ids(LeaderboardType.Top, restricted)
+    assert ids == [1, 2, 3, 4]
+    assert personal_best is not None and personal_best["rank"] == 2
+
+    app.state.cache.leaderboards.clear()
+
+
+async def test_leaderboard_views_beyond_the_cached_scores(
+    sql_leaderboards: list[dict[str, Any]],
+):
+    app.state.cache.leaderboards[(MAP_MD5, 0, "score")] = Leaderboard(
+        [make_row(1, 1, 900, mods=Mods.HIDDEN), make_row(3, 3, 700)],
+        complete=False,
+        fetched_at=time.time(),
+    )
+    player = make_player(3)
+
+    ids, _ = await fetch_ids(LeaderboardType.Top, player)
+    assert ids == [1, 3]
+
+    # the hidden scores may continue below the cached scores.
+    ids, personal_best = await fetch_ids(LeaderboardType.Mods, player, Mods.HIDDEN)
+    assert ids == [1, 5]
+    assert personal_best is not None and personal_best["rank"] == 2
+
+    # personal bests below the cached scores are still shown.
+    ids, personal_best = await fetch_ids(LeaderboardType.Friends, make_player(5))
+    assert ids == [5]
+    assert personal_best is not None and personal_best["userid"] == 5
+
+    app.state.cache.leaderboards.clear()
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import hashlib
+import os
+from pathlib import Path
+
+from app.osu_file_index import OsuFileIndex
+
+
+def write_osu_file(directory: Path, beatmap_id: int, data: bytes) -> str:
+    (directory / f"{beatmap_id}.osu").write_bytes(data)
+    return hashlib.md5(data).hexdigest()
+
+
+def test_rehashes_only_changed_files(tmp_path: Path):
+    index = OsuFileIndex(directory=tmp_path, path=tmp_path / "index.json")
+    md5 = write_osu_file(tmp_path, 1, b"osu file format v14")
+
+    assert index.md5(1) == md5
+    assert index.md5(1) == md5
+    assert (index.rehashes, index.hits) == (1, 1)
+
+    new_md5 = write_osu_file(tmp_path, 1, b"osu file format v14, updated")
+    assert index.md5(1) == new_md5
+    assert index.rehashes == 2
+
+    (tmp_path / "1.osu").unlink()
+    assert index.md5(1) is None
+    assert len(index) == 0
+
+
+def test_index_persists_across_restarts(tmp_path: Path):
+    index = OsuFileIndex(directory=tmp_path, path=tmp_path / "index.json")
+    md5s = {id: write_osu_file(tmp_path, id, b"map %d" % id) for id in range(1, 4)}
+    (tmp_path / "not a map.txt").write_bytes(b"")
+
+    assert index.rebuild() == 3
+    index.save()
+
+    # a fresh process
+    index = OsuFileIndex(directory=tmp_path, path=tmp_path / "index.json")
+    index.load()
+
+    assert {id: index.md5(id) for id in md5s} == md5s
+    assert index.rehashes == 0
+
+    # a file changed while the server was down is caught on use.
+    path = tmp_path / "2.osu"
+    path.write_bytes(b"map 9")
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    assert index.md5(2) == hashlib.md5(b"map 9").hexdigest()
+    assert index.rehashes == 1
+
+
+def test_corrupt_index_is_ignored(tmp_path: Path):
+    (tmp_path / "index.json").write_bytes(b"{not json")
+
+    index = OsuFileIndex(directory=tmp_path, path=tmp_path / "index.json")
+    index.load()
+
+    assert len(index) == 0
@@ -3,6 +3,10 @@ from __future__ import annotations
 import pytest
 
 import app.packets
+from app.constants.gamemodes import GameMode
+from app.constants.privileges import Privileges
+from app.objects.player import ModeData
+from app.objects.player import Player
 
 
 @pytest.mark.parametrize(
@@ -667,3 +671,146 @@ def test_write_match_abort():
 )
 def test_write_switch_tournament_server(test_input, expected):
     assert app.packets.switch_tournament_server(test_input) == expected
+
+
+@pytest.mark.parametrize(
+    ("test_input", "expected"),
+    [
+        (
+            ("cmyui", 1001),
+            b"\x05\x00\x00\x0b\x00\x00\x00\x0b\x05cmyui\xe9\x03\x00\x00",
+        ),
+        (
+            ("a" * 200, 0),
+            b"\x05\x00\x00\xcf\x00\x00\x00\x0b\xc8\x01" + b"a" * 200 + b"\x00" * 4,
+        ),
+    ],
+)
+def test_packet_writer_matches_write(test_input, expected):
+    layout = (app.packets.osuTypes.string, app.packets.osuTypes.i32)
+    writer = app.packets.PacketWriter(app.packets.ServerPackets.USER_ID, *layout)
+
+    assert writer(*test_input) == expected
+    assert writer(*test_input) == app.packets.write(
+        app.packets.ServerPackets.USER_ID,
+        *zip(test_input, layout),
+    )
+
+
+def test_packet_writer_rejects_unsupported_types():
+    with pytest.raises(ValueError):
+        app.packets.PacketWriter(
+            app.packets.ServerPackets.FRIENDS_LIST,
+            app.packets.osuTypes.i32_list,
+        )
+
+
+def test_player_packets_cached_until_invalidated():
+    player = Player(
+        id=1000,
+        name="cool guy",
+        priv=Privileges.UNRESTRICTED,
+        pw_bcrypt=None,
+        token=Player.generate_token(),
+    )
+    player.stats[GameMode.VANILLA_OSU] = ModeData(
+        tscore=0,
+        rscore=0,
+        pp=100,
+        acc=95.0,
+        plays=1,
+        playtime=0,
+        max_combo=0,
+        total_hits=0,
+        rank=1,
+        grades={},
+    )
+
+    stats = app.packets.user_stats(player)
+    presence = app.packets.user_presence(player)
+    assert app.packets.user_stats(player) is stats
+    assert app.packets.user_presence(player) is presence
+
+    player.stats[GameMode.VANILLA_OSU].pp = 200
+    assert app.packets.user_stats(player) is stats  # not yet invalidated
+
+    player.invalidate_packets()
+    assert app.packets.user_stats(player) != stats
+    assert app.packets.user_presence(player) == presence
+
+
+def test_bot_packets_rerolled_on_invalidation():
+    bot = Player(
+        id=1,
+        name="bot",
+        priv=Privileges.UNRESTRICTED,
+        pw_bcrypt=None,
+        token=Player.generate_token(),
+        is_bot_client=True,
+    )
+
+    stats = app.packets.bot_stats(bot)
+    assert app.packets.user_stats(bot) is stats
+    assert app.packets.user_presence(bot) is app.packets.bot_presence(bot)
+
+    bot.invalidate_packets()
+    assert app.packets.bot_stats(bot) is not stats
+
+
+class _RawPacket(app.packets.BasePacket):
+    def __init__(self, reader: app.packets.BanchoPacketReader) -> None:
+        self.data = reader.read_raw().tobytes()
+
+    async def handle(self, player: Player) -> None: ...
+
+
+class _StringPacket(app.packets.BasePacket):
+    def __init__(self, reader: app.packets.BanchoPacketReader) -> None:
+        self.value = reader.read_string()
+        self.number = reader.read_i32()
+
+    async def handle(self, player: Player) -> None: ...
+
+
+def test_packet_reader_skips_unhandled_and_unknown_ids():
+    packet_table = app.packets.make_packet_table(
+        {
+            app.packets.ClientPackets.PING: _RawPacket,
+            app.packets.ClientPackets.CHANNEL_JOIN: _StringPacket,
+        },
+    )
+    body = b"".join(
+        (
+            app.packets.PACKET_HEADER_FMT.pack(0xFFFF, 3) + b"abc",  # unknown id
+            app.packets.PACKET_HEADER_FMT.pack(4, 0),  # ping
+            app.packets.PACKET_HEADER_FMT.pack(2, 0),  # unhandled logout
+            app.packets.PACKET_HEADER_FMT.pack(63, 10)
+            + app.packets.write_string("#osu")
+            + (-1).to_bytes(4, "little", signed=True),
+            app.packets.PACKET_HEADER_FMT.pack(4, 2) + b"hi",
+            app.packets.PACKET_HEADER_FMT.pack(4, 50) + b"truncated",
+        ),
+    )
+
+    with memoryview(body) as body_view:
+        packets = list(app.packets.BanchoPacketReader(body_view, packet_table))
+
+    assert [type(p) for p in packets] == [_RawPacket, _StringPacket, _RawPacket]
+    assert packets[0].data == b""
+    assert packets[1].value == "#osu"
+    assert packets[1].number == -1
+    assert packets[2].data == b"hi"
+
+
+def test_packet_reader_resumes_after_partial_reads():
+    packet_table = app.packets.make_packet_table(
+        {app.packets.ClientPackets.CHANNEL_JOIN: _StringPacket},
+    )
+    # trailing bytes the handler doesn't read must not be parsed as a header
+    packet = app.packets.write_string("#osu") + b"\x00" * 4 + b"\xff" * 8
+    body = (app.packets.PACKET_HEADER_FMT.pack(63, len(packet)) + packet) * 2
+
+    with memoryview(body) as body_view:
+        packets = list(app.packets.BanchoPacketReader(body_view, packet_table))
+
+    assert [p.value for p in packets] == ["#osu", "#osu"]
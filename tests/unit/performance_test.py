@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import shutil
+from pathlib import Path
+
+import pytest
+
+import app.usecases.performance
+from app.constants.mods import Mods
+from app.usecases.performance import BeatmapCache
+from app.usecases.performance import ScoreParams
+
+SAMPLE_OSU_FILE = Path("testing/sample_data/vivid_osu_file.osu")
+
+
+@pytest.fixture
+def beatmap_cache(monkeypatch: pytest.MonkeyPatch) -> BeatmapCache:
+    beatmap_cache = BeatmapCache(max_size=1024**2)
+    monkeypatch.setattr(app.usecases.performance, "beatmap_cache", beatmap_cache)
+    return beatmap_cache
+
+
+def test_cached_calculations_match_uncached(beatmap_cache: BeatmapCache):
+    def make_scores() -> list[ScoreParams]:
+        return [
+            ScoreParams(mode=0, acc=98.0),
+            ScoreParams(mode=0, mods=Mods.HIDDEN | Mods.NIGHTCORE, nmiss=2, acc=95.0),
+            ScoreParams(mode=0, mods=Mods.RELAX, combo=100, acc=99.0),
+        ]
+
+    uncached = app.usecases.performance.calculate_performances(
+        str(SAMPLE_OSU_FILE),
+        make_scores(),
+    )
+
+    for _ in range(2):
+        cached = app.usecases.performance.calculate_performances(
+            str(SAMPLE_OSU_FILE),
+            make_scores(),
+            osu_file_md5="a" * 32,
+        )
+        assert cached == uncached
+
+    assert len(beatmap_cache) == 1
+    assert beatmap_cache.hits > 0
+
+
+def test_beatmap_cache_evicts_least_recently_used(tmp_path: Path):
+    # each beatmap is parsed with rosu & akatsuki, and has one difficulty.
+    osu_file_size = SAMPLE_OSU_FILE.stat().st_size
+    entry_size = (
+        2 * osu_file_size * app.usecases.performance.PARSED_BEATMAP_SIZE_FACTOR
+        + app.usecases.performance.DIFFICULTY_ATTRIBUTES_SIZE
+    )
+    beatmap_cache = BeatmapCache(max_size=entry_size * 3)
+
+    def load(md5: str) -> None:
+        osu_file_path = tmp_path / f"{md5}.osu"
+        if not osu_file_path.exists():
+            shutil.copy(SAMPLE_OSU_FILE, osu_file_path)
+
+        beatmap_cache.rosu_difficulty(md5, str(osu_file_path), 0)
+        beatmap_cache.akatsuki_beatmap(md5, str(osu_file_path))
+
+    for md5 in ("a", "b", "c"):
+        load(md5)
+
+    load("a")  # make "b" the least recently used
+    load("d")
+
+    assert beatmap_cache.evictions == 1
+    assert beatmap_cache.size == entry_size * 3
+    assert "b" not in beatmap_cache._entries
+    assert {"a", "c", "d"} <= beatmap_cache._entries.keys()
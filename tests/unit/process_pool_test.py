@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import signal
+import time
+
+import pytest
+
+from app.process_pool import ProcessPool
+
+
+async def test_timed_out_calls_only_kill_their_worker():
+    pool = ProcessPool(2)
+    await pool.start()
+
+    try:
+        processes = [
+            process
+            for worker in pool._workers
+            for process in worker._processes.values()
+        ]
+
+        timed_out = asyncio.create_task(pool.run(time.sleep, 60, timeout=0.5))
+        await asyncio.sleep(0.01)
+        running = asyncio.create_task(pool.run(time.sleep, 1, timeout=5))
+        await asyncio.sleep(0.01)
+
+        # waits for a worker for longer than its timeout, but isn't charged for it.
+        queued = asyncio.create_task(pool.run(os.getpid, timeout=0.3))
+
+        with pytest.raises(TimeoutError):
+            await timed_out
+
+        # the call running alongside the timed out one is unaffected.
+        assert await running is None
+        assert isinstance(await queued, int)
+
+        assert pool.timeouts == 1
+        assert pool.replaced == 1
+        assert len(pool._workers) == 2
+
+        killed = [process for process in processes if process.exitcode is not None]
+        assert [process.exitcode for process in killed] == [-signal.SIGKILL]
+    finally:
+        await pool.shutdown()
+
+
+async def test_cancelled_calls_hand_their_worker_on_once_done():
+    pool = ProcessPool(1)
+    await pool.start()
+
+    try:
+        cancelled = asyncio.create_task(pool.run(time.sleep, 0.2, timeout=5))
+        await asyncio.sleep(0.05)
+        cancelled.cancel()
+
+        assert await pool.run(os.getpid, timeout=5) > 0
+        assert pool.replaced == 0
+    finally:
+        await pool.shutdown()
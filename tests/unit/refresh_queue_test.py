@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import datetime
+from datetime import timedelta
+
+import pytest
+
+import app.state
+from app.beatmap_cache import BeatmapCache
+from app.objects.beatmap import Beatmap
+from app.objects.beatmap import BeatmapSet
+from app.refresh_queue import Refresh
+from app.refresh_queue import RefreshQueue
+from app.single_flight import SingleFlight
+
+
+async def test_refreshes_most_requested_first():
+    queue = RefreshQueue("test", concurrency=1, rate_limit=1000)
+    refreshed: list[str] = []
+
+    def refresh_of(key: str) -> Refresh:
+        async def refresh() -> None:
+            refreshed.append(key)
+
+        return refresh
+
+    for key, requests in (("cold", 1), ("hot", 5), ("warm", 3)):
+        for _ in range(requests):
+            queue.request(key, refresh_of(key))
+
+    assert len(queue) == 3
+
+    queue.start()
+    while queue.completed < 3:
+        await asyncio.sleep(0.001)
+    await queue.stop()
+
+    assert refreshed == ["hot", "warm", "cold"]
+
+
+async def test_rate_limits_refreshes():
+    queue = RefreshQueue("test", concurrency=4, rate_limit=100)
+    started: list[float] = []
+
+    async def refresh() -> None:
+        started.append(time.monotonic())
+
+    for key in range(10):
+        queue.request(key, refresh)
+
+    queue.start()
+    while queue.completed < 10:
+        await asyncio.sleep(0.001)
+    await queue.stop()
+
+    # 10 refreshes at 100/s are spread over (at least) 90ms.
+    assert started[-1] - started[0] >= 0.09 - 0.005
+
+
+async def test_expired_sets_are_served_stale(monkeypatch: pytest.MonkeyPatch):
+    queue = RefreshQueue("test", concurrency=1, rate_limit=1000)
+    monkeypatch.setattr(app.state.sessions, "beatmap_refreshes", queue)
+    monkeypatch.setattr(app.state.sessions, "beatmap_fetches", SingleFlight())
+    monkeypatch.setattr(app.state.cache, "beatmaps", BeatmapCache())
+
+    beatmap_set = BeatmapSet(id=1, last_osuapi_check=datetime.now() - timedelta(days=2))
+    beatmap_set.maps = [
+        Beatmap(beatmap_set, md5="a" * 32, id=1, set_id=1, last_update=datetime.now()),
+    ]
+    app.state.cache.beatmaps.add_set(beatmap_set)
+
+    updated = asyncio.Event()
+
+    async def update_if_available() -> None:
+        beatmap_set.last_osuapi_check = datetime.now()
+        updated.set()
+
+    monkeypatch.setattr(beatmap_set, "_update_if_available", update_if_available)
+
+    queue.start()
+    bmaps = [await Beatmap.from_md5("a" * 32) for _ in range(3)]
+
+    # served without waiting on the osu!api, & queued for an update once.
+    assert bmaps == [beatmap_set.maps[0]] * 3
+    assert not updated.is_set()
+    assert 1 in queue
+
+    await asyncio.wait_for(updated.wait(), timeout=1)
+    await queue.stop()
+
+    assert not beatmap_set._cache_expired()
+    assert queue.completed == 1
+
+
+async def test_expired_sets_are_updated_inline_without_workers(
+    monkeypatch: pytest.MonkeyPatch,
+):
+    # as in tools & scripts, which don't start the refresh workers.
+    queue = RefreshQueue("test", concurrency=1, rate_limit=1000)
+    monkeypatch.setattr(app.state.sessions, "beatmap_refreshes", queue)
+    monkeypatch.setattr(app.state.sessions, "beatmap_fetches", SingleFlight())
+    monkeypatch.setattr(app.state.cache, "beatmaps", BeatmapCache())
+
+    beatmap_set = BeatmapSet(id=1, last_osuapi_check=datetime.now() - timedelta(days=2))
+    beatmap_set.maps = [
+        Beatmap(beatmap_set, md5="a" * 32, id=1, set_id=1, last_update=datetime.now()),
+    ]
+    app.state.cache.beatmaps.add_set(beatmap_set)
+
+    async def update_if_available() -> None:
+        beatmap_set.last_osuapi_check = datetime.now()
+
+    monkeypatch.setattr(beatmap_set, "_update_if_available", update_if_available)
+
+    assert await Beatmap.from_md5("a" * 32) is beatmap_set.maps[0]
+    assert not beatmap_set._cache_expired()
+    assert len(queue) == 0
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from typing import Any
+
+import pytest
+
+import app.settings
+import app.state
+from app.bloom_filter import BloomFilter
+from app.usecases import score_checksums as score_checksums_usecases
+
+
+class ScoresTable:
+    """The online checksums of the scores in sql."""
+
+    def __init__(self) -> None:
+        self.checksums: set[str] = set()
+        self.queries = 0
+
+    async def fetch_one(self, query: str, values: dict[str, Any]) -> Any:
+        self.queries += 1
+        return {"1": 1} if values["checksum"] in self.checksums else None
+
+
+@pytest.fixture
+def scores(monkeypatch: pytest.MonkeyPatch) -> ScoresTable:
+    scores = ScoresTable()
+    checksums = BloomFilter(1000)
+    checksums.populated = True
+
+    monkeypatch.setattr(app.state.services, "database", scores)
+    monkeypatch.setattr(app.state.cache, "score_checksums", checksums)
+    return scores
+
+
+def submit_score(scores: ScoresTable, checksum: str) -> None:
+    # as done by score submission in this process.
+    scores.checksums.add(checksum)
+    score_checksums_usecases.add(checksum)
+
+
+async def test_filter_miss_skips_sql(scores: ScoresTable):
+    submit_score(scores, "a" * 32)
+
+    assert await score_checksums_usecases.is_duplicate("a" * 32)
+    assert not await score_checksums_usecases.is_duplicate("b" * 32)
+    assert scores.queries == 1
+
+
+async def test_scores_submitted_by_other_processes_are_duplicates(
+    scores: ScoresTable,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    monkeypatch.setattr(app.settings, "REDIS_SUBMISSION_LOCKS", True)
+
+    # submitted through another process; this process's filter never sees it.
+    scores.checksums.add("c" * 32)
+
+    assert await score_checksums_usecases.is_duplicate("c" * 32)
+    assert not await score_checksums_usecases.is_duplicate("d" * 32)
+    assert scores.queries == 2
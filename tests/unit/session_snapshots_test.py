@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+from typing import Any
+
+import orjson
+import pytest
+
+import app.state
+from app.constants.gamemodes import GameMode
+from app.constants.mods import Mods
+from app.constants.privileges import Privileges
+from app.objects.channel import Channel
+from app.objects.collections import Channels
+from app.objects.collections import Matches
+from app.objects.collections import Players
+from app.objects.match import Match
+from app.objects.match import MatchTeamTypes
+from app.objects.match import MatchWinConditions
+from app.objects.match import SlotStatus
+from app.objects.player import ModeData
+from app.objects.player import Player
+from app.usecases import session_snapshots
+
+
+@pytest.fixture(autouse=True)
+def empty_sessions(monkeypatch: pytest.MonkeyPatch) -> None:
+    channels = Channels()
+    channels.append(Channel(name="#osu", topic="General discussion."))
+    channels.append(Channel(name="#lobby", topic="Multiplayer lobby."))
+
+    monkeypatch.setattr(app.state.sessions, "players", Players())
+    monkeypatch.setattr(app.state.sessions, "channels", channels)
+    monkeypatch.setattr(app.state.sessions, "matches", Matches())
+
+
+def make_user(id: int, priv: Privileges = Privileges.UNRESTRICTED) -> dict[str, Any]:
+    return {
+        "id": id,
+        "name": f"player {id}",
+        "priv": priv.value,
+        "pw_bcrypt": "$2b$12$bcrypt",
+        "clan_id": 0,
+        "clan_priv": 0,
+        "silence_end": 0,
+        "donor_end": 0,
+        "api_key": None,
+    }
+
+
+def make_player(id: int) -> Player:
+    player = Player(
+        id=id,
+        name=f"player {id}",
+        priv=Privileges.UNRESTRICTED,
+        pw_bcrypt=b"$2b$12$bcrypt",
+        token=Player.generate_token(),
+    )
+    player.stats[GameMode.VANILLA_OSU] = ModeData(
+        tscore=1000,
+        rscore=500,
+        pp=id * 100,
+        acc=98.5,
+        plays=10,
+        playtime=3600,
+        max_combo=727,
+        total_hits=5000,
+        rank=id,
+        grades={},
+    )
+    player.friends.add(1)
+    app.state.sessions.players.append(player)
+    return player
+
+
+def make_match(host: Player) -> Match:
+    chat = Channel(
+        name="#multi_0",
+        topic="MID 0's multiplayer channel.",
+        auto_join=False,
+        instance=True,
+    )
+    match = Match(
+        id=0,
+        name="test match",
+        password="",
+        has_public_history=True,
+        map_name="map",
+        map_id=1,
+        map_md5="a" * 32,
+        host_id=host.id,
+        mode=GameMode.VANILLA_OSU,
+        mods=Mods.HIDDEN,
+        win_condition=MatchWinConditions.score,
+        team_type=MatchTeamTypes.head_to_head,
+        freemods=False,
+        seed=1234,
+        chat_channel=chat,
+    )
+    app.state.sessions.matches[0] = match
+    app.state.sessions.channels.append(chat)
+    return match
+
+
+def round_trip(users: dict[int, Any]) -> list[Player]:
+    data = orjson.dumps(session_snapshots.create_snapshot())
+
+    app.state.sessions.players = Players()
+    app.state.sessions.channels = Channels(
+        [c for c in app.state.sessions.channels if not c.instance],
+    )
+    for channel in app.state.sessions.channels:
+        channel.players.clear()
+    app.state.sessions.matches = Matches()
+
+    return session_snapshots.restore_snapshot(orjson.loads(data), users)
+
+
+def test_restore_sessions_round_trip():
+    host, spectator, multi_player = make_player(2), make_player(3), make_player(4)
+
+    osu = app.state.sessions.channels.get_by_name("#osu")
+    assert osu is not None
+    for player in (host, spectator, multi_player):
+        player.join_channel(osu)
+
+    host.add_spectator(spectator)
+
+    match = make_match(multi_player)
+    multi_player.join_match(match, "")
+    match.slots[0].status = SlotStatus.ready
+
+    multi_player.dequeue()
+    multi_player.enqueue(b"unsent packet")
+
+    restored = round_trip({id: make_user(id) for id in (2, 3, 4)})
+    assert len(restored) == 3
+
+    players = app.state.sessions.players
+    players.check_invariants()
+
+    new_host = players.get(token=host.token)
+    new_spectator = players.get(token=spectator.token)
+    new_multi_player = players.get(token=multi_player.token)
+    assert new_host and new_spectator and new_multi_player
+
+    assert new_spectator.spectating is new_host
+    assert new_host.spectators == [new_spectator]
+    assert [c.real_name for c in new_spectator.channels] == ["#osu", "#spec_2"]
+    assert [c.real_name for c in new_host.channels] == ["#osu", "#spec_2"]
+
+    new_match = app.state.sessions.matches[0]
+    assert new_match is not None
+    assert new_multi_player.match is new_match
+    assert new_match.slots[0].player is new_multi_player
+    assert new_match.slots[0].status == SlotStatus.ready
+    assert new_match.mods == Mods.HIDDEN
+    assert new_match.chat in new_multi_player.channels
+    assert new_match.chat in app.state.sessions.channels
+
+    assert new_host.stats[GameMode.VANILLA_OSU].pp == 200
+    assert new_host.friends == {1}
+    assert new_multi_player.dequeue() == b"unsent packet"
+
+
+def test_restore_drops_changed_sessions():
+    host, spectator = make_player(2), make_player(3)
+    host.add_spectator(spectator)
+
+    # the host was restricted while the server was down.
+    restored = round_trip(
+        {
+            2: make_user(2, priv=Privileges(0)),
+            3: make_user(3),
+        },
+    )
+
+    assert [p.token for p in restored] == [spectator.token]
+
+    new_spectator = app.state.sessions.players.get(token=spectator.token)
+    assert new_spectator is not None
+    assert new_spectator.spectating is None
+    assert not new_spectator.channels
+    assert app.state.sessions.players.get(token=host.token) is None
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime
+from typing import Any
+
+import pytest
+
+import app.state
+from app.beatmap_cache import BeatmapCache
+from app.expiring_set import ExpiringSet
+from app.objects import beatmap as beatmap_module
+from app.objects.beatmap import Beatmap
+from app.objects.beatmap import BeatmapSet
+from app.single_flight import SingleFlight
+
+CONCURRENT_REQUESTS = 1000
+MD5 = "a" * 32
+SET_ID = 727
+
+
+async def test_single_flight_coalesces_concurrent_calls():
+    fetches = SingleFlight()
+    calls = 0
+
+    async def fetch() -> int:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    results = await asyncio.gather(*[fetches("key", fetch) for _ in range(10)])
+
+    assert results == [1] * 10
+    assert fetches.coalesced == 9
+    assert len(fetches) == 0
+
+    # once complete, the next caller starts a new call.
+    assert await fetches("key", fetch) == 2
+
+
+async def test_single_flight_shares_exceptions_and_survives_cancellation():
+    fetches = SingleFlight()
+
+    async def fetch() -> None:
+        await asyncio.sleep(0.01)
+        raise ConnectionError("osu!api is down")
+
+    first = asyncio.create_task(fetches("key", fetch))
+    second = asyncio.create_task(fetches("key", fetch))
+    await asyncio.sleep(0)
+
+    first.cancel()
+    with pytest.raises(ConnectionError):
+        await second
+
+    assert first.cancelled()
+
+
+@pytest.fixture
+def osu_api(monkeypatch: pytest.MonkeyPatch) -> dict[str, int]:
+    """An empty beatmap cache & database, in front of a slow osu!api."""
+    calls = {"maps": 0, "beatmaps": 0, "beatmapsets": 0}
+
+    async def fetch_one(**kwargs: Any) -> None:
+        calls["maps"] += 1
+        await asyncio.sleep(0.001)
+        return None
+
+    async def api_get_beatmaps(**params: Any) -> dict[str, Any]:
+        calls["beatmaps"] += 1
+        await asyncio.sleep(0.01)
+        if params.get("h") != MD5:
+            return {"data": None, "status_code": 200}
+        return {"data": [{"beatmapset_id": str(SET_ID)}], "status_code": 200}
+
+    async def from_bsid_sql(bsid: int) -> None:
+        return None
+
+    async def from_bsid_osuapi(bsid: int) -> BeatmapSet:
+        calls["beatmapsets"] += 1
+        await asyncio.sleep(0.01)
+        beatmap_set = BeatmapSet(id=bsid, last_osuapi_check=datetime.now())
+        beatmap_set.maps = [
+            Beatmap(
+                beatmap_set,
+                md5=MD5,
+                id=1,
+                set_id=bsid,
+                last_update=datetime.now(),
+            ),
+        ]
+        return beatmap_set
+
+    monkeypatch.setattr(beatmap_module.maps_repo, "fetch_one", fetch_one)
+    monkeypatch.setattr(beatmap_module, "api_get_beatmaps", api_get_beatmaps)
+    monkeypatch.setattr(BeatmapSet, "_from_bsid_sql", from_bsid_sql)
+    monkeypatch.setattr(BeatmapSet, "_from_bsid_osuapi", from_bsid_osuapi)
+
+    monkeypatch.setattr(app.state.cache, "beatmaps", BeatmapCache())
+    monkeypatch.setattr(app.state.cache, "unsubmitted", ExpiringSet(ttl=60))
+    monkeypatch.setattr(app.state.sessions, "beatmap_fetches", SingleFlight())
+
+    return calls
+
+
+async def test_concurrent_requests_for_an_uncached_map(osu_api: dict[str, int]):
+    bmaps = await asyncio.gather(
+        *[Beatmap.from_md5(MD5) for _ in range(CONCURRENT_REQUESTS)],
+    )
+
+    assert all(bmap is not None and bmap.md5 == MD5 for bmap in bmaps)
+    assert len({id(bmap) for bmap in bmaps}) == 1
+    assert osu_api == {"maps": 1, "beatmaps": 1, "beatmapsets": 1}
+    assert app.state.sessions.beatmap_fetches.coalesced == CONCURRENT_REQUESTS - 1
+
+
+async def test_concurrent_requests_for_an_unsubmitted_map(osu_api: dict[str, int]):
+    unsubmitted_md5 = "b" * 32
+
+    bmaps = await asyncio.gather(
+        *[Beatmap.from_md5(unsubmitted_md5) for _ in range(CONCURRENT_REQUESTS)],
+    )
+
+    assert bmaps == [None] * CONCURRENT_REQUESTS
+    assert osu_api == {"maps": 1, "beatmaps": 1, "beatmapsets": 0}
+
+    # the negative result is remembered.
+    assert await Beatmap.from_md5(unsubmitted_md5) is None
+    assert osu_api["beatmaps"] == 1
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from app.constants.privileges import Privileges
+from app.objects.player import Player
+from app.objects.spectator import MAX_BUFFERED_FRAMES
+from app.objects.spectator import SpectatorRelay
+
+
+def make_player(id: int) -> Player:
+    return Player(
+        id=id,
+        name=f"player {id}",
+        priv=Privileges.UNRESTRICTED,
+        pw_bcrypt=None,
+        token=Player.generate_token(),
+    )
+
+
+def test_relay_coalesces_frames_between_polls():
+    relay = SpectatorRelay()
+    first, second = make_player(1), make_player(2)
+    relay.push(b"before anyone was watching")
+
+    relay.add(first)
+    relay.add(second)
+    assert relay.collect(first) is None
+
+    relay.push(b"frame 1")
+    assert relay.collect(first) == b"frame 1"
+
+    relay.push(b"frame 2")
+    relay.push(b"frame 3")
+
+    first_data = relay.collect(first)
+    second_data = relay.collect(second)
+    assert first_data == b"frame 2frame 3"
+    assert second_data == b"frame 1frame 2frame 3"
+
+    relay.push(b"frame 4")
+    relay.push(b"frame 5")
+    # spectators polling from the same position share a single buffer
+    assert relay.collect(first) is relay.collect(second)
+
+    assert relay.frames_relayed == 6
+    assert relay.bytes_relayed == sum(
+        len(f)
+        for f in (b"before anyone was watching", *(b"frame %d" % i for i in range(5)))
+    )
+
+
+def test_relay_bounds_slow_spectators():
+    relay = SpectatorRelay()
+    fast, slow = make_player(1), make_player(2)
+    relay.add(fast)
+    relay.add(slow)
+
+    for i in range(MAX_BUFFERED_FRAMES * 4):
+        relay.push(i.to_bytes(4, "little"))
+        relay.collect(fast)
+        assert len(relay.frames) <= MAX_BUFFERED_FRAMES
+
+    data = relay.collect(slow)
+    assert data is not None
+    assert len(data) <= MAX_BUFFERED_FRAMES * 4
+    assert data.endswith((MAX_BUFFERED_FRAMES * 4 - 1).to_bytes(4, "little"))
+
+    relay.remove(fast)
+    relay.remove(slow)
+    assert not relay.frames
+
+
+def test_spectators_collect_frames_on_dequeue():
+    host, spectator = make_player(1), make_player(2)
+    spectator.spectating = host
+    host.spectator_relay.add(spectator)
+
+    spectator.enqueue(b"notification")
+    host.spectator_relay.push(b"frame 1")
+    host.spectator_relay.push(b"frame 2")
+
+    assert spectator.dequeue() == b"notificationframe 1frame 2"
+    assert spectator.dequeue() is None
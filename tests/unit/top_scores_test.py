@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import random
+
+import pytest
+
+import app.state
+from app.constants.gamemodes import GameMode
+from app.constants.privileges import Privileges
+from app.objects.collections import Players
+from app.objects.player import ModeData
+from app.objects.player import Player
+from app.usecases import top_scores as top_scores_usecases
+from app.usecases.top_scores import TOP_SCORES_CACHE_TTL
+from app.usecases.top_scores import TOP_SCORES_LIMIT
+from app.usecases.top_scores import TopScores
+
+
+def sql_totals(best: dict[str, tuple[float, float]]) -> tuple[int, float]:
+    """The original full recalculation, over all best scores by pp."""
+    rows = sorted(best.values(), reverse=True)
+    weighted_acc = sum(acc * 0.95**i for i, (_, acc) in enumerate(rows))
+    bonus_acc = 100.0 / (20 * (1 - 0.95 ** len(rows)))
+    weighted_pp = sum(pp * 0.95**i for i, (pp, _) in enumerate(rows))
+    bonus_pp = 416.6667 * (1 - 0.9994 ** len(rows))
+    return round(weighted_pp + bonus_pp), (weighted_acc * bonus_acc) / 100
+
+
+def test_top_scores_match_full_recalculation():
+    rng = random.Random(1337)
+    top_scores = TopScores()
+    best: dict[str, tuple[float, float]] = {}
+
+    for i in range(3_000):
+        # mostly new maps, sometimes replacing an existing best
+        if best and rng.random() < 0.3:
+            map_md5 = rng.choice(list(best))
+        else:
+            map_md5 = f"{rng.getrandbits(128):032x}"
+
+        pp = round(rng.uniform(0, 800), 3)
+        acc = round(rng.uniform(80, 100), 3)
+
+        best[map_md5] = (pp, acc)
+        top_scores.add(map_md5, pp, acc)
+
+        if i % 20 != 0:
+            continue
+
+        totals = top_scores.totals()
+        expected_pp, expected_acc = sql_totals(best)
+        assert len(top_scores) == len(best)
+        assert abs(totals["pp"] - expected_pp) <= 1
+        assert abs(totals["acc"] - expected_acc) < 1e-6
+
+    assert len(top_scores.pps) == TOP_SCORES_LIMIT
+
+
+def test_top_scores_replaces_tied_entries():
+    top_scores = TopScores()
+    top_scores.add("a" * 32, 100.0, 99.0)
+    top_scores.add("b" * 32, 100.0, 98.0)
+    top_scores.add("c" * 32, 100.0, 97.0)
+
+    top_scores.add("b" * 32, 200.0, 96.0)
+
+    assert top_scores.pps == [200.0, 100.0, 100.0]
+    assert top_scores.accs == [96.0, 99.0, 97.0]
+    assert len(top_scores) == 3
+
+
+def make_player(id: int, map_md5: str) -> Player:
+    player = Player(
+        id=id,
+        name=f"player {id}",
+        priv=Privileges.UNRESTRICTED,
+        pw_bcrypt=b"$2b$12$bcrypt",
+        token=Player.generate_token(),
+    )
+    player.stats[GameMode.VANILLA_OSU] = ModeData(
+        tscore=0,
+        rscore=0,
+        pp=0,
+        acc=0.0,
+        plays=0,
+        playtime=0,
+        max_combo=0,
+        total_hits=0,
+        rank=0,
+        grades={},
+        top_scores=TopScores(),
+    )
+    top_scores = player.stats[GameMode.VANILLA_OSU].top_scores
+    assert top_scores is not None
+    top_scores.add(map_md5, 100.0, 99.0)
+    app.state.sessions.players.append(player)
+    return player
+
+
+def test_invalidation_drops_cached_top_scores(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(app.state.sessions, "players", Players())
+    wiped, untouched = make_player(1, "a" * 32), make_player(2, "b" * 32)
+
+    # only players with scores on the maps lose their cache.
+    top_scores_usecases.invalidate_maps({"a" * 32})
+    assert wiped.stats[GameMode.VANILLA_OSU].top_scores is None
+    assert untouched.stats[GameMode.VANILLA_OSU].top_scores is not None
+
+    # e.g. on a ranked status change, anyone's totals may be affected.
+    top_scores_usecases.invalidate_all()
+    assert untouched.stats[GameMode.VANILLA_OSU].top_scores is None
+
+
+def test_top_scores_expire():
+    top_scores = TopScores()
+    assert not top_scores.expired()
+
+    top_scores.fetched_at -= TOP_SCORES_CACHE_TTL + 1
+    assert top_scores.expired()
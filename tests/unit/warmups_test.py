@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+import app.state
+from app.api.init_api import start_warmup
+
+
+async def test_failed_warmups_are_reported(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(app.state, "pending_warmups", set())
+    monkeypatch.setattr(app.state, "failed_warmups", set())
+    monkeypatch.setattr(app.state.sessions, "housekeeping_tasks", set())
+
+    async def load() -> None:
+        await asyncio.sleep(0)
+
+    async def fail() -> None:
+        raise ConnectionError("redis went away")
+
+    start_warmup("Loading", load())
+    start_warmup("Failing", fail())
+    assert app.state.pending_warmups == {"Loading", "Failing"}
+
+    await asyncio.gather(*app.state.sessions.housekeeping_tasks)
+
+    assert app.state.pending_warmups == set()
+    assert app.state.failed_warmups == {"Failing"}
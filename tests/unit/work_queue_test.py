@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import asyncio
+
+from app.work_queue import WorkQueue
+
+
+async def test_work_queue_bounds_concurrency():
+    queue = WorkQueue("test", concurrency=3)
+    running = 0
+    max_running = 0
+
+    async def job() -> None:
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.001)
+        running -= 1
+
+    for i in range(50):
+        queue.submit(f"job {i}", job)
+
+    assert queue.depth == 50
+
+    queue.start()
+    await queue.stop()
+
+    assert max_running == 3
+    assert queue.completed == 50
+    assert queue.depth == 0
+
+
+async def test_work_queue_retries_failed_jobs():
+    queue = WorkQueue("test", concurrency=1, max_retries=2, retry_delay=0)
+    attempts = {"flaky": 0, "broken": 0}
+
+    async def job(name: str, failures: int) -> None:
+        attempts[name] += 1
+        if attempts[name] <= failures:
+            raise ConnectionError(name)
+
+    queue.submit("flaky job", job, "flaky", 2)
+    queue.submit("broken job", job, "broken", 5)
+
+    queue.start()
+    await queue.stop()
+
+    assert attempts == {"flaky": 3, "broken": 3}
+    assert queue.completed == 1
+    assert queue.failed == 1
+    assert queue.retried == 4
+
+
+async def test_work_queue_runs_non_idempotent_jobs_once():
+    queue = WorkQueue("test", concurrency=1, retry_delay=0)
+    attempts = 0
+
+    async def job() -> None:
+        nonlocal attempts
+        attempts += 1
+        raise ConnectionError("lost connection after the update")
+
+    queue.submit("increment counter", job, retry=False)
+
+    queue.start()
+    await queue.stop()
+
+    assert attempts == 1
+    assert queue.failed == 1
+    assert queue.retried == 0
+
+
+async def test_work_queue_drops_jobs_when_full():
+    queue = WorkQueue("test", concurrency=1, max_size=2)
+    ran: list[int] = []
+
+    async def job(i: int) -> None:
+        ran.append(i)
+
+    for i in range(5):
+        queue.submit(f"job {i}", job, i)
+
+    assert queue.depth == 2
+    assert queue.dropped == 3
+
+    queue.start()
+    await queue.stop()
+
+    assert ran == [0, 1]
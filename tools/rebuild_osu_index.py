@@ -0,0 +1,56 @@
+#!/usr/bin/env python3.11
+"""Rebuild the .osu file index from the files in .data/osu.
+
+Run with the server stopped; a running server saves its own
+index over the rebuilt one.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from collections.abc import Sequence
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from app.osu_file_index import OsuFileIndex
+except ModuleNotFoundError:
+    print("\x1b[;91mMust run from tools/ directory\x1b[m")
+    raise
+
+BEATMAPS_PATH = Path.cwd() / ".data/osu"
+DEFAULT_INDEX_PATH = Path.cwd() / ".data/osu_index.json"
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--directory",
+        type=Path,
+        default=BEATMAPS_PATH,
+        help="The directory of .osu files to index",
+    )
+    parser.add_argument(
+        "--index",
+        type=Path,
+        default=DEFAULT_INDEX_PATH,
+        help="Where to save the index",
+    )
+    args = parser.parse_args(argv)
+
+    index = OsuFileIndex(directory=args.directory, path=args.index)
+
+    st = time.perf_counter()
+    count = index.rebuild()
+    index.save()
+
+    print(f"Indexed {count:,} .osu files in {time.perf_counter() - st:.2f}s.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -3,14 +3,19 @@ from __future__ import annotations
 
 import argparse
 import asyncio
+import json
 import math
+import multiprocessing
 import os
 import sys
-from collections.abc import Awaitable
+import time
+from collections import defaultdict
 from collections.abc import Iterator
 from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from dataclasses import field
+from datetime import timedelta
 from pathlib import Path
 from typing import Any
 from typing import TypeVar
@@ -18,8 +23,10 @@ from typing import TypeVar
 import databases
 from redis import asyncio as aioredis
 
-sys.path.insert(0, os.path.abspath(os.pardir))
-os.chdir(os.path.abspath(os.pardir))
+# relative to this file rather than the working directory, since
+# the recalculation worker processes will re-run this on startup.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 try:
     import app.settings
@@ -29,6 +36,9 @@ try:
     from app.constants.mods import Mods
     from app.constants.privileges import Privileges
     from app.objects.beatmap import ensure_osu_file_is_available
+    from app.usecases.top_scores import TOP_SCORES_LIMIT
+    from app.usecases.top_scores import Totals
+    from app.usecases.top_scores import calculate_totals
 except ModuleNotFoundError:
     print("\x1b[;91mMust run from tools/ directory\x1b[m")
     raise
@@ -38,12 +48,19 @@ T = TypeVar("T")
 
 debug_mode_enabled = False
 BEATMAPS_PATH = Path.cwd() / ".data/osu"
+DEFAULT_CHECKPOINT_PATH = Path.cwd() / ".data/recalc_checkpoint.json"
+
+BEATMAP_BATCH_SIZE = 100
+USER_BATCH_SIZE = 1000
+UPDATE_BATCH_SIZE = 1000
+PROGRESS_INTERVAL = 5.0  # seconds
 
 
 @dataclass
 class Context:
     database: databases.Database
     redis: aioredis.Redis
+    executor: ProcessPoolExecutor
 
 
 def divide_chunks(values: list[T], n: int) -> Iterator[list[T]]:
@@ -51,163 +68,361 @@ def divide_chunks(values: list[T], n: int) -> Iterator[list[T]]:
         yield values[i : i + n]
 
 
-async def recalculate_score(
-    score: dict[str, Any],
-    beatmap_path: Path,
-    ctx: Context,
-) -> None:
-    # Use performance.py for consistent calculation logic
-    score_params = app.usecases.performance.ScoreParams(
-        mode=GameMode(score["mode"]).as_vanilla,
-        mods=score["mods"],
-        combo=score["max_combo"],
-        n300=score["n300"],
-        n100=score["n100"],
-        n50=score["n50"],
-        ngeki=score["ngeki"],
-        nkatu=score["nkatu"],
-        nmiss=score["nmiss"],
-    )
+@dataclass
+class Checkpoint:
+    """The progress of a recalculation, saved so it may be resumed."""
 
-    results = app.usecases.performance.calculate_performances(
-        str(beatmap_path),
-        [score_params],
-    )
+    path: Path
+    # {mode: id of the last beatmap whose scores were recalculated}
+    scores: dict[str, int] = field(default_factory=dict)
 
-    if not results:
-        return
+    @classmethod
+    def load(cls, path: Path) -> Checkpoint:
+        if not path.exists():
+            return cls(path)
 
-    new_pp = results[0]["performance"]["pp"]
-    await ctx.database.execute(
-        "UPDATE scores SET pp = :new_pp WHERE id = :id",
-        {"new_pp": new_pp, "id": score["id"]},
-    )
+        data = json.loads(path.read_text())
+        return cls(path, data["scores"])
+
+    def save(self) -> None:
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({"scores": self.scores}))
+        tmp_path.replace(self.path)  # atomic, so a crash can't corrupt it
 
-    if debug_mode_enabled:
+
+@dataclass
+class Progress:
+    total: int
+    done: int = 0
+    start_time: float = field(default_factory=time.perf_counter)
+    last_report_time: float = 0.0
+
+    def report(self, label: str, force: bool = False) -> None:
+        now = time.perf_counter()
+        if not force and now - self.last_report_time < PROGRESS_INTERVAL:
+            return
+
+        self.last_report_time = now
+
+        rate = self.done / (now - self.start_time) if self.done else 0.0
+        eta = (
+            str(timedelta(seconds=int((self.total - self.done) / rate)))
+            if rate
+            else "?"
+        )
+        percent = self.done / self.total if self.total else 1.0
         print(
-            f"Recalculated score ID {score['id']} ({score['pp']:.3f}pp -> {new_pp:.3f}pp)",
+            f"{label}: {self.done:,}/{self.total:,} ({percent:.1%}) "
+            f"@ {rate:,.0f}/s, eta {eta}",
         )
 
 
-async def process_score_chunk(
-    chunk: list[dict[str, Any]],
+@dataclass
+class DryRunDiff:
+    changes: list[tuple[int, float, float]] = field(default_factory=list)
+    unchanged: int = 0
+
+    def add(self, score_id: int, old_pp: float, new_pp: float) -> None:
+        if math.isclose(old_pp, new_pp, abs_tol=0.001):
+            self.unchanged += 1
+        else:
+            self.changes.append((score_id, old_pp, new_pp))
+
+    def print_summary(self, label: str) -> None:
+        print(f"{label}: {len(self.changes):,} changed, {self.unchanged:,} unchanged")
+
+        if not self.changes:
+            return
+
+        deltas = [new_pp - old_pp for _, old_pp, new_pp in self.changes]
+        print(f"  mean change: {sum(deltas) / len(deltas):+.3f}pp")
+
+        by_delta = sorted(self.changes, key=lambda c: c[2] - c[1])
+        for heading, changes in (
+            ("largest gains", [c for c in by_delta[::-1][:10] if c[2] > c[1]]),
+            ("largest losses", [c for c in by_delta[:10] if c[2] < c[1]]),
+        ):
+            if not changes:
+                continue
+
+            print(f"  {heading}:")
+            for score_id, old_pp, new_pp in changes:
+                print(
+                    f"    score ID {score_id}: {old_pp:.3f}pp -> {new_pp:.3f}pp "
+                    f"({new_pp - old_pp:+.3f}pp)",
+                )
+
+
+async def update_score_pps(
+    score_pps: list[tuple[int, float]],
     ctx: Context,
 ) -> None:
-    tasks: list[Awaitable[None]] = []
-    for score in chunk:
-        osu_file_available = await ensure_osu_file_is_available(
-            score["map_id"],
-            expected_md5=score["map_md5"],
+    """Update many scores' pp in batched, multi-row UPDATEs."""
+    for chunk in divide_chunks(score_pps, UPDATE_BATCH_SIZE):
+        params: dict[str, Any] = {}
+        cases = []
+        for i, (score_id, pp) in enumerate(chunk):
+            cases.append(f"WHEN :id_{i} THEN :pp_{i}")
+            params[f"id_{i}"] = score_id
+            params[f"pp_{i}"] = pp
+
+        ids = ", ".join(f":id_{i}" for i in range(len(chunk)))
+        await ctx.database.execute(
+            f"UPDATE scores SET pp = CASE id {' '.join(cases)} END "
+            f"WHERE id IN ({ids})",
+            params,
         )
-        if osu_file_available:
-            tasks.append(
-                recalculate_score(
-                    score,
-                    BEATMAPS_PATH / f"{score['map_id']}.osu",
-                    ctx,
-                ),
+
+
+async def recalculate_beatmap_scores(
+    beatmap: dict[str, Any],
+    scores: list[dict[str, Any]],
+    ctx: Context,
+) -> list[tuple[int, float]]:
+    """Recalculate all of a beatmap's scores in the worker pool."""
+    osu_file_available = await ensure_osu_file_is_available(
+        beatmap["id"],
+        expected_md5=beatmap["md5"],
+    )
+    if not osu_file_available:
+        if debug_mode_enabled:
+            print(f"Skipping beatmap ID {beatmap['id']} (no .osu file)")
+        return []
+
+    score_params = [
+        app.usecases.performance.ScoreParams(
+            mode=GameMode(score["mode"]).as_vanilla,
+            mods=score["mods"],
+            combo=score["max_combo"],
+            n300=score["n300"],
+            n100=score["n100"],
+            n50=score["n50"],
+            ngeki=score["ngeki"],
+            nkatu=score["nkatu"],
+            nmiss=score["nmiss"],
+        )
+        for score in scores
+    ]
+
+    loop = asyncio.get_running_loop()
+    try:
+        results = await loop.run_in_executor(
+            ctx.executor,
+            app.usecases.performance.calculate_performances,
+            str(BEATMAPS_PATH / f"{beatmap['id']}.osu"),
+            score_params,
+            beatmap["md5"],
+        )
+    except Exception as exc:
+        print(f"Failed to recalculate beatmap ID {beatmap['id']}: {exc!r}")
+        return []
+
+    score_pps = []
+    for score, result in zip(scores, results):
+        new_pp = result["performance"]["pp"]
+        score_pps.append((score["id"], new_pp))
+
+        if debug_mode_enabled:
+            print(
+                f"Recalculated score ID {score['id']} ({score['pp']:.3f}pp -> {new_pp:.3f}pp)",
             )
 
-    await asyncio.gather(*tasks)
+    return score_pps
 
 
-async def recalculate_user(
-    id: int,
-    game_mode: GameMode,
+async def update_user_stats(
+    user_stats: list[tuple[int, Totals]],
+    mode: GameMode,
     ctx: Context,
 ) -> None:
-    best_scores = await ctx.database.fetch_all(
-        "SELECT s.pp, s.acc FROM scores s "
-        "INNER JOIN maps m ON s.map_md5 = m.md5 "
-        "WHERE s.userid = :user_id AND s.mode = :mode "
-        "AND s.status = 2 AND m.status IN (2, 3) "  # ranked, approved
-        "ORDER BY s.pp DESC",
-        {"user_id": id, "mode": game_mode},
-    )
+    """Update many users' pp & acc in batched, multi-row UPDATEs."""
+    for chunk in divide_chunks(user_stats, UPDATE_BATCH_SIZE):
+        params: dict[str, Any] = {"mode": mode}
+        pp_cases = []
+        acc_cases = []
+        for i, (user_id, totals) in enumerate(chunk):
+            pp_cases.append(f"WHEN :id_{i} THEN :pp_{i}")
+            acc_cases.append(f"WHEN :id_{i} THEN :acc_{i}")
+            params[f"id_{i}"] = user_id
+            params[f"pp_{i}"] = totals["pp"]
+            params[f"acc_{i}"] = totals["acc"]
+
+        ids = ", ".join(f":id_{i}" for i in range(len(chunk)))
+        await ctx.database.execute(
+            f"UPDATE stats SET pp = CASE id {' '.join(pp_cases)} END, "
+            f"acc = CASE id {' '.join(acc_cases)} END "
+            f"WHERE mode = :mode AND id IN ({ids})",
+            params,
+        )
 
-    total_scores = len(best_scores)
-    if not total_scores:
-        return
 
-    # calculate new total weighted accuracy
-    weighted_acc = sum(row["acc"] * 0.95**i for i, row in enumerate(best_scores))
-    bonus_acc = 100.0 / (20 * (1 - 0.95**total_scores))
-    acc = (weighted_acc * bonus_acc) / 100
+async def update_redis_leaderboards(
+    user_stats: list[tuple[int, Totals]],
+    users: dict[int, tuple[str, int]],
+    mode: GameMode,
+    ctx: Context,
+) -> None:
+    """Add many users' pp to the global & country leaderboards in one round trip."""
+    pipeline = ctx.redis.pipeline(transaction=False)
 
-    # calculate new total weighted pp
-    weighted_pp = sum(row["pp"] * 0.95**i for i, row in enumerate(best_scores))
-    bonus_pp = 416.6667 * (1 - 0.9994**total_scores)
-    pp = round(weighted_pp + bonus_pp)
+    for user_id, totals in user_stats:
+        country, priv = users[user_id]
+        if not priv & Privileges.UNRESTRICTED:
+            continue
 
-    await ctx.database.execute(
-        "UPDATE stats SET pp = :pp, acc = :acc WHERE id = :id AND mode = :mode",
-        {"pp": pp, "acc": acc, "id": id, "mode": game_mode},
-    )
+        pipeline.zadd(
+            f"bancho:leaderboard:{mode.value}",
+            {str(user_id): totals["pp"]},
+        )
+        pipeline.zadd(
+            f"bancho:leaderboard:{mode.value}:{country}",
+            {str(user_id): totals["pp"]},
+        )
 
-    user_info = await ctx.database.fetch_one(
-        "SELECT country, priv FROM users WHERE id = :id",
-        {"id": id},
-    )
-    if user_info is None:
-        raise Exception(f"Unknown user ID {id}?")
+    await pipeline.execute()
 
-    if user_info["priv"] & Privileges.UNRESTRICTED:
-        await ctx.redis.zadd(
-            f"bancho:leaderboard:{game_mode.value}",
-            {str(id): pp},
-        )
 
-        await ctx.redis.zadd(
-            f"bancho:leaderboard:{game_mode.value}:{user_info['country']}",
-            {str(id): pp},
-        )
+async def recalculate_mode_users(mode: GameMode, ctx: Context) -> None:
+    """Recalculate all users' pp & acc in a mode, a range of user ids at a time."""
+    label = f"{mode!r} stats"
+
+    users = {
+        row["id"]: (row["country"], row["priv"])
+        for row in await ctx.database.fetch_all("SELECT id, country, priv FROM users")
+    }
+    if not users:
+        return
 
-    if debug_mode_enabled:
-        print(f"Recalculated user ID {id} ({pp:.3f}pp, {acc:.3f}%)")
+    # progress is measured by user id, as ids are walked in ranges.
+    max_user_id = max(users)
+    progress = Progress(max_user_id + 1)
 
+    for first_user_id in range(0, max_user_id + 1, USER_BATCH_SIZE):
+        # every user's best scores, ordered by pp, in a single query.
+        top_scores: defaultdict[int, tuple[list[float], list[float]]] = defaultdict(
+            lambda: ([], []),
+        )
+        score_counts: defaultdict[int, int] = defaultdict(int)
 
-async def process_user_chunk(
-    chunk: list[int],
-    game_mode: GameMode,
+        for row in await ctx.database.fetch_all(
+            "SELECT s.userid, s.pp, s.acc FROM scores s "
+            "INNER JOIN maps m ON s.map_md5 = m.md5 "
+            "WHERE s.userid BETWEEN :first_user_id AND :last_user_id "
+            "AND s.mode = :mode AND s.status = 2 "
+            "AND m.status IN (2, 3) "  # ranked, approved
+            "ORDER BY s.userid, s.pp DESC",
+            {
+                "first_user_id": first_user_id,
+                "last_user_id": first_user_id + USER_BATCH_SIZE - 1,
+                "mode": mode,
+            },
+        ):
+            user_id = row["userid"]
+            score_counts[user_id] += 1
+
+            if score_counts[user_id] <= TOP_SCORES_LIMIT:
+                pps, accs = top_scores[user_id]
+                pps.append(row["pp"])
+                accs.append(row["acc"])
+
+        user_stats = [
+            (user_id, calculate_totals(pps, accs, score_counts[user_id]))
+            for user_id, (pps, accs) in top_scores.items()
+            if user_id in users
+        ]
+
+        await update_user_stats(user_stats, mode, ctx)
+        await update_redis_leaderboards(user_stats, users, mode, ctx)
+
+        if debug_mode_enabled:
+            for user_id, totals in user_stats:
+                print(
+                    f"Recalculated user ID {user_id} "
+                    f"({totals['pp']:.3f}pp, {totals['acc']:.3f}%)",
+                )
+
+        progress.done = min(first_user_id + USER_BATCH_SIZE, max_user_id + 1)
+        progress.report(label)
+
+    progress.report(label, force=True)
+
+
+async def recalculate_mode_scores(
+    mode: GameMode,
     ctx: Context,
+    checkpoint: Checkpoint | None,
+    diff: DryRunDiff | None,
 ) -> None:
-    tasks: list[Awaitable[None]] = []
-    for id in chunk:
-        tasks.append(recalculate_user(id, game_mode, ctx))
-
-    await asyncio.gather(*tasks)
+    """Recalculate all best scores in a mode, one batch of beatmaps at a time."""
+    label = f"{mode!r} scores"
+    last_map_id = checkpoint.scores.get(str(mode.value), 0) if checkpoint else 0
 
+    total = await ctx.database.fetch_val(
+        "SELECT COUNT(*) FROM scores s "
+        "INNER JOIN maps m ON s.map_md5 = m.md5 "
+        "WHERE s.status = 2 AND s.mode = :mode AND m.id > :last_map_id",
+        {"mode": mode, "last_map_id": last_map_id},
+    )
+    progress = Progress(total)
 
-async def recalculate_mode_users(mode: GameMode, ctx: Context) -> None:
-    user_ids = [
-        row["id"] for row in await ctx.database.fetch_all("SELECT id FROM users")
-    ]
-
-    for id_chunk in divide_chunks(user_ids, 100):
-        await process_user_chunk(id_chunk, mode, ctx)
+    while True:
+        beatmaps = await ctx.database.fetch_all(
+            "SELECT id, md5 FROM maps WHERE id > :last_map_id "
+            "ORDER BY id LIMIT :limit",
+            {"last_map_id": last_map_id, "limit": BEATMAP_BATCH_SIZE},
+        )
+        if not beatmaps:
+            break
 
+        params: dict[str, Any] = {"mode": mode}
+        for i, beatmap in enumerate(beatmaps):
+            params[f"md5_{i}"] = beatmap["md5"]
 
-async def recalculate_mode_scores(mode: GameMode, ctx: Context) -> None:
-    scores = [
-        dict(row)
+        md5s = ", ".join(f":md5_{i}" for i in range(len(beatmaps)))
+        scores_by_md5: defaultdict[str, list[dict[str, Any]]] = defaultdict(list)
         for row in await ctx.database.fetch_all(
-            """\
-            SELECT scores.id, scores.mode, scores.mods, scores.map_md5,
-              scores.pp, scores.acc, scores.max_combo,
-              scores.ngeki, scores.n300, scores.nkatu, scores.n100, scores.n50, scores.nmiss,
-              maps.id as `map_id`
-            FROM scores
-            INNER JOIN maps ON scores.map_md5 = maps.md5
-            WHERE scores.status = 2
-              AND scores.mode = :mode
-            ORDER BY scores.pp DESC
-            """,
-            {"mode": mode},
+            "SELECT id, mode, mods, map_md5, pp, max_combo, "
+            "ngeki, n300, nkatu, n100, n50, nmiss "
+            "FROM scores "
+            f"WHERE status = 2 AND mode = :mode AND map_md5 IN ({md5s})",
+            params,
+        ):
+            scores_by_md5[row["map_md5"]].append(dict(row))
+
+        # each beatmap is parsed once, with all its scores calculated together.
+        beatmap_results = await asyncio.gather(
+            *[
+                recalculate_beatmap_scores(
+                    dict(beatmap),
+                    scores_by_md5[beatmap["md5"]],
+                    ctx,
+                )
+                for beatmap in beatmaps
+                if beatmap["md5"] in scores_by_md5
+            ],
         )
-    ]
+        score_pps = [score_pp for results in beatmap_results for score_pp in results]
 
-    for score_chunk in divide_chunks(scores, 100):
-        await process_score_chunk(score_chunk, ctx)
+        if diff is not None:
+            old_pps = {
+                score["id"]: score["pp"]
+                for scores in scores_by_md5.values()
+                for score in scores
+            }
+            for score_id, new_pp in score_pps:
+                diff.add(score_id, old_pps[score_id], new_pp)
+        else:
+            await update_score_pps(score_pps, ctx)
+
+        last_map_id = beatmaps[-1]["id"]
+        if checkpoint is not None:
+            checkpoint.scores[str(mode.value)] = last_map_id
+            checkpoint.save()
+
+        progress.done += sum(len(scores) for scores in scores_by_md5.values())
+        progress.report(label)
+
+    progress.report(label, force=True)
 
 
 async def main(argv: Sequence[str] | None = None) -> int:
@@ -234,6 +449,30 @@ async def main(argv: Sequence[str] | None = None) -> int:
         action="store_true",
     )
 
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        help="Number of processes to calculate pp with",
+        type=int,
+        default=os.cpu_count() or 1,
+    )
+    parser.add_argument(
+        "--dry-run",
+        help="Print a summary of score pp changes, without writing them",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--resume",
+        help="Resume from the checkpoint left by an interrupted recalculation",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        help="Path of the checkpoint file",
+        type=Path,
+        default=DEFAULT_CHECKPOINT_PATH,
+    )
+
     parser.add_argument(
         "-m",
         "--mode",
@@ -253,17 +492,39 @@ async def main(argv: Sequence[str] | None = None) -> int:
 
     redis = await aioredis.from_url(app.settings.REDIS_DSN)  # type: ignore[no-untyped-call]
 
-    ctx = Context(db, redis)
+    executor = ProcessPoolExecutor(
+        max_workers=args.jobs,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+    ctx = Context(db, redis, executor)
+
+    checkpoint = None
+    if not args.dry_run:
+        if args.resume:
+            checkpoint = Checkpoint.load(args.checkpoint)
+        else:
+            checkpoint = Checkpoint(args.checkpoint)
 
     for mode in args.mode:
         mode = GameMode(int(mode))
 
         if not args.no_scores:
-            await recalculate_mode_scores(mode, ctx)
+            diff = DryRunDiff() if args.dry_run else None
+            await recalculate_mode_scores(mode, ctx, checkpoint, diff)
+
+            if diff is not None:
+                diff.print_summary(f"{mode!r} scores")
 
-        if not args.no_stats:
+        if not args.no_stats and not args.dry_run:
             await recalculate_mode_users(mode, ctx)
 
+    if checkpoint is not None:
+        # the recalculation completed; nothing to resume.
+        checkpoint.path.unlink(missing_ok=True)
+
+    executor.shutdown()
+
     await app.state.services.http_client.aclose()
     await db.disconnect()
     await redis.aclose()